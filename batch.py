@@ -0,0 +1,185 @@
+import copy
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from simulation import SimulationResult, break_even_month, rollup, scale_chunk, simulate
+
+# 1チャンクあたりのシナリオ数（(チャンク × 月) の系列を約30本保持するため、
+# 2048 × 120ヶ月で 1 チャンク数十MB 程度に収まる）
+DEFAULT_CHUNK_SIZE = 2048
+
+
+# -----------------------------
+# パラメータのドット区切りパス（例: "robot.items.0.purchase_rate"）
+# -----------------------------
+def get_path(params: dict, path: str):
+    node = params
+    for part in path.split("."):
+        node = node[int(part)] if isinstance(node, list) else node[part]
+    return node
+
+
+def set_path(params: dict, path: str, value) -> None:
+    *parents, last = path.split(".")
+    node = params
+    for part in parents:
+        node = node[int(part)] if isinstance(node, list) else node[part]
+    if isinstance(node, list):
+        node[int(last)] = value
+    else:
+        node[last] = value
+
+
+# -----------------------------
+# 構造体配列（structure-of-arrays）形式のシナリオ集合
+# default_params() と同じ構造で、数値項目にシナリオごとの1次元配列を持たせる
+# ※list は構造（ロボット種別・閾値）として扱い、np.ndarray だけをシナリオ軸とみなす
+# -----------------------------
+def scenario_count(params: dict, *inputs) -> int:
+    sizes = set()
+
+    def visit(node):
+        if isinstance(node, dict):
+            for v in node.values():
+                visit(v)
+        elif isinstance(node, list):
+            for v in node:
+                visit(v)
+        elif isinstance(node, np.ndarray) and node.ndim > 0:
+            sizes.add(len(node))
+
+    visit(params)
+    for x in inputs:
+        visit(x)
+    if len(sizes) > 1:
+        raise ValueError(f"シナリオ数が項目ごとに異なります: {sorted(sizes)}")
+    return sizes.pop() if sizes else 1
+
+
+def take_scenarios(node, index):
+    # シナリオ軸（np.ndarray の先頭軸）だけをスライス／抽出する
+    if isinstance(node, dict):
+        return {k: take_scenarios(v, index) for k, v in node.items()}
+    if isinstance(node, list):
+        return [take_scenarios(v, index) for v in node]
+    if isinstance(node, np.ndarray) and node.ndim > 0:
+        return node[index]
+    return node
+
+
+# -----------------------------
+# グリッド（直積）のシナリオ集合を作る
+# axes: {"app.churn_rate": [0.01, 0.02, ...], "app.monthly_fee": [...], ...}
+# -----------------------------
+def scenario_grid(base: dict, axes: dict) -> tuple:
+    params = copy.deepcopy(base)
+    values = [np.asarray(v) for v in axes.values()]
+    mesh = np.meshgrid(*values, indexing="ij")
+    for path, column in zip(axes.keys(), mesh):
+        set_path(params, path, column.ravel())
+    n = int(np.prod([len(v) for v in values])) if values else 1
+    return params, n
+
+
+# -----------------------------
+# シナリオごとの集計値（金額は万円、サマリータブの KPI と同じ単位）
+# max_cumulative_loss：累積利益の最も深い赤字（必要資金の目安、赤字がなければ 0）
+# -----------------------------
+@dataclass
+class BatchSummary:
+    total_revenue: np.ndarray
+    total_expense: np.ndarray
+    cumulative_profit: np.ndarray
+    final_paying_users: np.ndarray
+    break_even_month: np.ndarray
+    max_cumulative_loss: np.ndarray
+
+
+def summarize(result: SimulationResult) -> BatchSummary:
+    return BatchSummary(
+        total_revenue=result.total_revenue.sum(axis=-1) / 10000,
+        total_expense=result.total_expense.sum(axis=-1) / 10000,
+        cumulative_profit=result.profit.sum(axis=-1) / 10000,
+        final_paying_users=result.paying_users[..., -1],
+        break_even_month=break_even_month(rollup(result.profit, result.month_index)),
+        max_cumulative_loss=np.maximum(-np.cumsum(result.profit, axis=-1).min(axis=-1), 0) / 10000,
+    )
+
+
+def _simulate_chunk(task: tuple) -> BatchSummary:
+    params, years, inputs = task
+    return summarize(simulate(params, years, *inputs))
+
+
+# -----------------------------
+# N シナリオを一括評価（chunk_size ごとに区切って (チャンク × 月) で計算）
+# 月次系列はチャンク内でのみ保持し、集計値だけを返すのでメモリは chunk_size で決まる
+# （週次・日次は scale_chunk で1チャンクのシナリオ数を減らす）
+# workers > 1 ならチャンクをプロセスプールに分散（None は CPU コア数）
+# executor を渡すと、そのプールを使い回す（繰り返し呼ぶ最適化などでプール起動を省く）
+# on_progress(計算済みのシナリオ数, N) をチャンクごとに呼ぶ（例外を送出すれば中断）
+# -----------------------------
+def simulate_batch(params: dict, years: int, attendees_per_event, events_per_company_per_month,
+                   robot_uio_users_per_month, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   workers: int = 1, executor=None, on_progress=None) -> BatchSummary:
+    inputs = [attendees_per_event, events_per_company_per_month, robot_uio_users_per_month]
+    n = scenario_count(params, *inputs)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    chunk_size = scale_chunk(chunk_size, params)
+
+    out = BatchSummary(
+        total_revenue=np.empty(n),
+        total_expense=np.empty(n),
+        cumulative_profit=np.empty(n),
+        final_paying_users=np.empty(n),
+        break_even_month=np.empty(n, dtype=np.int64),
+        max_cumulative_loss=np.empty(n),
+    )
+    slices = [slice(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+    tasks = ((take_scenarios(params, sl), years, take_scenarios(inputs, sl)) for sl in slices)
+    if executor is not None and len(slices) > 1:
+        _fill_summary(out, slices, executor.map(_simulate_chunk, tasks), on_progress)
+    elif workers > 1 and len(slices) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(slices))) as pool:
+            try:
+                _fill_summary(out, slices, pool.map(_simulate_chunk, tasks), on_progress)
+            except BaseException:
+                pool.shutdown(cancel_futures=True)  # 中断時は未着手のチャンクを捨てる
+                raise
+    else:
+        _fill_summary(out, slices, map(_simulate_chunk, tasks), on_progress)
+    return out
+
+
+def _fill_summary(out: BatchSummary, slices: list, summaries, on_progress=None) -> None:
+    n = slices[-1].stop if slices else 0
+    for sl, summary in zip(slices, summaries):
+        for name in BatchSummary.__dataclass_fields__:
+            getattr(out, name)[sl] = getattr(summary, name)
+        if on_progress is not None:
+            on_progress(sl.stop, n)
+
+
+# -----------------------------
+# 順序を保った並列 map（結果は tasks の順に yield）
+# tasks はジェネレーターでもよく、先読みして計算中にするのは window 個（既定は workers × 2）まで
+# なので、入力・結果とも件数によらず window 分のメモリで流せる
+# workers <= 1 ならプロセスを使わずに逐次計算
+# -----------------------------
+def ordered_map(fn, tasks, workers: int = 1, window: int = None):
+    if workers <= 1:
+        yield from map(fn, tasks)
+        return
+    window = 2 * workers if window is None else window
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(fn, task))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import fields
+
+import numpy as np
+
+from simulation import ENGINE_VERSION, SimulationResult, simulate
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+# -----------------------------
+# パラメータの正規化（キーの並び・int/float の揺れ・未使用の余剰要素を吸収）
+# -----------------------------
+def _normalize(node):
+    if isinstance(node, dict):
+        return {str(k): _normalize(v) for k, v in node.items()}
+    if isinstance(node, (list, tuple)):
+        return [_normalize(v) for v in node]
+    if isinstance(node, np.ndarray):
+        return _normalize(node.tolist())
+    if isinstance(node, (bool, np.bool_)):
+        return bool(node)
+    if isinstance(node, (int, float, np.integer, np.floating)):
+        value = float(node)
+        return int(value) if value.is_integer() else value
+    return node
+
+
+def normalize_params(params: dict) -> dict:
+    normalized = _normalize(params)
+    robot = normalized.get("robot")
+    if robot is not None:
+        # シミュレーションで使うのは num_types 件目まで
+        robot["items"] = robot.get("items", [])[:robot.get("num_types", 0)]
+    return normalized
+
+
+# -----------------------------
+# 正規化したパラメータ＋期間・サイドバー入力から安定したハッシュを作る
+# 計算エンジンのバージョン（ENGINE_VERSION）も含めるので、計算内容が変わると別のキーになる
+# -----------------------------
+def params_fingerprint(params: dict, years: int, attendees_per_event, events_per_company_per_month,
+                       robot_uio_users_per_month) -> str:
+    payload = {
+        "engine": ENGINE_VERSION,
+        "params": normalize_params(params),
+        "inputs": _normalize([years, attendees_per_event, events_per_company_per_month,
+                              robot_uio_users_per_month]),
+    }
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def result_nbytes(result) -> int:
+    if isinstance(result, bytes):
+        return len(result)
+    return sum(getattr(result, f.name).nbytes for f in fields(result)
+               if isinstance(getattr(result, f.name), np.ndarray))
+
+
+# -----------------------------
+# シミュレーション結果の LRU キャッシュ（件数・バイト数の上限つき、スレッドセーフ）
+# ※同じサーバープロセス内の全セッションで共有するため、結果は読み取り専用にして保持
+# ※SimulationResult のほか、エンコード済みの応答（bytes、service.py）も保持できる
+# -----------------------------
+class ResultCache:
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (result, nbytes)
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, result) -> None:
+        if isinstance(result, SimulationResult):
+            for f in fields(result):
+                value = getattr(result, f.name)
+                if isinstance(value, np.ndarray):
+                    value.flags.writeable = False
+        nbytes = result_nbytes(result)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (result, nbytes)
+            self.total_bytes += nbytes
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+RESULT_CACHE = ResultCache()
+
+
+# engine：キャッシュにないときに使う計算関数（既定は simulate、差分再計算なら IncrementalSimulator.simulate）
+# key：計算済みの params_fingerprint があれば渡す（ハッシュの再計算を省く）
+# store：ディスク上の結果ストア（store.ResultStore）を渡すと、メモリのキャッシュになければストアから読み、
+#        それにもなければ計算してストアにも保存する（サーバーの再起動後・別プロセスでも再計算しない）
+def simulate_cached(params: dict, years: int, attendees_per_event, events_per_company_per_month,
+                    robot_uio_users_per_month, cache: ResultCache = None, engine=None,
+                    key: str = None, store=None) -> SimulationResult:
+    cache = RESULT_CACHE if cache is None else cache
+    engine = simulate if engine is None else engine
+    if key is None:
+        key = params_fingerprint(params, years, attendees_per_event, events_per_company_per_month,
+                                 robot_uio_users_per_month)
+    result = cache.get(key)
+    if result is None and store is not None:
+        result = store.get(key)
+        if result is not None:
+            cache.put(key, result)
+    if result is None:
+        result = engine(params, years, attendees_per_event, events_per_company_per_month,
+                        robot_uio_users_per_month)
+        cache.put(key, result)
+        if store is not None:
+            store.put(key, result)
+    return result
@@ -0,0 +1,280 @@
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.subplots import make_subplots
+
+from simulation import STEPS_PER_YEAR, SimulationResult, period_index, period_labels, rollup
+
+FIG_COLORS = ["#1F5DBA", "#2E8B57", "#DAA520", "#ff9da7"]
+
+# グラフに送るデータの圧縮設定
+PRECISION = 1         # 金額（万円）は小数点以下1桁まで
+MAX_POINTS = 1500     # 推移グラフ1枚の点数（系列数×期間数）がこれを超えたら 月 → 四半期 → 年に集計
+PERIOD_MONTHS = {"month": 1, "quarter": 3, "year": 12}
+PERIODS = {"day": "日次", "week": "週次", "month": "月次", "quarter": "四半期", "year": "年次"}
+TOP_SKUS = 8          # 種類別の販売台数は、販売台数の多い上位 TOP_SKUS 種類 ＋「その他」にまとめて表示
+
+
+# -----------------------------
+# グラフ用データの圧縮
+#   - 整数値の系列（件数・人数）は整数型、それ以外は PRECISION 桁に丸めた float32 にする
+#   - plotly は numpy 配列を型付き配列（base64）で送るので、要素のバイト数がそのまま通信量になる
+# -----------------------------
+def compact(y) -> np.ndarray:
+    y = np.asarray(y, dtype=float)
+    if np.array_equal(y, np.round(y)):
+        return y.astype(np.int64)  # plotly が値の範囲に合わせて i1 / i2 / i4 に詰める
+    return np.round(y, PRECISION).astype(np.float32)
+
+
+# 種類別の年間販売台数を、全期間の販売台数の多い上位 n 種類と「その他」（残りの合計）にまとめる
+# 返り値：(名前のリスト, 行 × 年 の配列)
+def top_skus(res: SimulationResult, n: int = TOP_SKUS) -> tuple:
+    sales = np.asarray(res.annual_robot_sales_by_type)
+    if len(sales) <= n + 1:
+        return list(res.robot_names), sales
+    order = np.argsort(-sales.sum(axis=-1), kind="stable")
+    top, rest = order[:n], order[n:]
+    names = [res.robot_names[i] for i in top] + [f"その他（{len(rest)}種類）"]
+    return names, np.vstack([sales[top], sales[rest].sum(axis=0)])
+
+
+# 推移グラフの集計単位：時間刻み（res.step）のまま → 月 → 四半期 → 年 のうち、
+# 系列数 traces の図が MAX_POINTS に収まる最も細かい単位（1本あたりの点数が少ないので SVG のまま描ける）
+def chart_period(res: SimulationResult, traces: int = 5) -> str:
+    if traces * len(res.month_index) <= MAX_POINTS:
+        return res.step
+    for period, months in PERIOD_MONTHS.items():
+        if traces * -(-res.months // months) <= MAX_POINTS:
+            return period
+    return "year"
+
+
+# ステップごとの系列を period ごとに集計（how="sum"：期間合計、"last"：期末の値。会社数・会員数などの残高用）
+def resample(y, res: SimulationResult, period: str, how: str = "sum") -> np.ndarray:
+    y = np.asarray(y, dtype=float)
+    if period == res.step:
+        return y
+    return rollup(y, res.month_index // PERIOD_MONTHS[period], how)
+
+
+# ステップごとの系列を1本のトレースにする
+# x は配列を送らず x0 / dx で表す（全トレース共通の月軸。各期間の終わりの月に置く）
+def _monthly_trace(trace_type, y, res: SimulationResult, period: str, how: str = "sum", **kwargs):
+    y = compact(resample(y, res, period, how))
+    dx = 12 / STEPS_PER_YEAR[res.step] if period == res.step else PERIOD_MONTHS[period]
+    return trace_type(x0=dx, dx=dx, y=y, **kwargs)
+
+
+def _month_axis_title(period: str) -> str:
+    return "月" if period == "month" else f"月（{PERIODS[period]}）"
+
+
+# 図の JSON の大きさ（バイト）。st.plotly_chart と同じ plotly.io.to_json で測る
+def payload_bytes(figs: dict) -> int:
+    return sum(len(pio.to_json(fig, validate=False).encode()) for fig in figs.values())
+
+
+# -----------------------------
+# 支出の大分類（円グラフ・内訳表示用、円）
+# -----------------------------
+def expense_breakdown(res: SimulationResult) -> dict:
+    return {
+        "開発費": (res.cost_app_ios_initial.sum() + res.cost_app_android_initial.sum() + res.cost_robot_if_dev.sum()
+                 + res.cost_app_ios_bugfix.sum() + res.cost_app_android_bugfix.sum()),
+        "クラウド費": (res.cost_cloud_initial_arr.sum() + res.cost_cloud_aws.sum() + res.cost_cloud_bugfix_arr.sum()
+                   + res.cost_cloud_scale.sum()),
+        "人件費": res.cost_potstill_salary.sum(),  # potstill_fte の合計は人月なので含めない
+        "販売ツール費": res.cost_shop_acquisition.sum(),
+        "CS費": res.cost_customer_support.sum(),
+    }
+
+
+# -----------------------------
+# サマリータブの図（年間 売上・支出・利益・累損、売上構成・支出構成の円グラフ）
+# period："year"（1ヶ月目から12ヶ月ごと）または "fiscal_year"（会計年度ごと）
+# -----------------------------
+def summary_figures(res: SimulationResult, period: str = "year") -> dict:
+    years_labels = period_labels(res, period)
+    index = period_index(res, period)
+    annual_profit = rollup(res.profit, index) / 10000
+
+    # 年間 売上・支出・利益・累損 グラフ
+    fig2_colors = ["#1F5DBA", "#F03531", "#7DBBFF", "#F5A3A3"]
+    fig2 = go.Figure()
+    fig2.add_trace(go.Bar(x=years_labels, y=compact(rollup(res.total_revenue, index) / 10000), name="総売上"))
+    fig2.add_trace(go.Bar(x=years_labels, y=compact(rollup(res.total_expense, index) / 10000), name="総支出"))
+    fig2.add_trace(go.Bar(x=years_labels, y=compact(annual_profit), name="年間利益"))
+    fig2.add_trace(go.Scatter(x=years_labels, y=compact(np.cumsum(annual_profit)), name="累損（累計利益）", mode="lines+markers"))
+
+    fig2.update_layout(
+        title="売上・支出・利益・累損" + ("（会計年度）" if period == "fiscal_year" else ""),
+        yaxis_title="金額（万円）",
+        barmode="group",
+        colorway=fig2_colors
+    )
+    fig2.update_yaxes(tickformat=",")
+
+    # 売上構成
+    labels_rev = ["アプリ課金", "販売手数料"]
+    values_rev = [res.app_revenue.sum(), res.commission_revenue.sum()]
+    fig_rev = go.Figure(data=[go.Pie(labels=labels_rev, values=values_rev, hole=.3)])
+    fig_rev.update_layout(height=300, margin=dict(t=0, b=0, l=0, r=0))
+
+    # 支出構成
+    breakdown = expense_breakdown(res)
+    fig_exp = go.Figure(data=[go.Pie(labels=list(breakdown), values=list(breakdown.values()), hole=.3)])
+    fig_exp.update_layout(height=300, margin=dict(t=0, b=0, l=0, r=0))
+
+    return {"annual": fig2, "revenue_pie": fig_rev, "expense_pie": fig_exp}
+
+
+# -----------------------------
+# グラフタブの図（売上げ・販売台数、収益計算の月次推移、支出項目別の月次推移）
+# -----------------------------
+def graph_figures(res: SimulationResult) -> dict:
+    years_labels = period_labels(res, "year")
+    period = chart_period(res)
+
+    fig = make_subplots(
+        rows=2,
+        cols=1,
+        specs=[
+            [{"secondary_y": False}],
+            [{"secondary_y": False}],
+        ],
+        vertical_spacing=0.2,
+        subplot_titles=[
+            "総売上・販売手数料・アプリ収入",
+            "販売台数"
+        ]
+    )
+
+    # ④ 年間売上（総・手数料・アプリ）
+    fig.add_trace(go.Bar(x=years_labels, y=compact(res.annual_total), name="総売上"), row=1, col=1)
+    fig.add_trace(go.Bar(x=years_labels, y=compact(res.annual_commission), name="販売手数料収入"), row=1, col=1)
+    fig.add_trace(go.Bar(x=years_labels, y=compact(res.annual_app), name="アプリ収入"), row=1, col=1)
+
+    # ⑤ 年間ロボット販売台数
+    # 種類別 年間販売台数の棒グラフ（上位 TOP_SKUS 種類 ＋ その他）
+    robot_names, robot_sales = top_skus(res)
+    for robot_name, sales in zip(robot_names, robot_sales):
+        fig.add_trace(
+            go.Bar(
+                x=years_labels,
+                y=compact(sales),
+                name=f"{robot_name}"
+            ),
+            row=2,
+            col=1
+        )
+
+    fig.update_layout(
+        height=600,
+        barmode="group",
+        title="売上げ・販売台数",
+        legend=dict(orientation="h", yanchor="bottom", y=-0.12, xanchor="center", x=0.5),
+        colorway=FIG_COLORS
+    )
+    fig.update_yaxes(tickformat=",")
+
+    fig_monthly = make_subplots(
+        rows=3,
+        cols=1,
+        specs=[
+            [{"secondary_y": False}],
+            [{"secondary_y": True}],
+            [{"secondary_y": True}],
+        ],
+        vertical_spacing=0.06,
+        subplot_titles=[
+            "販売会社数・イベント数",
+            "新規ユーザー数（左軸）",
+            "有料会員数（左軸）・アプリ収入（右軸）",
+        ]
+    )
+
+    # ①
+    fig_monthly.add_trace(_monthly_trace(go.Bar, res.contract_companies, res, period, "last", name="販売会社数"), row=1, col=1)
+    fig_monthly.add_trace(_monthly_trace(go.Bar, res.events_per_month, res, period, name="イベント数"), row=1, col=1)
+
+    # ②
+    fig_monthly.add_trace(_monthly_trace(go.Bar, res.new_users, res, period, name="新規ユーザー数", opacity=0.5),
+                          row=2, col=1, secondary_y=False)
+
+    # ③
+    fig_monthly.add_trace(_monthly_trace(go.Bar, res.paying_users, res, period, "last", name="有料会員数", opacity=0.5),
+                          row=3, col=1, secondary_y=False)
+    fig_monthly.add_trace(_monthly_trace(go.Scatter, res.app_revenue / 10000, res, period, name="アプリ収入", mode="lines"),
+                          row=3, col=1, secondary_y=True)
+
+    fig_monthly.update_layout(
+        height=1500,
+        barmode="group",
+        title="収益計算（ロボット販売 × アプリ課金）",
+        legend=dict(orientation="h", yanchor="bottom", y=-0.12, xanchor="center", x=0.5),
+    )
+    if period != "month":
+        fig_monthly.update_xaxes(title_text=_month_axis_title(period), row=3, col=1)
+    fig_monthly.update_yaxes(tickformat=",", secondary_y=False)
+    fig_monthly.update_yaxes(tickformat=",", title_text="金額（万円）", secondary_y=True)
+
+    # アプリ開発 月次推移グラフ
+    fig3 = go.Figure()
+
+    fig3.add_trace(_monthly_trace(go.Bar, res.cost_app_android_initial / 10000, res, period, name="アプリ開発費（Android初期）"))
+    fig3.add_trace(_monthly_trace(go.Bar, res.cost_app_ios_initial / 10000, res, period, name="アプリ開発費（iPhone初期）"))
+    fig3.add_trace(_monthly_trace(go.Bar, res.cost_robot_if_dev / 10000, res, period, name="ロボットI/F開発費"))
+    fig3.add_trace(_monthly_trace(go.Bar, res.cost_app_android_bugfix / 10000, res, period, name="アプリ不具合修正費（Android）"))
+    fig3.add_trace(_monthly_trace(go.Bar, res.cost_app_ios_bugfix / 10000, res, period, name="アプリ不具合修正費（iPhone）"))
+
+    fig3.update_layout(
+        title="アプリ開発 月次推移",
+        xaxis_title=_month_axis_title(period),
+        yaxis_title="金額（万円）",
+        legend=dict(orientation="h", yanchor="bottom", y=-0.25, xanchor="center", x=0.5),
+        height=700,
+    )
+    fig3.update_yaxes(tickformat=",")
+
+    # クラウド費用 月次推移グラフ
+    fig4 = go.Figure()
+
+    fig4.add_trace(_monthly_trace(go.Bar, res.cost_cloud_initial_arr / 10000, res, period, name="クラウド初期構築費"))
+    fig4.add_trace(_monthly_trace(go.Bar, res.cost_cloud_aws / 10000, res, period, name="AWS費用（有料会員数連動）"))
+    fig4.add_trace(_monthly_trace(go.Bar, res.cost_cloud_bugfix_arr / 10000, res, period, name="クラウド不具合修正費"))
+    fig4.add_trace(_monthly_trace(go.Bar, res.cost_cloud_scale / 10000, res, period, name="クラウド増強費用"))
+
+    fig4.update_layout(
+        title="クラウド費用 月次推移（全費目）",
+        xaxis_title=_month_axis_title(period),
+        yaxis_title="金額（万円）",
+        legend=dict(orientation="h", yanchor="bottom", y=-0.25, xanchor="center", x=0.5),
+        height=700,
+    )
+    fig4.update_yaxes(tickformat=",")
+
+    # その他 月次推移グラフ
+    fig5 = go.Figure()
+
+    fig5.add_trace(_monthly_trace(go.Bar, res.cost_shop_acquisition / 10000, res, period, name="販売店向けロボット・ツール費"))
+    fig5.add_trace(_monthly_trace(go.Bar, res.cost_customer_support / 10000, res, period, name="カスタマーサポート費"))
+    fig5.add_trace(_monthly_trace(go.Bar, res.cost_potstill_salary / 10000, res, period, name="事業体人件費"))
+
+    fig5.update_layout(
+        title="その他 月次推移（全費目）",
+        xaxis_title=_month_axis_title(period),
+        yaxis_title="金額（万円）",
+        legend=dict(orientation="h", yanchor="bottom", y=-0.25, xanchor="center", x=0.5),
+        height=700,
+    )
+    fig5.update_yaxes(tickformat=",")
+
+    return {"sales": fig, "monthly": fig_monthly, "dev": fig3, "cloud": fig4, "other": fig5}
+
+
+# タブ名 → 図を作る関数
+FIGURE_BUILDERS = {
+    "summary": summary_figures,
+    "graphs": graph_figures,
+}
@@ -0,0 +1,146 @@
+import copy
+from dataclasses import dataclass
+
+from batch import get_path, set_path, summarize
+from sensitivity import clip_min
+from simulation import simulate
+
+# 目標の種類：指標名 → 表示名
+TARGETS = {
+    "break_even_month": "黒字化月（N ヶ月目までに黒字化）",
+    "cumulative_profit": "累積利益（万円）以上",
+    "final_paying_users": "最終有料会員数（人）以上",
+}
+
+
+# -----------------------------
+# ゴールシーク結果
+# value：目標を満たす境界の入力値（見つからなければ None）
+# -----------------------------
+@dataclass
+class GoalSeekResult:
+    path: str
+    target_metric: str
+    target_value: float
+    value: float
+    metric_value: float
+    evaluations: int
+    converged: bool
+    message: str = ""
+
+
+# -----------------------------
+# Brent 法（逆二次補間＋二分法、scipy の brentq と同じ手順）
+# 符号の異なる [a, b] から根を挟む区間を狭め、最終区間の両端を返す
+# -----------------------------
+def _brent(f, a: float, b: float, fa: float, fb: float, xtol: float, rtol: float, max_iter: int) -> tuple:
+    xpre, xcur, fpre, fcur = a, b, fa, fb
+    xblk, fblk, spre, scur = 0.0, 0.0, 0.0, 0.0
+    for _ in range(max_iter):
+        if fpre * fcur < 0:
+            xblk, fblk = xpre, fpre
+            spre = scur = xcur - xpre
+        if abs(fblk) < abs(fcur):
+            xpre, xcur, xblk = xcur, xblk, xcur
+            fpre, fcur, fblk = fcur, fblk, fcur
+
+        delta = (xtol + rtol * abs(xcur)) / 2
+        sbis = (xblk - xcur) / 2
+        if fcur == 0 or abs(sbis) < delta:
+            return xcur, fcur, xblk, fblk, True
+
+        if abs(spre) > delta and abs(fcur) < abs(fpre):
+            if xpre == xblk:
+                # 割線法
+                stry = -fcur * (xcur - xpre) / (fcur - fpre)
+            else:
+                # 逆二次補間
+                dpre = (fpre - fcur) / (xpre - xcur)
+                dblk = (fblk - fcur) / (xblk - xcur)
+                stry = -fcur * (fblk * dblk - fpre * dpre) / (dblk * dpre * (fblk - fpre))
+            if 2 * abs(stry) < min(abs(spre), 3 * abs(sbis) - delta):
+                spre, scur = scur, stry
+            else:
+                spre = scur = sbis
+        else:
+            spre = scur = sbis
+
+        xpre, fpre = xcur, fcur
+        xcur += scur if abs(scur) > delta else (delta if sbis > 0 else -delta)
+        fcur = f(xcur)
+    return xcur, fcur, xblk, fblk, False
+
+
+# -----------------------------
+# 二分法（条件を満たす／満たさないの境界を探す。整数項目は整数で探索）
+# -----------------------------
+def _bisect(ok, a, b, ok_a: bool, xtol: float, integer: bool, max_iter: int) -> tuple:
+    for _ in range(max_iter):
+        if (abs(b - a) <= 1) if integer else (abs(b - a) <= xtol):
+            break
+        mid = (a + b) // 2 if integer else (a + b) / 2
+        if ok(mid) == ok_a:
+            a = mid
+        else:
+            b = mid
+    else:
+        return (a if ok_a else b), False
+    return (a if ok_a else b), True
+
+
+# -----------------------------
+# ゴールシーク：1つの入力（path）を [low, high] の範囲で動かし、目標を満たす境界値を探す
+#   - break_even_month：target_value ヶ月目までに黒字化（二分法）
+#   - cumulative_profit / final_paying_users：target_value 以上（Brent 法、整数項目は二分法）
+# 指標は入力に対して単調である前提（範囲の両端で目標の成否が分かれていること）
+# 下限のある項目（周期・期間など）は探索範囲を下限で切る
+# -----------------------------
+def goal_seek(params: dict, years: int, attendees_per_event, events_per_company_per_month,
+              robot_uio_users_per_month, path: str, target_metric: str, target_value: float,
+              low: float, high: float, xtol: float = 1e-6, rtol: float = 1e-10,
+              max_iter: int = 100) -> GoalSeekResult:
+    if target_metric not in TARGETS:
+        raise ValueError(f"未対応の目標です: {target_metric}")
+
+    trial = copy.deepcopy(params)
+    integer = isinstance(get_path(params, path), int)
+    evaluations = 0
+
+    def metric(value) -> float:
+        nonlocal evaluations
+        evaluations += 1
+        set_path(trial, path, int(value) if integer else float(value))
+        summary = summarize(simulate(trial, years, attendees_per_event, events_per_company_per_month,
+                                     robot_uio_users_per_month))
+        return float(getattr(summary, target_metric))
+
+    def satisfied(value) -> bool:
+        m = metric(value)
+        if target_metric == "break_even_month":
+            return 1 <= m <= target_value
+        return m >= target_value
+
+    def result(value, converged: bool, message: str = "") -> GoalSeekResult:
+        metric_value = metric(value) if value is not None else float("nan")
+        return GoalSeekResult(path=path, target_metric=target_metric, target_value=target_value,
+                              value=value, metric_value=metric_value, evaluations=evaluations,
+                              converged=converged, message=message)
+
+    if integer:
+        low, high = int(round(low)), int(round(high))
+    low, high = clip_min(path, low), clip_min(path, high)
+    ok_low, ok_high = satisfied(low), satisfied(high)
+    if ok_low == ok_high:
+        message = "範囲内のどの値でも目標を満たします" if ok_low else "範囲内では目標に届きません"
+        return result(low if ok_low else None, False, message)
+
+    if target_metric == "break_even_month" or integer:
+        value, converged = _bisect(satisfied, low, high, ok_low, xtol, integer, max_iter)
+        return result(value, converged)
+
+    def gap(value) -> float:
+        return metric(value) - target_value
+
+    x1, f1, x2, f2, converged = _brent(gap, float(low), float(high), gap(low), gap(high), xtol, rtol, max_iter)
+    # 最終区間の両端のうち、目標を満たす側を返す
+    return result(x1 if f1 >= 0 else x2, converged)
@@ -0,0 +1,74 @@
+import copy
+
+import numpy as np
+
+from simulation import STAGES, SimulationResult, assemble_result, model_inputs
+
+
+# -----------------------------
+# ステージの reads（ドット区切りパス、"*" は dict / list の全要素）を解決して値を取り出す
+# ※省略可能な項目（従来の params にない項目）は None
+# -----------------------------
+def resolve_reads(root: dict, path: str):
+    def visit(node, parts):
+        if not parts or node is None:
+            return node
+        head, rest = parts[0], parts[1:]
+        if head == "*":
+            children = node.values() if isinstance(node, dict) else node
+            return [visit(child, rest) for child in children]
+        return visit(node[int(head)] if isinstance(node, list) else node.get(head), rest)
+
+    return visit(root, path.split("."))
+
+
+def _same(a, b) -> bool:
+    if a is b:
+        return True
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.shape(a) == np.shape(b) and np.array_equal(a, b)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    return type(a) is type(b) and a == b
+
+
+# -----------------------------
+# 差分再計算つきシミュレーション
+#   - ステージごとに、前回参照した入力値と出力を保持
+#   - 入力値が変わったステージ、または上流が再計算されたステージだけを計算し直す
+#     （例：fte_cost_per_month の変更 → labor と totals だけ再計算、販売台数・解約の計算は再利用）
+# 1つのインスタンスは1つの利用者（Streamlit のセッションなど）で使う前提（スレッドセーフではない）
+# -----------------------------
+class IncrementalSimulator:
+    def __init__(self):
+        self._reads = {}     # ステージ名 -> 前回参照した入力値
+        self._outputs = {}   # ステージ名 -> 前回の出力
+        self.recomputed = []  # 直近の simulate で再計算したステージ名
+
+    def clear(self) -> None:
+        self._reads.clear()
+        self._outputs.clear()
+        self.recomputed = []
+
+    def simulate(self, params: dict, years: int, attendees_per_event, events_per_company_per_month,
+                 robot_uio_users_per_month, contract_companies: np.ndarray = None,
+                 robot_sales_by_type: np.ndarray = None) -> SimulationResult:
+        root = model_inputs(params, years, attendees_per_event, events_per_company_per_month,
+                            robot_uio_users_per_month, contract_companies, robot_sales_by_type)
+        ctx = {}
+        recomputed = []
+        for stage in STAGES:
+            reads = [resolve_reads(root, path) for path in stage.reads]
+            stale = (stage.name not in self._outputs
+                     or any(dep in recomputed for dep in stage.deps)
+                     or not _same(reads, self._reads[stage.name]))
+            if stale:
+                self._outputs[stage.name] = stage.compute(root, ctx)
+                # 呼び出し側が params を書き換えても比較できるよう、参照値はコピーして保持
+                self._reads[stage.name] = copy.deepcopy(reads)
+                recomputed.append(stage.name)
+            ctx.update(self._outputs[stage.name])
+        self.recomputed = recomputed
+        return assemble_result(ctx, years)
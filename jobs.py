@@ -0,0 +1,135 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import normalize_params
+
+DEFAULT_JOB_WORKERS = 2
+DEFAULT_MAX_FINISHED = 32
+PARTIAL_INTERVAL = 1.0  # 途中結果を作り直す間隔（秒）
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def job_key(kind: str, fingerprint: str, options: dict = None) -> str:
+    # 同じ分析（種類・params_fingerprint・分析の設定）かを判定するためのハッシュ
+    payload = {"kind": kind, "fingerprint": fingerprint, "options": normalize_params(options or {})}
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# -----------------------------
+# バックグラウンドで実行する分析1件
+#   status："queued" → "running" → "done" / "error" / "cancelled"
+#   done / total：進捗（モンテカルロはパス数、感度分析は評価件数、最適化は世代）
+#   partial：途中結果（作れる分析のみ。PARTIAL_INTERVAL 秒ごとに作り直す）
+#   report を分析の on_progress に渡す。cancel されていれば report が JobCancelled を送出して中断する
+# -----------------------------
+class Job:
+    def __init__(self, key: str, kind: str):
+        self.key = key
+        self.kind = kind
+        self.status = "queued"
+        self.done = 0
+        self.total = 0
+        self.partial = None
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._partial_at = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error", "cancelled")
+
+    @property
+    def progress(self) -> float:
+        return self.done / self.total if self.total else 0.0
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def report(self, done: int, total: int, partial=None) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.done, self.total = done, total
+        now = time.monotonic()
+        if partial is not None and done < total and now - self._partial_at >= PARTIAL_INTERVAL:
+            self.partial = partial()
+            self._partial_at = time.monotonic()
+
+
+# -----------------------------
+# 分析ジョブの登録簿（スレッドプールで実行、スレッドセーフ）
+#   - submit(key, kind, fn, ...)：fn(..., on_progress=job.report) をバックグラウンドで実行して Job を返す
+#     同じ key のジョブがあればそれを返す（実行中・完了済みとも。中止・失敗したものは新しく実行し直す）
+#   - 完了したジョブは新しい順に max_finished 件まで保持（実行中のジョブは消さない）
+# -----------------------------
+class JobRegistry:
+    def __init__(self, workers: int = DEFAULT_JOB_WORKERS, max_finished: int = DEFAULT_MAX_FINISHED):
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()  # key -> Job
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def submit(self, key: str, kind: str, fn, *args, **kwargs) -> Job:
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status not in ("cancelled", "error") and not job._cancel.is_set():
+                self._jobs.move_to_end(key)
+                return job
+            job = self._jobs[key] = Job(key, kind)
+            self._jobs.move_to_end(key)
+            self._prune()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job: Job, fn, args: tuple, kwargs: dict) -> None:
+        job.status = "running"
+        job.started_at = time.monotonic()
+        try:
+            if job._cancel.is_set():
+                raise JobCancelled()
+            job.result = fn(*args, on_progress=job.report, **kwargs)
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "error"
+        finally:
+            job.finished_at = time.monotonic()
+            job.partial = None
+            with self._lock:
+                self._prune()
+
+    def _prune(self) -> None:
+        finished = [key for key, job in self._jobs.items() if job.finished]
+        for key in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {status: sum(job.status == status for job in jobs)
+                for status in ("queued", "running", "done", "error", "cancelled")}
+
+
+JOBS = JobRegistry()
@@ -1,16 +1,186 @@
 import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+
+import numpy as np
 import streamlit as st
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import math
+
+from batch import get_path, set_path
+from cache import params_fingerprint, simulate_cached
+from charts import FIG_COLORS, FIGURE_BUILDERS, PERIODS, chart_period, expense_breakdown, payload_bytes
+from goalseek import TARGETS, goal_seek
+from incremental import IncrementalSimulator
+from jobs import JOBS, job_key
+from montecarlo import MonteCarloSpec, run_monte_carlo
+from optimize import DEFAULT_SPACE, optimize
+from sensitivity import min_value, numeric_paths, one_at_a_time, sobol_indices
+from simulation import (DEALER_AGENTS, DEFAULT_TIME, SCHEDULE_FIELDS, STEPS_PER_YEAR, find_schedules, is_schedule,
+                        is_schedule_field, time_grid, time_settings)
+from store import RESULT_STORE
 
 # -----------------------------
 # UIキー生成（衝突しない命名規約）
 # -----------------------------
 def ui_key(path: str) -> str:
-    # 例: "robot.items.0.name" -> "ui.robot.items.0.name"
+    # 例: "app.monthly_fee" -> "ui.app.monthly_fee"
     return f"ui.{path}"
 
+# -----------------------------
+# 表で編集する項目（列ごとの dict of list）：ロボット種別・クラウド増強の閾値・AWS の段階料金・スケジュール
+#   - 基準の表は session_state[ui_key(path)]、画面の data_editor は変更分だけを
+#     session_state[table_editor_key(path)] に持つ（edited_rows / deleted_rows / added_rows）
+#   - JSON読込・ゴールシークで基準の表を差し替えたら版数を進めて
+#     data_editor を作り直す（古い変更分を新しい表に当てないため）
+# TABLE_DEFAULTS は表ごとの列と、追加行・空欄の既定値（率は % 表示、クラウド増強費用は万円）
+# -----------------------------
+ROBOT_DEFAULTS = {
+    "name": "",
+    "price": 230_000,
+    "commission_rate_pct": 10.0,
+    "purchase_rate_pct": 3.0,
+    "release_month": 0,
+    "churn_multiplier": 1.0,
+}
+TABLE_DEFAULTS = {
+    "robot.table": ROBOT_DEFAULTS,
+    "cloud.scale_table": {"threshold": 0, "scale_cost": 0},
+    "cloud.aws_table": {"users": 0, "cost_per_user_month": 0},
+    "schedule.table": {"path": "app.monthly_fee", "month": 0, "value": 0.0, "growth_pct": 0.0},
+}
+# params のリスト項目 → (表, 列)（ゴールシークの反映用）
+TABLE_COLUMNS = {
+    "cloud.thresholds": ("cloud.scale_table", "threshold"),
+    "cloud.scale_costs": ("cloud.scale_table", "scale_cost"),
+    "cloud.aws_tier_users": ("cloud.aws_table", "users"),
+    "cloud.aws_tier_costs": ("cloud.aws_table", "cost_per_user_month"),
+}
+
+
+def robot_table_from_items(items: list) -> dict:
+    table = {column: [] for column in ROBOT_DEFAULTS}
+    for r in items:
+        # JSONは内部表現（0-1）想定。もし%で入っていても破綻しないよう補正
+        cr = float(r["commission_rate"])
+        pr = float(r["purchase_rate"])
+        if cr > 1.0:  # %として入っている可能性
+            cr = cr / 100.0
+        if pr > 1.0:
+            pr = pr / 100.0
+        table["name"].append(r["name"])
+        table["price"].append(int(r["price"]))
+        table["commission_rate_pct"].append(cr * 100.0)
+        table["purchase_rate_pct"].append(pr * 100.0)
+        table["release_month"].append(int(r["release_month"]))
+        table["churn_multiplier"].append(float(r.get("churn_multiplier", 1.0)))
+    return table
+
+
+def cloud_tables(cloud: dict) -> tuple:
+    # クラウド増強の閾値・費用（万円）と AWS の段階料金の表（件数に満たない分は 0）
+    ths = cloud.get("thresholds", [])
+    costs = cloud.get("scale_costs", [])
+    n = int(cloud.get("num_thresholds", 0))
+    scale_table = {
+        "threshold": [int(ths[i]) if i < len(ths) else 0 for i in range(n)],
+        "scale_cost": [int(costs[i]) if i < len(costs) else 0 for i in range(n)],
+    }
+    users = cloud.get("aws_tier_users", [])
+    rates = cloud.get("aws_tier_costs", [])
+    k = int(cloud.get("num_aws_tiers", 0))
+    aws_table = {
+        "users": [int(users[i]) if i < len(users) else 0 for i in range(k)],
+        "cost_per_user_month": [int(rates[i]) if i < len(rates) else 0 for i in range(k)],
+    }
+    return scale_table, aws_table
+
+
+def table_editor_key(path: str) -> str:
+    return f"table_editor.{path}.{st.session_state.get(f'table_version.{path}', 0)}"
+
+
+def edited_table(path: str) -> dict:
+    # 基準の表に data_editor の変更分を当てた表（変更 → 削除 → 追加の順、空欄は既定値）
+    defaults = TABLE_DEFAULTS[path]
+    table = {column: list(values) for column, values in st.session_state[ui_key(path)].items()}
+    edits = st.session_state.get(table_editor_key(path)) or {}
+    for row, changes in edits.get("edited_rows", {}).items():
+        for column, value in changes.items():
+            table[column][int(row)] = value
+    for row in sorted(edits.get("deleted_rows", []), reverse=True):
+        for values in table.values():
+            del values[row]
+    for added in edits.get("added_rows", []):
+        for column, values in table.items():
+            values.append(added.get(column))
+    for column, values in table.items():
+        table[column] = [defaults[column] if v is None else v for v in values]
+    return table
+
+
+def set_table(path: str, table: dict) -> None:
+    st.session_state[ui_key(path)] = table
+    st.session_state[f"table_version.{path}"] = st.session_state.get(f"table_version.{path}", 0) + 1
+
+
+def set_table_cell(path: str, column: str, row: int, value) -> None:
+    # 編集中の変更分を取り込んだうえで1セルを書き換える
+    table = edited_table(path)
+    table[column][row] = value
+    set_table(path, table)
+
+# -----------------------------
+# 時間で変わる項目（スケジュール）は1行1区間の表で編集
+#   - 列：項目のパス・開始月・値・月間の伸び率（%）。同じ項目の行が区間の列になる
+#   - 値は params と同じ単位（万円の項目は万円）、率の項目（*_rate）だけ % 表示
+#   - 表にある項目は、設定タブの入力欄の値の代わりにスケジュールを使う
+# -----------------------------
+def schedule_table_from_params(params: dict) -> dict:
+    table = {column: [] for column in TABLE_DEFAULTS["schedule.table"]}
+    for path, schedule in find_schedules(params).items():
+        scale = 100.0 if path.endswith("_rate") else 1.0
+        for segment in schedule:
+            table["path"].append(path)
+            table["month"].append(int(segment["month"]))
+            table["value"].append(float(segment["value"]) * scale)
+            table["growth_pct"].append(float(segment.get("growth", 0.0)) * 100.0)
+    return table
+
+
+def schedules_from_table(table: dict) -> dict:
+    # 表の行を項目ごとにまとめる（項目のパス → 区間の列、行の順のまま）
+    schedules = {}
+    for path, month, value, growth_pct in zip(table["path"], table["month"], table["value"], table["growth_pct"]):
+        scale = 100.0 if path.endswith("_rate") else 1.0
+        segment = {"month": int(month), "value": float(value) / scale}
+        if growth_pct:
+            segment["growth"] = float(growth_pct) / 100.0
+        schedules.setdefault(path, []).append(segment)
+    return schedules
+
+
+def schedule_error(params: dict, path: str) -> str:
+    # スケジュールを使えない理由（使えるなら空文字）
+    parts = path.split(".")
+    if not is_schedule_field(path):
+        return "スケジュールを指定できない項目です"
+    if parts[:2] == ["robot", "items"] and int(parts[2]) >= params["robot"]["num_types"]:
+        return "ロボット種別の行がありません"
+    if path == "app.churn_rate" and params["app"]["num_churn_segments"]:
+        return "継続期間別の解約率と併用できません"
+    return ""
+
+
+def without_schedules(params: dict) -> dict:
+    # スケジュールを最初の区間（開始月が最も早い区間）の値に置き換えた params（入力欄への反映用）
+    flat = json.loads(json.dumps(params))
+    for path, schedule in find_schedules(flat).items():
+        set_path(flat, path, min(schedule, key=lambda s: int(s["month"]))["value"])
+    return flat
+
 # -----------------------------
 # デフォルトパラメータ（必要に応じて拡張）
 # -----------------------------
@@ -21,11 +191,11 @@ def default_params() -> dict:
             "items": [
                 {"name": "ロボホン", "price": 230_000,
                  "commission_rate": 0.10, "purchase_rate": 0.03,
-                 "release_month": 0,
+                 "release_month": 0, "churn_multiplier": 1.0,
                 },
                 {"name": "ポケとも", "price": 39_000,
                  "commission_rate": 0.10, "purchase_rate": 0.09,
-                 "release_month": 10,
+                 "release_month": 10, "churn_multiplier": 1.0,
                 }
             ]
         },
@@ -33,6 +203,9 @@ def default_params() -> dict:
             "monthly_fee": 300,
             "free_months": 3,
             "churn_rate": 0.03,
+            # 継続期間別の解約率（先頭から months ヶ月ずつ churn_rate を適用、以降は上の churn_rate）
+            "num_churn_segments": 0,
+            "churn_segments": [],
         },
         # --- 追加：cloud（クラウド閾値） ---
         "cloud": {
@@ -42,6 +215,10 @@ def default_params() -> dict:
             "thresholds": [300, 1000, 3000, 10000],
             "scale_costs": [100, 150, 200, 300],  # 万円で保持
             "aws_cost_per_user_month": 50,
+            # AWS の段階料金（aws_tier_users[k] 人を超えた分は aws_tier_costs[k] 円/人・月）
+            "num_aws_tiers": 0,
+            "aws_tier_users": [],
+            "aws_tier_costs": [],
         },
         # 販売会社（増加数）
         "dealer":{
@@ -49,6 +226,9 @@ def default_params() -> dict:
             "max_companies": 50,
             "fixed_months_before_growth": 6,
             "company_growth_per_month": 2,
+            # "aggregate"：全社同じ、"agents"：販売会社ごと（イベント数・集客数のばらつき、立ち上がり、解約）
+            "model": "aggregate",
+            "agents": dict(DEALER_AGENTS),
         },
         # アプリ開発・ロボットI/F開発・不具合修正支出
         "develop":{
@@ -77,7 +257,9 @@ def default_params() -> dict:
             "base_users": 2000,
             "fte_increment_users": 4000,
             "fte_increment": 0.5,
-        }
+        },
+        # 時間刻み・暦（開始月・会計年度の開始月）
+        "time": dict(DEFAULT_TIME),
     }
 
 # -----------------------------
@@ -86,33 +268,32 @@ def default_params() -> dict:
 # -----------------------------
 def init_state_from_params(params: dict) -> None:
     # robot
-    st.session_state.setdefault(ui_key("robot.num_types"), int(params["robot"]["num_types"]))
-    for i, r in enumerate(params["robot"]["items"]):
-        st.session_state.setdefault(ui_key(f"robot.items.{i}.name"), r["name"])
-        st.session_state.setdefault(ui_key(f"robot.items.{i}.price"), int(r["price"]))
-        st.session_state.setdefault(ui_key(f"robot.items.{i}.commission_rate_pct"), float(r["commission_rate"]) * 100.0)
-        st.session_state.setdefault(ui_key(f"robot.items.{i}.purchase_rate_pct"), float(r["purchase_rate"]) * 100.0)
-        st.session_state.setdefault(ui_key(f"robot.items.{i}.release_month"), int(r["release_month"]))
+    if ui_key("robot.table") not in st.session_state:
+        items = params["robot"]["items"][:int(params["robot"]["num_types"])]
+        st.session_state[ui_key("robot.table")] = robot_table_from_items(items)
 
     # app
     st.session_state.setdefault(ui_key("app.monthly_fee"), int(params["app"]["monthly_fee"]))
     st.session_state.setdefault(ui_key("app.free_months"), int(params["app"]["free_months"]))
     st.session_state.setdefault(ui_key("app.churn_rate_pct"), float(params["app"]["churn_rate"]) * 100.0)
+    st.session_state.setdefault(ui_key("app.num_churn_segments"), int(params["app"].get("num_churn_segments", 0)))
+    segments = params["app"].get("churn_segments", [])
+    for i in range(int(st.session_state[ui_key("app.num_churn_segments")])):
+        seg = segments[i] if i < len(segments) else {"months": 1, "churn_rate": params["app"]["churn_rate"]}
+        st.session_state.setdefault(ui_key(f"app.churn_segments.{i}.months"), int(seg["months"]))
+        st.session_state.setdefault(ui_key(f"app.churn_segments.{i}.churn_rate_pct"), float(seg["churn_rate"]) * 100.0)
+
+    # 時間で変わる項目（スケジュール）
+    st.session_state.setdefault(ui_key("schedule.table"), schedule_table_from_params(params))
 
     # --- 追加：cloud ---
     cloud = params.get("cloud", {})
     st.session_state.setdefault(ui_key("cloud.initial_cost"), int(cloud.get("initial_cost", 0)))
     st.session_state.setdefault(ui_key("cloud.bugfix_cost"), int(cloud.get("bugfix_cost", 0)))
-    st.session_state.setdefault(ui_key("cloud.num_thresholds"), int(cloud.get("num_thresholds", 0)))
     st.session_state.setdefault(ui_key("cloud.aws_cost_per_user_month"), int(cloud.get("aws_cost_per_user_month", 0)))
-
-    ths = cloud.get("thresholds", [])
-    costs = cloud.get("scale_costs", [])
-
-    n = int(st.session_state[ui_key("cloud.num_thresholds")])
-    for i in range(n):
-        st.session_state.setdefault(ui_key(f"cloud.thresholds.{i}"), int(ths[i] if i < len(ths) else 0))
-        st.session_state.setdefault(ui_key(f"cloud.scale_costs.{i}"), int(costs[i] if i < len(costs) else 0))
+    scale_table, aws_table = cloud_tables(cloud)
+    st.session_state.setdefault(ui_key("cloud.scale_table"), scale_table)
+    st.session_state.setdefault(ui_key("cloud.aws_table"), aws_table)
 
     # -----------------------------
     # dealer
@@ -122,6 +303,14 @@ def init_state_from_params(params: dict) -> None:
     st.session_state.setdefault(ui_key("dealer.max_companies"), int(dealer.get("max_companies", 1)))
     st.session_state.setdefault(ui_key("dealer.fixed_months_before_growth"), int(dealer.get("fixed_months_before_growth", 0)))
     st.session_state.setdefault(ui_key("dealer.company_growth_per_month"), int(dealer.get("company_growth_per_month", 0)))
+    st.session_state.setdefault(ui_key("dealer.model"), dealer.get("model", "aggregate"))
+    agents = {**DEALER_AGENTS, **dealer.get("agents", {})}
+    st.session_state.setdefault(ui_key("dealer.agents.event_rate_cv"), float(agents["event_rate_cv"]))
+    st.session_state.setdefault(ui_key("dealer.agents.attendees_cv"), float(agents["attendees_cv"]))
+    st.session_state.setdefault(ui_key("dealer.agents.ramp_months"), int(agents["ramp_months"]))
+    st.session_state.setdefault(ui_key("dealer.agents.ramp_start"), float(agents["ramp_start"]))
+    st.session_state.setdefault(ui_key("dealer.agents.churn_rate_pct"), float(agents["churn_rate"]) * 100.0)
+    st.session_state.setdefault(ui_key("dealer.agents.seed"), int(agents["seed"]))
 
     # -----------------------------
     # develop  （単位：万円で保持している想定）
@@ -159,28 +348,47 @@ def init_state_from_params(params: dict) -> None:
     st.session_state.setdefault(ui_key("labor.fte_increment_users"), int(labor.get("fte_increment_users", 1)))
     st.session_state.setdefault(ui_key("labor.fte_increment"), float(labor.get("fte_increment", 0.0)))
 
+    # -----------------------------
+    # time（時間刻み・開始月・会計年度の開始月）
+    # -----------------------------
+    time = time_settings(params)
+    st.session_state.setdefault(ui_key("time.step"), time["step"])
+    st.session_state.setdefault(ui_key("time.start_month"), int(time["start_month"]))
+    st.session_state.setdefault(ui_key("time.fiscal_year_start_month"), int(time["fiscal_year_start_month"]))
+
 # -----------------------------
 # session_state -> params（内部表現に正規化）
 # -----------------------------
 def build_params_from_state() -> dict:
-    num = int(st.session_state[ui_key("robot.num_types")])
+    table = edited_table("robot.table")
+    num = len(table["name"])
     items = []
     for i in range(num):
         items.append({
-            "name": st.session_state.get(ui_key(f"robot.items.{i}.name"), f"No{i+1}"),
-            "price": int(st.session_state.get(ui_key(f"robot.items.{i}.price"), 230_000)),
-            "commission_rate": float(st.session_state.get(ui_key(f"robot.items.{i}.commission_rate_pct"), 10.0)) / 100.0,
-            "purchase_rate": float(st.session_state.get(ui_key(f"robot.items.{i}.purchase_rate_pct"), 3.0)) / 100.0,
-            "release_month": int(st.session_state.get(ui_key(f"robot.items.{i}.release_month"), 0)),
+            "name": str(table["name"][i]) or f"No{i+1}",
+            "price": int(table["price"][i]),
+            "commission_rate": float(table["commission_rate_pct"][i]) / 100.0,
+            "purchase_rate": float(table["purchase_rate_pct"][i]) / 100.0,
+            "release_month": int(table["release_month"][i]),
+            "churn_multiplier": float(table["churn_multiplier"][i]),
+        })
+
+    # 継続期間別の解約率
+    num_segments = int(st.session_state.get(ui_key("app.num_churn_segments"), 0))
+    churn_segments = []
+    for i in range(num_segments):
+        churn_segments.append({
+            "months": int(st.session_state.get(ui_key(f"app.churn_segments.{i}.months"), 1)),
+            "churn_rate": float(st.session_state.get(ui_key(f"app.churn_segments.{i}.churn_rate_pct"), 3.0)) / 100.0,
         })
 
     # --- 追加：cloud ---
-    n = int(st.session_state.get(ui_key("cloud.num_thresholds"), 0))
-    thresholds = []
-    scale_costs = []
-    for i in range(n):
-        thresholds.append(int(st.session_state.get(ui_key(f"cloud.thresholds.{i}"), 0)))
-        scale_costs.append(int(st.session_state.get(ui_key(f"cloud.scale_costs.{i}"), 0)))
+    scale_table = edited_table("cloud.scale_table")
+    thresholds = [int(v) for v in scale_table["threshold"]]
+    scale_costs = [int(v) for v in scale_table["scale_cost"]]
+    aws_table = edited_table("cloud.aws_table")
+    aws_tier_users = [int(v) for v in aws_table["users"]]
+    aws_tier_costs = [int(v) for v in aws_table["cost_per_user_month"]]
 
     params = {
         "robot": {"num_types": num, "items": items},
@@ -188,15 +396,20 @@ def build_params_from_state() -> dict:
             "monthly_fee": int(st.session_state[ui_key("app.monthly_fee")]),
             "free_months": int(st.session_state[ui_key("app.free_months")]),
             "churn_rate": float(st.session_state[ui_key("app.churn_rate_pct")]) / 100.0,
+            "num_churn_segments": num_segments,
+            "churn_segments": churn_segments,
         },
         # --- 追加：cloud ---
         "cloud": {
             "initial_cost": int(st.session_state[ui_key("cloud.initial_cost")]),
             "bugfix_cost": int(st.session_state[ui_key("cloud.bugfix_cost")]),
-            "num_thresholds": n,
+            "num_thresholds": len(thresholds),
             "thresholds": thresholds,
             "scale_costs": scale_costs,
             "aws_cost_per_user_month": int(st.session_state[ui_key("cloud.aws_cost_per_user_month")]),
+            "num_aws_tiers": len(aws_tier_users),
+            "aws_tier_users": aws_tier_users,
+            "aws_tier_costs": aws_tier_costs,
         },
         # 販売会社（増加数）
         "dealer": {
@@ -204,6 +417,15 @@ def build_params_from_state() -> dict:
             "max_companies": int(st.session_state.get(ui_key("dealer.max_companies"), 1)),
             "fixed_months_before_growth": int(st.session_state.get(ui_key("dealer.fixed_months_before_growth"), 0)),
             "company_growth_per_month": int(st.session_state.get(ui_key("dealer.company_growth_per_month"), 0)),
+            "model": st.session_state.get(ui_key("dealer.model"), "aggregate"),
+            "agents": {
+                "event_rate_cv": float(st.session_state.get(ui_key("dealer.agents.event_rate_cv"), 0.0)),
+                "attendees_cv": float(st.session_state.get(ui_key("dealer.agents.attendees_cv"), 0.0)),
+                "ramp_months": int(st.session_state.get(ui_key("dealer.agents.ramp_months"), 0)),
+                "ramp_start": float(st.session_state.get(ui_key("dealer.agents.ramp_start"), 1.0)),
+                "churn_rate": float(st.session_state.get(ui_key("dealer.agents.churn_rate_pct"), 0.0)) / 100.0,
+                "seed": int(st.session_state.get(ui_key("dealer.agents.seed"), 0)),
+            },
         },
         # アプリ開発・不具合修正支出
         "develop": {
@@ -233,8 +455,20 @@ def build_params_from_state() -> dict:
             "base_users": int(st.session_state.get(ui_key("labor.base_users"), 0)),
             "fte_increment_users": int(st.session_state.get(ui_key("labor.fte_increment_users"), 1)),
             "fte_increment": float(st.session_state.get(ui_key("labor.fte_increment"), 0.0)),
-        }
+        },
+        # 時間刻み・暦
+        "time": {
+            "step": st.session_state.get(ui_key("time.step"), DEFAULT_TIME["step"]),
+            "start_month": int(st.session_state.get(ui_key("time.start_month"), DEFAULT_TIME["start_month"])),
+            "fiscal_year_start_month": int(st.session_state.get(ui_key("time.fiscal_year_start_month"),
+                                                                DEFAULT_TIME["fiscal_year_start_month"])),
+        },
     }
+
+    # 時間で変わる項目（使えない項目の行は設定タブで警告して無視）
+    for path, schedule in schedules_from_table(edited_table("schedule.table")).items():
+        if not schedule_error(params, path):
+            set_path(params, path, {"schedule": schedule})
     return params
 
 # -----------------------------
@@ -245,24 +479,13 @@ def apply_loaded_params_to_state(loaded: dict) -> None:
     if "robot" not in loaded or "app" not in loaded:
         raise ValueError("JSONの形式が想定と異なります（robot/appがありません）。")
 
-    st.session_state[ui_key("robot.num_types")] = int(loaded["robot"]["num_types"])
+    # 時間で変わる項目は表に移し、入力欄には最初の区間の値を入れる
+    set_table("schedule.table", schedule_table_from_params(loaded))
+    loaded = without_schedules(loaded)
 
     # ロボット種別
-    for i, r in enumerate(loaded["robot"]["items"]):
-        st.session_state[ui_key(f"robot.items.{i}.name")] = r["name"]
-        st.session_state[ui_key(f"robot.items.{i}.price")] = int(r["price"])
-
-        # JSONは内部表現（0-1）想定。もし%で入っていても破綻しないよう補正
-        cr = float(r["commission_rate"])
-        pr = float(r["purchase_rate"])
-        if cr > 1.0:  # %として入っている可能性
-            cr = cr / 100.0
-        if pr > 1.0:
-            pr = pr / 100.0
-
-        st.session_state[ui_key(f"robot.items.{i}.commission_rate_pct")] = cr * 100.0
-        st.session_state[ui_key(f"robot.items.{i}.purchase_rate_pct")] = pr * 100.0
-        st.session_state[ui_key(f"robot.items.{i}.release_month")] = int(r["release_month"])
+    items = loaded["robot"]["items"][:int(loaded["robot"]["num_types"])]
+    set_table("robot.table", robot_table_from_items(items))
 
 
     # アプリ
@@ -274,21 +497,23 @@ def apply_loaded_params_to_state(loaded: dict) -> None:
         churn = churn / 100.0
     st.session_state[ui_key("app.churn_rate_pct")] = churn * 100.0
 
+    # 継続期間別の解約率（指定のない従来の JSON は区間なし）
+    segments = loaded["app"].get("churn_segments", [])
+    st.session_state[ui_key("app.num_churn_segments")] = int(loaded["app"].get("num_churn_segments", len(segments)))
+    for i, seg in enumerate(segments):
+        st.session_state[ui_key(f"app.churn_segments.{i}.months")] = int(seg["months"])
+        st.session_state[ui_key(f"app.churn_segments.{i}.churn_rate_pct")] = float(seg["churn_rate"]) * 100.0
+
     # --- 追加：cloud ---
     if "cloud" in loaded:
         c = loaded["cloud"]
         st.session_state[ui_key("cloud.initial_cost")] = int(c.get("initial_cost", 0))
         st.session_state[ui_key("cloud.bugfix_cost")] = int(c.get("bugfix_cost", 0))
-        st.session_state[ui_key("cloud.num_thresholds")] = int(c.get("num_thresholds", 0))
         st.session_state[ui_key("cloud.aws_cost_per_user_month")] = int(c.get("aws_cost_per_user_month", 0))
 
-        ths = c.get("thresholds", [])
-        costs = c.get("scale_costs", [])
-
-        n = int(st.session_state[ui_key("cloud.num_thresholds")])
-        for i in range(n):
-            st.session_state[ui_key(f"cloud.thresholds.{i}")] = int(ths[i] if i < len(ths) else 0)
-            st.session_state[ui_key(f"cloud.scale_costs.{i}")] = int(costs[i] if i < len(costs) else 0)
+        scale_table, aws_table = cloud_tables(c)
+        set_table("cloud.scale_table", scale_table)
+        set_table("cloud.aws_table", aws_table)
 
     # -----------------------------
     # dealer
@@ -298,6 +523,14 @@ def apply_loaded_params_to_state(loaded: dict) -> None:
     st.session_state[ui_key("dealer.max_companies")] = int(dealer.get("max_companies", 1))
     st.session_state[ui_key("dealer.fixed_months_before_growth")] = int(dealer.get("fixed_months_before_growth", 0))
     st.session_state[ui_key("dealer.company_growth_per_month")] = int(dealer.get("company_growth_per_month", 0))
+    st.session_state[ui_key("dealer.model")] = dealer.get("model", "aggregate")
+    agents = {**DEALER_AGENTS, **dealer.get("agents", {})}
+    st.session_state[ui_key("dealer.agents.event_rate_cv")] = float(agents["event_rate_cv"])
+    st.session_state[ui_key("dealer.agents.attendees_cv")] = float(agents["attendees_cv"])
+    st.session_state[ui_key("dealer.agents.ramp_months")] = int(agents["ramp_months"])
+    st.session_state[ui_key("dealer.agents.ramp_start")] = float(agents["ramp_start"])
+    st.session_state[ui_key("dealer.agents.churn_rate_pct")] = float(agents["churn_rate"]) * 100.0
+    st.session_state[ui_key("dealer.agents.seed")] = int(agents["seed"])
 
     # -----------------------------
     # develop（params は円、UI は万円）
@@ -335,6 +568,14 @@ def apply_loaded_params_to_state(loaded: dict) -> None:
     st.session_state[ui_key("labor.fte_increment_users")] = int(labor.get("fte_increment_users", 1))
     st.session_state[ui_key("labor.fte_increment")] = float(labor.get("fte_increment", 0.0))
 
+    # -----------------------------
+    # time（指定のない従来の JSON は月次）
+    # -----------------------------
+    time = time_settings(loaded)
+    st.session_state[ui_key("time.step")] = time["step"]
+    st.session_state[ui_key("time.start_month")] = int(time["start_month"])
+    st.session_state[ui_key("time.fiscal_year_start_month")] = int(time["fiscal_year_start_month"])
+
 # ----------------------------------------------------
 # Streamlit 基本設定
 # ----------------------------------------------------
@@ -345,6 +586,37 @@ st.title("ビジネスモデル シミュレーション")
 params0 = default_params()
 init_state_from_params(params0)
 
+# 分析パネルの入力の初期値（ui.* と同じく setdefault で初期化し、ウィジェットには value を渡さない）
+PANEL_DEFAULTS = {
+    "mc_samples": 10_000,
+    "mc_seed": 0,
+    "mc_purchase_conc": 500.0,
+    "mc_churn_conc": 500.0,
+    "mc_binomial": True,
+    "mc_poisson": True,
+    "mc_streaming": False,
+    "mc_enabled": False,
+    "sens_pct": 10,
+    "sens_top": 15,
+    "gsa_pct": 20,
+    "gsa_samples": 1_024,
+    "gsa_enabled": False,
+    "opt_limit": 0,
+    "opt_population": 64,
+    "opt_generations": 200,
+    "summary_period": "year",
+}
+for key, value in PANEL_DEFAULTS.items():
+    st.session_state.setdefault(key, value)
+
+# 非表示タブの分析パネルの入力値を保持する
+# （描画されなかったウィジェットの値は Streamlit が破棄するため、毎回 session_state に書き戻す）
+PANEL_KEY_PREFIXES = ("mc_", "sens_", "gsa_", "gs_", "opt_", "summary_")
+PANEL_BUTTON_KEYS = ("gs_run", "gs_apply", "opt_run", "opt_apply", "mc_cancel", "gsa_cancel", "opt_cancel")
+for key in list(st.session_state):
+    if str(key).startswith(PANEL_KEY_PREFIXES) and key not in PANEL_BUTTON_KEYS:
+        st.session_state[key] = st.session_state[key]
+
 st.sidebar.header("パラメータ")
 
 with st.sidebar.expander("設定の保存 / 読み込み"):
@@ -377,40 +649,50 @@ with st.sidebar.expander("設定の保存 / 読み込み"):
 # ----------------------------------------------------
 # 期間パラメータ（★シミュレーション年数）
 # ----------------------------------------------------
-years = st.sidebar.slider("シミュレーション年数（年）", min_value=1, max_value=10, value=7, step=1)
-MONTHS = years * 12
+# 編集中の値では再計算しないよう、フォームにまとめて「反映」で確定する
+with st.sidebar.form("sidebar_form"):
+    years = st.slider("シミュレーション年数（年）", min_value=1, max_value=30, value=7, step=1)
+    st.selectbox("時間刻み", list(STEPS_PER_YEAR), format_func={"month": "月", "week": "週", "day": "日"}.get,
+                 key=ui_key("time.step"))
+    col = st.columns(2)
+    with col[0]:
+        st.number_input("開始月（暦月）", min_value=1, max_value=12, step=1, key=ui_key("time.start_month"))
+    with col[1]:
+        st.number_input("会計年度の開始月", min_value=1, max_value=12, step=1,
+                        key=ui_key("time.fiscal_year_start_month"))
 
-# ----------------------------------------------------
-# ロボット販売・手数料関連
-# ----------------------------------------------------
-#units_per_event = st.sidebar.number_input("イベントあたり販売台数（台）", min_value=0, value=2, step=1)
-attendees_per_event = st.sidebar.number_input("イベントあたり集客数（人）", min_value=0, value=50, step=1)
+    # ----------------------------------------------------
+    # ロボット販売・手数料関連
+    # ----------------------------------------------------
+    #units_per_event = st.number_input("イベントあたり販売台数（台）", min_value=0, value=2, step=1)
+    attendees_per_event = st.number_input("イベントあたり集客数（人）", min_value=0, value=50, step=1)
 
-# ----------------------------------------------------
-# 販売会社イベント
-# ----------------------------------------------------
-events_per_company_per_month = st.sidebar.number_input("1社あたり月間イベント数（回）", min_value=0, value=2, step=1)
+    # ----------------------------------------------------
+    # 販売会社イベント
+    # ----------------------------------------------------
+    events_per_company_per_month = st.number_input("1社あたり月間イベント数（回）", min_value=0, value=2, step=1)
 
-# ----------------------------------------------------
-# 既存ユーザー向けアプリ課金
-# ----------------------------------------------------
-st.sidebar.markdown("---")
-st.sidebar.subheader("ロボット購入率設定")
-num_types_sb = int(st.session_state.get(ui_key("robot.num_types"), 1))
-for i in range(num_types_sb):
-    r_name = st.session_state.get(ui_key(f"robot.items.{i}.name"), f"No{i+1}")
-    st.sidebar.number_input(f"{r_name} 購入率（%）", min_value=0.0, max_value=10.0, step=0.1, key=ui_key(f"robot.items.{i}.purchase_rate_pct"))
+    # ----------------------------------------------------
+    # 既存ユーザー向けアプリ課金
+    # ----------------------------------------------------
+    st.markdown("---")
+    st.subheader("ロボット購入率設定")
+    st.caption("種類ごとの購入率は「設定」タブのロボット種別の表で編集します")
 
-st.sidebar.markdown("---")
-st.sidebar.caption(f"ロボット保有顧客の月当たり新規課金登録者")
-robot_uio_users_per_month = st.sidebar.number_input("新規課金登録者数（人）", min_value=0, value=0, step=1)
+    st.markdown("---")
+    st.caption(f"ロボット保有顧客の月当たり新規課金登録者")
+    robot_uio_users_per_month = st.number_input("新規課金登録者数（人）", min_value=0, value=0, step=1)
+    st.form_submit_button("反映", type="primary", use_container_width=True)
 
 
 
 # ----------------------------------------------------
 # タブ定義
 # ----------------------------------------------------
-tab_summary, tab_graphs, tab_settings  = st.tabs(["📋サマリー", "📊 グラフ", "⚙ 設定"])
+# on_change="rerun"：タブの切り替えで再実行し、表示中のタブ（.open）の内容だけを作る
+# ※設定タブはフォームの入力値を保持するため常に描画する（グラフは含まない）
+tab_summary, tab_graphs, tab_settings = st.tabs(["📋サマリー", "📊 グラフ", "⚙ 設定"], key="active_tab",
+                                                on_change="rerun")
 
 
 
@@ -419,673 +701,746 @@ tab_summary, tab_graphs, tab_settings  = st.tabs(["📋サマリー", "📊 グ
 
 
 with tab_settings:
-
-    # ----------------------------------------------------
-    # 収入パラメータ（メイン領域）
-    # ----------------------------------------------------
-
-
-    st.header("収入パラメータ設定")
-    st.subheader("アプリ課金")
-    st.caption(f"プラットフォーマー手数料＝15%")
-
-    col = st.columns(2)
-    with col[0]:
-        st.number_input("アプリ月額料金（円）", min_value=0, step=10, key=ui_key("app.monthly_fee"))
-        st.number_input("無料期間（月）", min_value=0, max_value=24, step=1, key=ui_key("app.free_months"))
-    with col[1]:
-        st.number_input("月間解約率（%）", min_value=0.0, max_value=50.0, step=0.5, key=ui_key("app.churn_rate_pct"))
-
-
-    st.subheader("ロボット販売収益")
-
-    st.number_input(
-        "ロボット種類数",
-        min_value=1,
-        max_value=10,
-        step=1,
-        key=ui_key("robot.num_types"),
-    )
-
-    num_robot_types = int(st.session_state[ui_key("robot.num_types")])
-
-    # ロボット情報を「items配列」として正規化
-    for i in range(num_robot_types):
-        with st.expander(f"ロボットNo{i + 1} の設定", expanded=(i == 0)):
+    # 設定項目はフォームにまとめ、「設定を反映」を押したときだけ再計算する
+    # （入力途中の値でグラフ・KPIを作り直さないため。種類数・増強回数の変更も反映後に入力欄が増減する）
+    with st.form("settings_form"):
+
+        # ----------------------------------------------------
+        # 収入パラメータ（メイン領域）
+        # ----------------------------------------------------
+
+
+        st.header("収入パラメータ設定")
+        st.subheader("アプリ課金")
+        st.caption(f"プラットフォーマー手数料＝15%")
+
+        col = st.columns(2)
+        with col[0]:
+            st.number_input("アプリ月額料金（円）", min_value=0, step=10, key=ui_key("app.monthly_fee"))
+            st.number_input("無料期間（月）", min_value=0, max_value=24, step=1, key=ui_key("app.free_months"))
+        with col[1]:
+            st.number_input("月間解約率（%）", min_value=0.0, max_value=50.0, step=0.5, key=ui_key("app.churn_rate_pct"))
+            st.number_input("継続期間別の解約率（区間数）", min_value=0, max_value=12, step=1,
+                            key=ui_key("app.num_churn_segments"))
+
+        # 課金開始からの継続期間ごとの解約率（先頭の区間から順に適用し、区間の後は月間解約率）
+        num_churn_segments = int(st.session_state[ui_key("app.num_churn_segments")])
+        if num_churn_segments:
             col = st.columns(2)
             with col[0]:
-                st.text_input("ロボット名", key=ui_key(f"robot.items.{i}.name"))
-                st.number_input("小売価格（円）", min_value=0, step=1_000, key=ui_key(f"robot.items.{i}.price"))
-                st.number_input("販売開始月", min_value=0, step=1, key=ui_key(f"robot.items.{i}.release_month"))
+                for i in range(num_churn_segments):
+                    st.number_input(f"区間 No{i+1} の期間（月）", step=1,
+                                    min_value=min_value("app.churn_segments.*.months"),
+                                    key=ui_key(f"app.churn_segments.{i}.months"))
             with col[1]:
-                st.number_input("販売手数料率（%）", min_value=0.0, max_value=25.0, step=1.0, key=ui_key(f"robot.items.{i}.commission_rate_pct"))
-
-    # ---- 計算用 params を組み立て（内部表現に正規化）----
-    params = build_params_from_state()
-
-    # app
-    monthly_fee = params["app"]["monthly_fee"]
-    free_months = params["app"]["free_months"]
-    churn_rate = params["app"]["churn_rate"]
-
-    # robot（配列に展開：既存計算を壊さないため）
-    num_robot_types = params["robot"]["num_types"]
-    robot_names = [r["name"] for r in params["robot"]["items"]]
-    robot_prices = [r["price"] for r in params["robot"]["items"]]
-    release_month = [r["release_month"] for r in params["robot"]["items"]]
-    commission_rates = [r["commission_rate"] for r in params["robot"]["items"]]
-    purchase_rates = [r["purchase_rate"] for r in params["robot"]["items"]]
-
-
-    # ----------------------------------------------------
-    # 販売会社（★毎月の増加数をパラメータ化）
-    # ----------------------------------------------------
-    st.subheader("販売会社（増加数）")
-    col = st.columns(2)
-    with col[0]:
-        initial_companies = st.number_input("開始販売会社数", min_value=1, step=1,
-                                            key=ui_key("dealer.initial_companies"))
-        max_companies = st.number_input("販売会社数の上限（社）", min_value=1, step=1,
-                                        key=ui_key("dealer.max_companies"))
-    with col[1]:
-        fixed_months_before_growth = st.number_input("初期実証期間", min_value=1, step=1,
-                                                     key=ui_key("dealer.fixed_months_before_growth"))
-        company_growth_per_month = st.number_input(
-        "販売会社数の毎月の増加数（社／月）", min_value=0, step=1,
-            key=ui_key("dealer.company_growth_per_month"))
-
-    st.caption(f"販売会社数：1社（{fixed_months_before_growth}ヶ月）→ 以降は毎月の増加数だけ増加 → 上限に達したら停止")
-
-    st.markdown("---")
-
-
-    # ----------------------------------------------------
-    # 支出パラメータ（メイン領域）
-    # ----------------------------------------------------
-    st.header("支出パラメータ設定")
-    st.subheader("アプリ開発・不具合修正")
-    col = st.columns(2)
-    with col[0]:
-        android_dev_initial = st.number_input("Android 初期開発費（万円）", min_value=0, step=10,
-                                              key=ui_key("develop.android_dev_initial")) * 10000
-        ios_dev_initial = st.number_input("iPhone 初期開発費（万円）", min_value=0, step=10,
-                                          key=ui_key("develop.ios_dev_initial")) * 10000
-        ios_dev_month = st.number_input("iPhone開発時期", min_value=0, step=1,
-                                        key=ui_key("develop.ios_dev_month"))
-        robot_if_dev = st.number_input("ロボットI/F開発費（万円）", min_value=0, step=10,
-                                          key=ui_key("develop.robot_if_dev")) * 10000
-    with col[1]:
-        android_bugfix_cost = st.number_input("Android 不具合修正費用（万円）", min_value=0,  step=10,
-                                              key=ui_key("develop.android_bugfix_cost")) * 10000
-        ios_bugfix_cost = st.number_input("iPhone 不具合修正費用（万円）", min_value=0, step=10,
-                                          key=ui_key("develop.ios_bugfix_cost")) * 10000
-        bugfix_cycle_months = st.number_input("不具合修正リリース周期（ヶ月）", min_value=1, step=1,
-                                              key=ui_key("develop.bugfix_cycle_months"))
-
-    st.subheader("クラウドシステム")
-    col = st.columns(2)
-    with col[0]:
-        cloud_initial = st.number_input("クラウド初期構築費用（万円）",
-                                        min_value=0, step=10,
-                                        key=ui_key("cloud.initial_cost")) * 10000
-        cloud_bugfix_cost = st.number_input("クラウド不具合修正費用（万円）",
-                                            min_value=0, step=10,
-                                            key=ui_key("cloud.bugfix_cost")) * 10000
-        # --- 置換：クラウド増強回数（保存/読込対象） ---
-        st.number_input(
-            "クラウド増強回数",
-            min_value=0,
-            step=1,
-            key=ui_key("cloud.num_thresholds"),
+                for i in range(num_churn_segments):
+                    st.number_input(f"区間 No{i+1} の月間解約率（%）", min_value=0.0, max_value=100.0, step=0.5,
+                                    key=ui_key(f"app.churn_segments.{i}.churn_rate_pct"))
+
+
+        st.subheader("ロボット販売収益")
+
+        # ロボット種別は1行1種類の表で編集（行の追加・削除、表計算ソフトからの貼り付けも可）
+        st.caption(f"ロボット種類数：{len(st.session_state[ui_key('robot.table')]['name']):,}"
+                   "（行の追加・削除は「設定を反映」で確定）")
+        st.data_editor(
+            st.session_state[ui_key("robot.table")],
+            key=table_editor_key("robot.table"),
+            num_rows="dynamic",
+            use_container_width=True,
+            column_config={
+                "name": st.column_config.TextColumn("ロボット名", required=True),
+                "price": st.column_config.NumberColumn("小売価格（円）", min_value=0, step=1_000, format="%d",
+                                                       default=ROBOT_DEFAULTS["price"]),
+                "commission_rate_pct": st.column_config.NumberColumn(
+                    "販売手数料率（%）", min_value=0.0, max_value=25.0, step=0.1,
+                    default=ROBOT_DEFAULTS["commission_rate_pct"]),
+                "purchase_rate_pct": st.column_config.NumberColumn(
+                    "購入率（%）", min_value=0.0, max_value=10.0, step=0.01,
+                    default=ROBOT_DEFAULTS["purchase_rate_pct"]),
+                "release_month": st.column_config.NumberColumn("販売開始月", min_value=0, step=1, format="%d",
+                                                               default=ROBOT_DEFAULTS["release_month"]),
+                "churn_multiplier": st.column_config.NumberColumn(
+                    "解約率の倍率", help="購入者の月間解約率に掛ける倍率", min_value=0.0, step=0.1,
+                    default=ROBOT_DEFAULTS["churn_multiplier"]),
+            },
         )
 
-    with col[1]:
-        aws_cost_per_user_month = st.number_input("AWS費用（有料会員あたり月額・円）",
-                                                  min_value=0, step=5,
-                                                  key=ui_key("cloud.aws_cost_per_user_month"))
-
-    num_thresholds = int(st.session_state[ui_key("cloud.num_thresholds")])
 
-    # 結果格納用の配列
-    cloud_scale_thresholds = []
-    cloud_scale_costs = []
-
-    col = st.columns(2)
-    with col[0]:
-        for i in range(num_thresholds):
-            threshold = st.number_input(
-                f"クラウド増強閾値 No{i+1}（有料会員数）",
-                min_value=0,
-                step=100,
-                key=ui_key(f"cloud.thresholds.{i}"),
+        # ----------------------------------------------------
+        # 販売会社（★毎月の増加数をパラメータ化）
+        # ----------------------------------------------------
+        st.subheader("販売会社（増加数）")
+        col = st.columns(2)
+        with col[0]:
+            initial_companies = st.number_input("開始販売会社数", step=1,
+                                                min_value=min_value("dealer.initial_companies"),
+                                                key=ui_key("dealer.initial_companies"))
+            max_companies = st.number_input("販売会社数の上限（社）", step=1,
+                                            min_value=min_value("dealer.max_companies"),
+                                            key=ui_key("dealer.max_companies"))
+        with col[1]:
+            fixed_months_before_growth = st.number_input("初期実証期間", step=1,
+                                                         min_value=min_value("dealer.fixed_months_before_growth"),
+                                                         key=ui_key("dealer.fixed_months_before_growth"))
+            company_growth_per_month = st.number_input(
+            "販売会社数の毎月の増加数（社／月）", min_value=0, step=1,
+                key=ui_key("dealer.company_growth_per_month"))
+
+        st.caption(f"販売会社数：1社（{fixed_months_before_growth}ヶ月）→ 以降は毎月の増加数だけ増加 → 上限に達したら停止")
+
+        st.radio("販売会社のモデル", ["aggregate", "agents"], horizontal=True,
+                 format_func={"aggregate": "全社同じ", "agents": "販売会社ごと"}.get, key=ui_key("dealer.model"))
+        with st.expander("販売会社ごとのモデルの設定（イベント数・集客数のばらつき、立ち上がり、解約）"):
+            st.caption("上の増加ペースで契約した販売会社を1社ずつ計算します（解約した販売会社の補充はしません）")
+            col = st.columns(3)
+            with col[0]:
+                st.number_input("イベント数の変動係数", min_value=0.0, step=0.1,
+                                key=ui_key("dealer.agents.event_rate_cv"))
+                st.number_input("集客数の変動係数", min_value=0.0, step=0.1,
+                                key=ui_key("dealer.agents.attendees_cv"))
+            with col[1]:
+                st.number_input("立ち上がり期間（ヶ月）", min_value=0, step=1,
+                                key=ui_key("dealer.agents.ramp_months"))
+                st.number_input("契約直後の稼働率（0〜1）", min_value=0.0, max_value=1.0, step=0.1,
+                                key=ui_key("dealer.agents.ramp_start"))
+            with col[2]:
+                st.number_input("販売会社の月間解約率（%）", min_value=0.0, max_value=100.0, step=0.5,
+                                key=ui_key("dealer.agents.churn_rate_pct"))
+                st.number_input("乱数シード", min_value=0, step=1, key=ui_key("dealer.agents.seed"))
+
+        st.markdown("---")
+
+
+        # ----------------------------------------------------
+        # 支出パラメータ（メイン領域）
+        # ----------------------------------------------------
+        st.header("支出パラメータ設定")
+        st.subheader("アプリ開発・不具合修正")
+        col = st.columns(2)
+        with col[0]:
+            android_dev_initial = st.number_input("Android 初期開発費（万円）", min_value=0, step=10,
+                                                  key=ui_key("develop.android_dev_initial")) * 10000
+            ios_dev_initial = st.number_input("iPhone 初期開発費（万円）", min_value=0, step=10,
+                                              key=ui_key("develop.ios_dev_initial")) * 10000
+            ios_dev_month = st.number_input("iPhone開発時期", min_value=0, step=1,
+                                            key=ui_key("develop.ios_dev_month"))
+            robot_if_dev = st.number_input("ロボットI/F開発費（万円）", min_value=0, step=10,
+                                              key=ui_key("develop.robot_if_dev")) * 10000
+        with col[1]:
+            android_bugfix_cost = st.number_input("Android 不具合修正費用（万円）", min_value=0,  step=10,
+                                                  key=ui_key("develop.android_bugfix_cost")) * 10000
+            ios_bugfix_cost = st.number_input("iPhone 不具合修正費用（万円）", min_value=0, step=10,
+                                              key=ui_key("develop.ios_bugfix_cost")) * 10000
+            bugfix_cycle_months = st.number_input("不具合修正リリース周期（ヶ月）", step=1,
+                                                  min_value=min_value("develop.bugfix_cycle_months"),
+                                                  key=ui_key("develop.bugfix_cycle_months"))
+
+        st.subheader("クラウドシステム")
+        col = st.columns(2)
+        with col[0]:
+            cloud_initial = st.number_input("クラウド初期構築費用（万円）",
+                                            min_value=0, step=10,
+                                            key=ui_key("cloud.initial_cost")) * 10000
+            cloud_bugfix_cost = st.number_input("クラウド不具合修正費用（万円）",
+                                                min_value=0, step=10,
+                                                key=ui_key("cloud.bugfix_cost")) * 10000
+
+        with col[1]:
+            aws_cost_per_user_month = st.number_input("AWS費用（有料会員あたり月額・円）",
+                                                      min_value=0, step=5,
+                                                      key=ui_key("cloud.aws_cost_per_user_month"))
+
+        # クラウド増強の閾値・AWS の段階料金は表で編集（行の追加・削除・貼り付け可、順不同）
+        col = st.columns(2)
+        with col[0]:
+            st.caption("クラウド増強（有料会員数が閾値に初めて届いた月に費用を計上）")
+            st.data_editor(
+                st.session_state[ui_key("cloud.scale_table")],
+                key=table_editor_key("cloud.scale_table"),
+                num_rows="dynamic",
+                use_container_width=True,
+                column_config={
+                    "threshold": st.column_config.NumberColumn("閾値（有料会員数）", min_value=0, step=100,
+                                                               format="%d", default=0),
+                    "scale_cost": st.column_config.NumberColumn("増強費用（万円）", min_value=0, step=10,
+                                                                format="%d", default=0),
+                },
+            )
+        with col[1]:
+            st.caption("AWS 段階料金（人数を超えた分の有料会員に適用、未設定なら全員に上の単価）")
+            st.data_editor(
+                st.session_state[ui_key("cloud.aws_table")],
+                key=table_editor_key("cloud.aws_table"),
+                num_rows="dynamic",
+                use_container_width=True,
+                column_config={
+                    "users": st.column_config.NumberColumn("超過人数（有料会員数）", min_value=0, step=100,
+                                                           format="%d", default=0),
+                    "cost_per_user_month": st.column_config.NumberColumn("単価（円/人・月）", min_value=0, step=5,
+                                                                         format="%d", default=0),
+                },
             )
-            cloud_scale_thresholds.append(int(threshold))
-    with col[1]:
-        for i in range(num_thresholds):
-            cost = st.number_input(
-                f"クラウド増強費用 No{i+1}（万円）",
-                min_value=0,
-                step=10,
-                key=ui_key(f"cloud.scale_costs.{i}"),
-            ) * 10000  # 円換算
-            cloud_scale_costs.append(int(cost))
 
-    st.markdown("---")
-    st.subheader("販売店向けロボット・販売ツール")
-    col11, col12 = st.columns(2)
-    with col11:
-        robot_unit_cost = st.number_input("ロボット1式費用（円）", min_value=0, step=1000,
-                                          key=ui_key("tool.robot_unit_cost"))
-        sales_tool_cost_per_shop = st.number_input("販売ツール一式費用／社（万円）", min_value=0, step=1,
-                                                   key=ui_key("tool.sales_tool_cost_per_shop")) * 10000
-    with col12:
-        robots_per_shop = st.number_input("販売店あたりロボット台数（台）", min_value=0, step=1,
-                                          key=ui_key("tool.robots_per_shop"))
-
-    st.subheader("カスタマーサポート")
-    colmk5, colmk6 = st.columns(2)
-    with colmk5:
-        cs_cost_per_user_month = st.number_input("CS費用（有料会員あたり月額・円）", min_value=0, step=10,
-                                                 key=ui_key("sport.cs_cost_per_user_month"))
-
-    st.subheader("事業体人件費")
-    col13, col14 = st.columns(2)
-    with col13:
-        base_fte = st.number_input("初期事業体要員（人）", min_value=0.0, step=0.1,
-                                   key=ui_key("labor.base_fte"))
-        fte_cost_per_month = st.number_input("人月当たり人件費（万円）", min_value=0, step=10,
-                                             key=ui_key("labor.fte_cost_per_month")) * 10000
-    with col14:
-        base_users = st.number_input("増員なしの上限（有料会員数）", min_value=0, step=100,
-                                     key=ui_key("labor.base_users"))
-        fte_increment_users = st.number_input("増員基準（有料会員数）", min_value=1, step=100,
-                                              key=ui_key("labor.fte_increment_users"))
-        fte_increment = st.number_input("追加人員（人）", min_value=0.0, step=0.1,
-                                        key=ui_key("labor.fte_increment"))
+        st.markdown("---")
+        st.subheader("販売店向けロボット・販売ツール")
+        col11, col12 = st.columns(2)
+        with col11:
+            robot_unit_cost = st.number_input("ロボット1式費用（円）", min_value=0, step=1000,
+                                              key=ui_key("tool.robot_unit_cost"))
+            sales_tool_cost_per_shop = st.number_input("販売ツール一式費用／社（万円）", min_value=0, step=1,
+                                                       key=ui_key("tool.sales_tool_cost_per_shop")) * 10000
+        with col12:
+            robots_per_shop = st.number_input("販売店あたりロボット台数（台）", min_value=0, step=1,
+                                              key=ui_key("tool.robots_per_shop"))
+
+        st.subheader("カスタマーサポート")
+        colmk5, colmk6 = st.columns(2)
+        with colmk5:
+            cs_cost_per_user_month = st.number_input("CS費用（有料会員あたり月額・円）", min_value=0, step=10,
+                                                     key=ui_key("sport.cs_cost_per_user_month"))
+
+        st.subheader("事業体人件費")
+        col13, col14 = st.columns(2)
+        with col13:
+            base_fte = st.number_input("初期事業体要員（人）", min_value=0.0, step=0.1,
+                                       key=ui_key("labor.base_fte"))
+            fte_cost_per_month = st.number_input("人月当たり人件費（万円）", min_value=0, step=10,
+                                                 key=ui_key("labor.fte_cost_per_month")) * 10000
+        with col14:
+            base_users = st.number_input("増員なしの上限（有料会員数）", min_value=0, step=100,
+                                         key=ui_key("labor.base_users"))
+            fte_increment_users = st.number_input("増員基準（有料会員数）", step=100,
+                                                  min_value=min_value("labor.fte_increment_users"),
+                                                  key=ui_key("labor.fte_increment_users"))
+            fte_increment = st.number_input("追加人員（人）", min_value=0.0, step=0.1,
+                                            key=ui_key("labor.fte_increment"))
+
+        # ----------------------------------------------------
+        # 時間で変わる項目（料金改定・解約率の改善・人件費の上昇など）
+        # ----------------------------------------------------
+        st.markdown("---")
+        st.subheader("時間で変わる項目（スケジュール）")
+        st.caption("1行が1区間：開始月（0始まり）から次の区間の開始月まで、その値を使います（最初の区間より前は最初の値）。"
+                   "伸び率を入れると区間の中で毎月その率で増減します。表にある項目は上の入力欄の値の代わりに使います"
+                   "（率の項目は %、万円の項目は万円）")
+        robot_names = st.session_state[ui_key("robot.table")]["name"]
+        schedule_options = [field.replace("*", str(i)) for field in SCHEDULE_FIELDS
+                            for i in (range(len(robot_names)) if "*" in field else [0])]
+
+        def schedule_label(path: str) -> str:
+            parts = path.split(".")
+            if parts[:2] == ["robot", "items"] and int(parts[2]) < len(robot_names):
+                return f"{robot_names[int(parts[2])]}.{parts[3]}"
+            return path
+
+        st.data_editor(
+            st.session_state[ui_key("schedule.table")],
+            key=table_editor_key("schedule.table"),
+            num_rows="dynamic",
+            use_container_width=True,
+            column_config={
+                "path": st.column_config.SelectboxColumn("項目", options=schedule_options, format_func=schedule_label,
+                                                         required=True,
+                                                         default=TABLE_DEFAULTS["schedule.table"]["path"]),
+                "month": st.column_config.NumberColumn("開始月", min_value=0, step=1, format="%d", default=0),
+                "value": st.column_config.NumberColumn("値", default=0.0),
+                "growth_pct": st.column_config.NumberColumn("月間の伸び率（%）", step=0.1, default=0.0),
+            },
+        )
+        schedule_params = build_params_from_state()
+        for path in schedules_from_table(edited_table("schedule.table")):
+            error = schedule_error(schedule_params, path)
+            if error:
+                st.warning(f"{schedule_label(path)}：{error}（この項目のスケジュールは使いません）")
 
+        st.form_submit_button("設定を反映", type="primary")
 
-# ----------------------------------------------------
-# 配列の準備（★MONTHS に応じて動的生成）
-# ----------------------------------------------------
-contract_companies = [0] * MONTHS
-events_per_month = [0] * MONTHS
-new_users = [0] * MONTHS
-trial_starts = [0] * MONTHS
-paying_users = [0.0] * MONTHS
-app_revenue = [0.0] * MONTHS
-commission_revenue = [0.0] * MONTHS
-total_revenue = [0.0] * MONTHS
 
 # ----------------------------------------------------
-# 月次シミュレーション（収益）
+# 月次シミュレーション（収益・支出・年次集計）
 # ----------------------------------------------------
-# ループの前で、ロボット種別ごとの販売台数配列を用意しておく
-robot_sales_by_type = [[0] * MONTHS for _ in range(num_robot_types)]
-
-for m in range(MONTHS):
-
-    # 契約販売会社数の推移
-    if m < fixed_months_before_growth:
-        companies = initial_companies
-    else:
-        months_since_growth = m - fixed_months_before_growth + 1
-        companies = initial_companies + company_growth_per_month * months_since_growth
-        companies = min(companies, max_companies)
-
-    contract_companies[m] = companies
-
-    # イベント数
-    events = companies * events_per_company_per_month
-    events_per_month[m] = events
-
-
-
-    # --- 複数種類のロボットに対応した計算 ---
-
-    total_robots_sold = 0
-    total_commission = 0.0
-
-    for i in range(num_robot_types):
-        # 種類ごとの販売台数（イベント数 × 集客数　×　種別ごとの購入率）
-        if m > release_month[i]:
-            robots_sold_i = int(events *  attendees_per_event * purchase_rates[i])
-        else:
-            robots_sold_i = 0
-        robot_sales_by_type[i][m] = robots_sold_i
-
-        # 全種類の販売台数を合計（= 新規ユーザー数）
-        total_robots_sold += robots_sold_i
-
-        # 種類ごとの販売手数料
-        commission_i = robots_sold_i * robot_prices[i] * commission_rates[i]
-        total_commission += commission_i
-
-    # 新規ユーザー（全ロボット種別の合計販売台数）
-    new_users[m] = total_robots_sold
-    trial_starts[m] = total_robots_sold + robot_uio_users_per_month
-
-    # 販売手数料収入（全ロボット種別の合計）
-    commission_revenue[m] = total_commission
-
-    # 有料会員数
-    prev = paying_users[m - 1] if m > 0 else 0
-    churn = prev * churn_rate
-    remaining = prev - churn
-
-    # 無料期間後に課金開始
-    conversions = trial_starts[m - free_months] if m >= free_months else 0
-    paying_users[m] = remaining + conversions
+params = build_params_from_state()
+fingerprint = params_fingerprint(params, years, attendees_per_event, events_per_company_per_month,
+                                 robot_uio_users_per_month)
+# セッションごとの差分再計算エンジン（変更のあった計算段と下流だけを再計算）
+# 計算済みの結果はディスクの結果ストアにも保存し、サーバーの再起動後も同じ設定なら読み込むだけにする
+engine = st.session_state.setdefault("incremental_engine", IncrementalSimulator())
+res = simulate_cached(params, years, attendees_per_event, events_per_company_per_month, robot_uio_users_per_month,
+                      engine=engine.simulate, key=fingerprint, store=RESULT_STORE)
 
-    # アプリ収入
-    app_revenue[m] = paying_users[m] * monthly_fee * 0.85
-
-    # 総売上
-    total_revenue[m] = app_revenue[m] + commission_revenue[m]
 
 # ----------------------------------------------------
-# ★ 支出シミュレーション（有料会員数ベース）
+# Plotly の図はタブ単位で、表示中のタブの分だけ作る
+# 結果の指紋ごとにキャッシュ（全セッションで共有、同じ結果なら図を作り直さない）
+# 図と一緒に、ブラウザへ送る JSON の大きさ（バイト）も返す
+# options は図を作る関数への追加の引数（サマリーの年次の区切りなど、キャッシュのキーにも含まれる）
 # ----------------------------------------------------
-
-# 「ユーザー数に応じた費用」は有料会員数を使う
-users_for_cost = paying_users  # ここがポイント
-
-# 月次支出項目の配列
-cost_app_android_initial = [0] * MONTHS
-cost_app_ios_initial = [0] * MONTHS
-cost_robot_if_dev = [0] * MONTHS
-cost_app_android_bugfix = [0] * MONTHS
-cost_app_ios_bugfix = [0] * MONTHS
-
-cost_cloud_initial_arr = [0] * MONTHS
-cost_cloud_aws = [0] * MONTHS
-cost_cloud_bugfix_arr = [0] * MONTHS
-cost_cloud_scale = [0] * MONTHS
-
-cost_shop_acquisition = [0] * MONTHS
-cost_customer_support = [0] * MONTHS
-
-potstill_fte = [0.0] * MONTHS
-cost_potstill_salary = [0.0] * MONTHS
-
-# 初期費用（アプリ・ロボットI/F・クラウド）
-if MONTHS > 0:
-    cost_app_android_initial[0] = android_dev_initial
-    cost_app_ios_initial[ios_dev_month] = ios_dev_initial
-    for i in range(num_robot_types):
-        cost_robot_if_dev[int(st.session_state.get(ui_key(f"robot.items.{i}.release_month"), 0))] = robot_if_dev
-    cost_cloud_initial_arr[0] = cloud_initial
-
-# 不具合修正：bugfix_cycle_months ごと
-for m in range(MONTHS):
-    if m % bugfix_cycle_months == 0:
-        if m < 1:
-            cost_app_android_bugfix[m] = 0
-            cost_cloud_bugfix_arr[m] = 0
+@st.cache_resource(max_entries=32, show_spinner=False)
+def cached_figures(fingerprint: str, tab: str, _res, **options) -> tuple:
+    figs = FIGURE_BUILDERS[tab](_res, **options)
+    return figs, payload_bytes(figs)
+
+
+# 感度分析の項目名（ロボット種別はパスの番号をロボット名に置き換え）
+def sensitivity_label(path: str, params: dict) -> str:
+    parts = path.split(".")
+    if parts[:2] == ["robot", "items"]:
+        return f"{params['robot']['items'][int(parts[2])]['name']}.{'.'.join(parts[3:])}"
+    return path
+
+
+# ゴールシークの結果を設定に反映（ボタンの on_click で呼ぶ：ウィジェット生成前に session_state を更新するため）
+# ※率の項目は画面上は % 入力なので 100 倍して書き込む
+def apply_goal_seek_value(path: str, value) -> None:
+    parts = path.split(".")
+    if "schedule" in parts:
+        # スケジュールの区間は表の行（同じ項目の何番目の行か）を書き換える
+        at = parts.index("schedule")
+        target, segment, name = ".".join(parts[:at]), int(parts[at + 1]), parts[at + 2]
+        row = [i for i, p in enumerate(edited_table("schedule.table")["path"]) if p == target][segment]
+        if name == "growth":
+            set_table_cell("schedule.table", "growth_pct", row, float(value) * 100.0)
         else:
-            cost_app_android_bugfix[m] = android_bugfix_cost
-            cost_cloud_bugfix_arr[m] = cloud_bugfix_cost
-        if m < ios_dev_month + 1:
-            cost_app_ios_bugfix[m] = 0
+            set_table_cell("schedule.table", "value", row, float(value) * (100.0 if target.endswith("_rate") else 1.0))
+    elif parts[:2] == ["robot", "items"]:
+        # 表で編集する項目は表の1セルを書き換え、data_editor を作り直す
+        if parts[3].endswith("_rate"):
+            set_table_cell("robot.table", f"{parts[3]}_pct", int(parts[2]), float(value) * 100.0)
         else:
-            cost_app_ios_bugfix[m] = ios_bugfix_cost
-
-
-# AWS費用・CS費用（有料会員数に比例）
-for m in range(MONTHS):
-    users = users_for_cost[m]
-    cost_cloud_aws[m] = users * aws_cost_per_user_month
-    cost_customer_support[m] = users * cs_cost_per_user_month
-
-# クラウド増強費用（有料会員数が閾値を初めて超えた月に1回だけ）
-threshold_flags = [False] * len(cloud_scale_thresholds)
-for m in range(MONTHS):
-    users_prev = users_for_cost[m - 1] if m > 0 else 0
-    users_now = users_for_cost[m]
-    for i, th in enumerate(cloud_scale_thresholds):
-        if threshold_flags[i]:
-            continue
-        if users_prev < th <= users_now:
-            cost_cloud_scale[m] += cloud_scale_costs[i]
-            threshold_flags[i] = True
-
-# 販売店ごとのロボット・ツール費用（新規販売会社数×一式費用）
-new_companies = [0] * MONTHS
-for m in range(MONTHS):
-    if m == 0:
-        new_companies[m] = contract_companies[m]
+            set_table_cell("robot.table", parts[3], int(parts[2]), value)
+    elif ".".join(parts[:2]) in TABLE_COLUMNS:
+        set_table_cell(*TABLE_COLUMNS[".".join(parts[:2])], int(parts[2]), value)
+    elif path.endswith("_rate"):
+        st.session_state[ui_key(f"{path}_pct")] = float(value) * 100.0
     else:
-        diff = contract_companies[m] - contract_companies[m - 1]
-        new_companies[m] = diff if diff > 0 else 0
-
-per_shop_acquisition_cost = robots_per_shop * robot_unit_cost + sales_tool_cost_per_shop
-for m in range(MONTHS):
-    cost_shop_acquisition[m] = new_companies[m] * per_shop_acquisition_cost
-
-# 事業体人件費（有料会員数ベース）
-for m in range(MONTHS):
-    users = users_for_cost[m]
-    users_over_base = max(0, users - base_users)
-    increments = math.ceil(users_over_base / fte_increment_users) if users_over_base > 0 else 0
-    fte = base_fte + increments * fte_increment
-    potstill_fte[m] = fte
-    cost_potstill_salary[m] = fte * fte_cost_per_month
-
-# 月次総支出
-total_expense = [0.0] * MONTHS
-for m in range(MONTHS):
-    total_expense[m] = (
-        cost_app_android_initial[m]
-        + cost_app_ios_initial[m]
-        + cost_robot_if_dev[m]
-        + cost_app_android_bugfix[m]
-        + cost_app_ios_bugfix[m]
-        + cost_cloud_initial_arr[m]
-        + cost_cloud_aws[m]
-        + cost_cloud_bugfix_arr[m]
-        + cost_cloud_scale[m]
-        + cost_shop_acquisition[m]
-        + cost_customer_support[m]
-        + cost_potstill_salary[m]
-    )
-
-# 月次利益（売上－支出）
-profit = [total_revenue[m] - total_expense[m] for m in range(MONTHS)]
-
-# ----------------------------------------------------
-# 年次集計（★years に応じて可変）
-# ----------------------------------------------------
-annual_total = []
-annual_app = []
-annual_commission = []
-annual_robot_sales = []
-annual_expense = []
-annual_profit = []
+        st.session_state[ui_key(path)] = value
 
-for y in range(years):
-    start = y * 12
-    end = min((y + 1) * 12, MONTHS)
 
-    annual_total.append(sum(total_revenue[start:end]) / 10000)
-    annual_app.append(sum(app_revenue[start:end]) / 10000)
-    annual_commission.append(sum(commission_revenue[start:end]) / 10000)
-    annual_robot_sales.append(sum(new_users[start:end]))
-    annual_expense.append(sum(total_expense[start:end]) / 10000)
-    annual_profit.append(sum(profit[start:end]) / 10000)
+def apply_optimized_values(values: dict) -> None:
+    for path, value in values.items():
+        apply_goal_seek_value(path, value)
 
-# 年間ロボット販売台数（種類別）
-annual_robot_sales_by_type = [
-    [0] * years for _ in range(num_robot_types)
-]
-
-for i in range(num_robot_types):
-    for y in range(years):
-        start = y * 12
-        end = min((y + 1) * 12, MONTHS)
-        annual_robot_sales_by_type[i][y] = sum(robot_sales_by_type[i][start:end])
 
+# P10〜P90 の帯と P50 の線（bands の先頭軸が P10 / P50 / P90）
+def add_band_traces(fig, x, bands, name: str, row: int) -> None:
+    fig.add_trace(go.Scatter(x=x, y=bands[2], name=f"{name} P90", mode="lines",
+                             line=dict(width=0), showlegend=False), row=row, col=1)
+    fig.add_trace(go.Scatter(x=x, y=bands[0], name=f"{name} P10〜P90", mode="lines",
+                             line=dict(width=0), fill="tonexty", fillcolor="rgba(31, 93, 186, 0.2)"),
+                  row=row, col=1)
+    fig.add_trace(go.Scatter(x=x, y=bands[1], name=f"{name} P50", mode="lines",
+                             line=dict(color="#1F5DBA")), row=row, col=1)
 
 
 # ----------------------------------------------------
-# 追加：年間 売上・支出・利益・累損 グラフ
+# 時間のかかる分析（モンテカルロ・グローバル感度分析・最適化）はバックグラウンドのジョブで実行
+#   （jobs.JOBS：全セッションで共有、同じ params・設定の分析は1回だけ実行して結果を使い回す）
+#   実行中は job_progress が JOB_POLL_SECONDS ごとに進捗・途中結果だけを描き直し、
+#   完了したら画面全体を再実行して結果を表示する。その間も他の操作はそのまま受け付ける
 # ----------------------------------------------------
-# 累損（＝年間利益の累計）を計算
-cumulative_loss = []
-running = 0
-for p in annual_profit:
-    running += p
-    cumulative_loss.append(running)
+JOB_POLL_SECONDS = 0.5
+ANALYSIS_WORKERS = os.cpu_count() or 1  # 最適化・グローバル感度分析で共有するプロセスプールの大きさ
+
+
+# 最適化・グローバル感度分析の評価に使うプロセスプール（全セッション・全ジョブで1つ）
+#   同時に実行する分析がいくつあってもプロセス数は ANALYSIS_WORKERS まで。サーバーはスレッドを使っているので
+#   fork ではなく spawn で起動する。ワーカーが落ちて使えなくなったプールは作り直す
+@st.cache_resource(show_spinner=False)
+def _analysis_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+def analysis_executor() -> ProcessPoolExecutor:
+    pool = _analysis_pool()
+    if getattr(pool, "_broken", False):
+        _analysis_pool.clear()
+        pool = _analysis_pool()
+    return pool
+
+
+# 中止ボタンの on_click：ジョブを止め、パネルの実行状態（state_key）を value に戻す
+def cancel_job(key: str, state_key: str, value) -> None:
+    job = JOBS.get(key)
+    if job is not None:
+        job.cancel()
+    st.session_state[state_key] = value
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(key: str, cancel_key: str, state_key: str, reset_value, render_partial=None) -> None:
+    job = JOBS.get(key)
+    if job is None or job.finished:
+        st.rerun()  # 完了：画面全体を再実行して結果を表示（この部分の定期実行も終わる）
+    col = st.columns([5, 1])
+    col[0].progress(job.progress, text=f"計算中… {job.done:,} / {job.total:,}（{job.elapsed:,.0f} 秒）")
+    col[1].button("中止", key=cancel_key, on_click=cancel_job, args=(key, state_key, reset_value))
+    if render_partial is not None and job.partial is not None:
+        render_partial(job.partial)
+
+
+# 完了したジョブの結果（失敗・中止ならメッセージを表示して None）
+def job_result(job):
+    if job.status == "error":
+        st.error(f"分析に失敗しました：{job.error}")
+        return None
+    if job.status == "cancelled":
+        st.info("分析を中止しました")
+        return None
+    st.caption(f"計算時間：{job.elapsed:,.1f} 秒")
+    return job.result
 
-years_labels = [f"{y+1}年目" for y in range(years)]
-months = list(range(1, MONTHS + 1))
 
 # ----------------------------------------------------
-# Plotly: 5段構成のサブプロット（収益部分は元コード準拠）
+# 分析パネル（st.fragment：パネル内の入力を変えてもそのパネルだけを再実行し、
+# KPI・グラフ・設定タブは作り直さない）
 # ----------------------------------------------------
 
-fig_colors  = ["#1F5DBA", "#2E8B57", "#DAA520", "#ff9da7"]
-
-with tab_graphs:
-
-
-
-    fig = make_subplots(
-        rows=2,
-        cols=1,
-        specs=[
-            [{"secondary_y": False}],
-            [{"secondary_y": False}],
-        ],
-        vertical_spacing=0.2,
-        subplot_titles=[
-            "総売上・販売手数料・アプリ収入",
-            "販売台数"
-        ]
-    )
-
-
-    # ④ 年間売上（総・手数料・アプリ）
-    fig.add_trace(go.Bar(x=years_labels, y=annual_total, name="総売上"), row=1, col=1)
-    fig.add_trace(go.Bar(x=years_labels, y=annual_commission, name="販売手数料収入"), row=1, col=1)
-    fig.add_trace(go.Bar(x=years_labels, y=annual_app, name="アプリ収入"), row=1, col=1)
-
-    # ⑤ 年間ロボット販売台数
-    # 種類別 年間販売台数の棒グラフ
-    for i in range(num_robot_types):
-        fig.add_trace(
-            go.Bar(
-                x=years_labels,
-                y=annual_robot_sales_by_type[i],
-                name=f"{robot_names[i]}"
-            ),
-            row=2,
-            col=1
+# -----------------------------
+# モンテカルロ分析（購入率・解約率・販売会社の増加・販売台数を確率的に生成）
+# -----------------------------
+@st.fragment
+def monte_carlo_panel(params: dict, years: int, attendees_per_event, events_per_company_per_month,
+                      robot_uio_users_per_month) -> None:
+    # 有料会員数の横軸は月（週次・日次は各ステップの終わりの月、端数あり）
+    step_month, dt = time_grid(years, time_settings(params)["step"])
+    months = np.arange(1, len(step_month) + 1) * dt
+    years_labels = [f"{y+1}年目" for y in range(years)]
+    st.markdown("---")
+    st.subheader("モンテカルロ分析（P10 / P50 / P90）")
+    col = st.columns(3)
+    with col[0]:
+        mc_samples = st.number_input("試行回数（本）", min_value=100, max_value=1_000_000, step=1_000,
+                                     key="mc_samples")
+        mc_seed = st.number_input("乱数シード", min_value=0, step=1, key="mc_seed")
+    with col[1]:
+        mc_purchase_conc = st.number_input("購入率の集中度（大きいほどばらつき小、0で固定）", min_value=0.0,
+                                           step=50.0, key="mc_purchase_conc")
+        mc_churn_conc = st.number_input("解約率の集中度（大きいほどばらつき小、0で固定）", min_value=0.0,
+                                        step=50.0, key="mc_churn_conc")
+    with col[2]:
+        mc_binomial = st.checkbox("販売台数を二項分布で生成", key="mc_binomial")
+        mc_poisson = st.checkbox("販売会社の増加をポアソン分布で生成", key="mc_poisson")
+        mc_streaming = st.checkbox("逐次集計（全パスを保持しない・分位点は近似）", key="mc_streaming")
+
+    if st.checkbox("モンテカルロ分析を実行", key="mc_enabled"):
+        mc_spec = MonteCarloSpec(
+            samples=int(mc_samples),
+            purchase_rate_concentration=float(mc_purchase_conc),
+            churn_rate_concentration=float(mc_churn_conc),
+            binomial_sales=mc_binomial,
+            poisson_dealer_growth=mc_poisson,
+            seed=int(mc_seed),
+            streaming=mc_streaming,
         )
+        fingerprint = params_fingerprint(params, years, attendees_per_event, events_per_company_per_month,
+                                         robot_uio_users_per_month)
+        job = JOBS.submit(job_key("monte_carlo", fingerprint, asdict(mc_spec)), "monte_carlo", run_monte_carlo,
+                          params, years, attendees_per_event, events_per_company_per_month,
+                          robot_uio_users_per_month, mc_spec)
+
+        def render(mc) -> None:
+            fig_mc = make_subplots(
+                rows=3,
+                cols=1,
+                vertical_spacing=0.08,
+                subplot_titles=["有料会員数（人）", "年間利益（万円）", "累損（累計利益・万円）"],
+            )
+            add_band_traces(fig_mc, months, mc.paying_users, "有料会員数", row=1)
+            add_band_traces(fig_mc, years_labels, mc.annual_profit, "年間利益", row=2)
+            add_band_traces(fig_mc, years_labels, mc.cumulative_loss, "累損", row=3)
+            fig_mc.update_layout(
+                height=1000,
+                title=f"モンテカルロ分析（{mc.samples:,}本）",
+                legend=dict(orientation="h", yanchor="bottom", y=-0.12, xanchor="center", x=0.5),
+            )
+            fig_mc.update_yaxes(tickformat=",")
+            st.plotly_chart(fig_mc, use_container_width=True)
 
-    fig.update_layout(
-        height=600,
-        barmode="group",
-        title="売上げ・販売台数",
-        legend=dict(orientation="h", yanchor="bottom", y=-0.12, xanchor="center", x=0.5),
-        colorway=fig_colors
-    )
-    fig.update_yaxes(tickformat=",")
-
-    st.plotly_chart(fig, use_container_width=True)
-
-
-    fig = make_subplots(
-        rows=3,
-        cols=1,
-        specs=[
-            [{"secondary_y": False}],
-            [{"secondary_y": True}],
-            [{"secondary_y": True}],
-        ],
-        vertical_spacing=0.06,
-        subplot_titles=[
-            "販売会社数・イベント数",
-            "新規ユーザー数（左軸）",
-            "有料会員数（左軸）・アプリ収入（右軸）",
-        ]
-    )
-
-    # ①
-    fig.add_trace(go.Bar(x=months, y=contract_companies, name="販売会社数"), row=1, col=1)
-    fig.add_trace(go.Bar(x=months, y=events_per_month, name="イベント数"), row=1, col=1)
-
-    # ②
-    fig.add_trace(go.Bar(x=months, y=new_users, name="新規ユーザー数", opacity=0.5),
-                  row=2, col=1, secondary_y=False)
-
-    # ③
-    fig.add_trace(go.Bar(x=months, y=paying_users, name="有料会員数", opacity=0.5),
-                  row=3, col=1, secondary_y=False)
-    fig.add_trace(go.Scatter(x=months, y=[x/10000 for x in app_revenue], name="アプリ収入", mode="lines"),
-                  row=3, col=1, secondary_y=True)
-
-
-    fig.update_layout(
-        height=1500,
-        barmode="group",
-        title="収益計算（ロボット販売 × アプリ課金）",
-        legend=dict(orientation="h", yanchor="bottom", y=-0.12, xanchor="center", x=0.5),
-    )
-    fig.update_yaxes(tickformat=",", secondary_y=False)
-    fig.update_yaxes(tickformat=",", title_text="金額（万円）", secondary_y=True)
-
-    st.plotly_chart(fig, use_container_width=True)
-
-
-    # 支出項目別 月次推移グラフ
-    st.subheader("支出項目別 月次推移")
-
-    # アプリ開発 月次推移グラフ
-    fig3 = go.Figure()
-
-    fig3.add_trace(go.Bar(x=months, y=[x/10000 for x in cost_app_android_initial], name="アプリ開発費（Android初期）"))
-    fig3.add_trace(go.Bar(x=months, y=[x/10000 for x in cost_app_ios_initial], name="アプリ開発費（iPhone初期）"))
-    fig3.add_trace(go.Bar(x=months, y=[x/10000 for x in cost_robot_if_dev], name="ロボットI/F開発費"))
-    fig3.add_trace(go.Bar(x=months, y=[x/10000 for x in cost_app_android_bugfix], name="アプリ不具合修正費（Android）"))
-    fig3.add_trace(go.Bar(x=months, y=[x/10000 for x in cost_app_ios_bugfix], name="アプリ不具合修正費（iPhone）"))
-
-    fig3.update_layout(
-        title="アプリ開発 月次推移",
-        xaxis_title="月",
-        yaxis_title="金額（万円）",
-        legend=dict(orientation="h", yanchor="bottom", y=-0.25, xanchor="center", x=0.5),
-        height=700,
-    )
-    fig3.update_yaxes(tickformat=",")
-
-    st.plotly_chart(fig3, use_container_width=True)
-
-    # クラウド費用 月次推移グラフ
-    fig4 = go.Figure()
-
-    fig4.add_trace(go.Bar(x=months, y=[x/10000 for x in cost_cloud_initial_arr], name="クラウド初期構築費"))
-    fig4.add_trace(go.Bar(x=months, y=[x/10000 for x in cost_cloud_aws], name="AWS費用（有料会員数連動）"))
-    fig4.add_trace(go.Bar(x=months, y=[x/10000 for x in cost_cloud_bugfix_arr], name="クラウド不具合修正費", ))
-    fig4.add_trace(go.Bar(x=months, y=[x/10000 for x in cost_cloud_scale], name="クラウド増強費用", ))
-
-    fig4.update_layout(
-        title="クラウド費用 月次推移（全費目）",
-        xaxis_title="月",
-        yaxis_title="金額（万円）",
-        legend=dict(orientation="h", yanchor="bottom", y=-0.25, xanchor="center", x=0.5),
-        height=700,
-    )
-    fig4.update_yaxes(tickformat=",")
-
-    st.plotly_chart(fig4, use_container_width=True)
-
-    # その他 月次推移グラフ
-    fig5 = go.Figure()
-
-    fig5.add_trace(go.Bar(x=months, y=[x/10000 for x in cost_shop_acquisition], name="販売店向けロボット・ツール費", ))
-    fig5.add_trace(go.Bar(x=months, y=[x/10000 for x in cost_customer_support], name="カスタマーサポート費", ))
-    fig5.add_trace(go.Bar(x=months, y=[x/10000 for x in cost_potstill_salary], name="事業体人件費", ))
-
-    fig5.update_layout(
-        title="その他 月次推移（全費目）",
-        xaxis_title="月",
-        yaxis_title="金額（万円）",
-        legend=dict(orientation="h", yanchor="bottom", y=-0.25, xanchor="center", x=0.5),
-        height=700,
-    )
-    fig5.update_yaxes(tickformat=",")
-
-    st.plotly_chart(fig5, use_container_width=True)
-
-
-
-
-
-
-
-
-
-
-with tab_summary:
-    st.header("重要指標 (KPI)")
-
-    # 1. 重要数字 (Metrics)
-    total_rev_man = sum(total_revenue) / 10000
-    total_exp_man = sum(total_expense) / 10000
-    total_prof_man = sum(profit) / 10000
-    final_users = paying_users[-1]
+        if not job.finished:
+            job_progress(job.key, "mc_cancel", "mc_enabled", False, render)
+        elif (mc := job_result(job)) is not None:
+            render(mc)
 
-    col1, col2, col3, col4 = st.columns(4)
-    col1.metric("総売上（7年計）", f"{total_rev_man:,.0f} 万円")
-    col2.metric("総支出（7年計）", f"{total_exp_man:,.0f} 万円")
-    col3.metric("累積利益", f"{total_prof_man:,.0f} 万円", delta="黒字" if total_prof_man >= 0 else "-赤字")
-    col4.metric("最終有料会員数", f"{final_users:,.0f} 人")
 
+# -----------------------------
+# 感度分析（各数値項目を1つずつ ±% 変化させたときの累積利益）
+# -----------------------------
+@st.fragment
+def sensitivity_panel(params: dict, years: int, attendees_per_event, events_per_company_per_month,
+                      robot_uio_users_per_month) -> None:
     st.markdown("---")
-
-    # 年間 売上・支出・利益・累損 グラフ
-    fig2_colors = ["#1F5DBA", "#F03531", "#7DBBFF", "#F5A3A3"]
-    fig2 = go.Figure()
-    fig2.add_trace(go.Bar(x=years_labels, y=annual_total, name="総売上"))
-    fig2.add_trace(go.Bar(x=years_labels, y=annual_expense, name="総支出"))
-    fig2.add_trace(go.Bar(x=years_labels, y=annual_profit, name="年間利益"))
-    fig2.add_trace(go.Scatter(x=years_labels, y=cumulative_loss, name="累損（累計利益）", mode="lines+markers"))
-
-    fig2.update_layout(
-        title="売上・支出・利益・累損",
-        yaxis_title="金額（万円）",
-        barmode="group",
-        colorway=fig2_colors
+    st.subheader("感度分析（累積利益・トルネード図）")
+    col = st.columns(2)
+    with col[0]:
+        sens_pct = st.number_input("変動幅（±%）", min_value=1, max_value=100, step=1, key="sens_pct")
+    with col[1]:
+        sens_top = st.number_input("表示項目数", min_value=5, max_value=60, step=1, key="sens_top")
+
+    sens_base, sens_rows = one_at_a_time(params, years, attendees_per_event, events_per_company_per_month,
+                                         robot_uio_users_per_month, delta=sens_pct / 100)
+    tornado_rows = sens_rows[:int(sens_top)][::-1]  # 影響の大きい項目を上に
+    tornado_labels = [sensitivity_label(r.path, params) for r in tornado_rows]
+
+    fig_tornado = go.Figure()
+    fig_tornado.add_trace(go.Bar(y=tornado_labels, x=[r.low_metric - sens_base for r in tornado_rows],
+                                 base=sens_base, orientation="h", name=f"-{sens_pct}%"))
+    fig_tornado.add_trace(go.Bar(y=tornado_labels, x=[r.high_metric - sens_base for r in tornado_rows],
+                                 base=sens_base, orientation="h", name=f"+{sens_pct}%"))
+    fig_tornado.add_vline(x=sens_base, line_dash="dot")
+    fig_tornado.update_layout(
+        title=f"累積利益の感度（基準：{sens_base:,.0f} 万円）",
+        xaxis_title="累積利益（万円）",
+        barmode="overlay",
+        height=max(400, 28 * len(tornado_rows) + 150),
+        legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5),
+        colorway=["#F03531", "#1F5DBA"],
     )
-    fig2.update_yaxes(tickformat=",")
-    st.plotly_chart(fig2, use_container_width=True)
+    fig_tornado.update_xaxes(tickformat=",")
+    st.plotly_chart(fig_tornado, use_container_width=True)
 
-    st.markdown("---")
 
-    # 2. 内訳グラフ (Breakdown)
-    col_g1, col_g2 = st.columns(2)
+# -----------------------------
+# グローバル感度分析（全項目を同時に変化させた Sobol 指標、相互作用を含む）
+# -----------------------------
+@st.fragment
+def global_sensitivity_panel(params: dict, years: int, attendees_per_event, events_per_company_per_month,
+                             robot_uio_users_per_month) -> None:
+    with st.expander("グローバル感度分析（Sobol指標）"):
+        col = st.columns(3)
+        with col[0]:
+            gsa_pct = st.number_input("変動範囲（±%）", min_value=1, max_value=100, step=1, key="gsa_pct")
+        with col[1]:
+            gsa_samples = st.number_input("基本サンプル数", min_value=128, max_value=16_384, step=128,
+                                          key="gsa_samples")
+        with col[2]:
+            gsa_enabled = st.checkbox("実行", key="gsa_enabled")
+
+        gsa = None
+        if gsa_enabled:
+            fingerprint = params_fingerprint(params, years, attendees_per_event, events_per_company_per_month,
+                                             robot_uio_users_per_month)
+            gsa_options = dict(samples=int(gsa_samples), delta=gsa_pct / 100, seed=0)
+            job = JOBS.submit(job_key("sobol", fingerprint, gsa_options), "sobol", sobol_indices, params, years,
+                              attendees_per_event, events_per_company_per_month, robot_uio_users_per_month,
+                              executor=analysis_executor(), **gsa_options)
+            if not job.finished:
+                job_progress(job.key, "gsa_cancel", "gsa_enabled", False)
+            else:
+                gsa = job_result(job)
+        if gsa is not None:
+            st.caption(f"評価シナリオ数：{gsa.evaluations:,} 件（一次指標＝単独の寄与、総合指標＝相互作用を含む寄与）")
+            for metric, metric_label in (("cumulative_profit", "累積利益"), ("break_even_month", "黒字化月")):
+                order = np.argsort(-gsa.total[metric])[:15][::-1]
+                gsa_labels = [sensitivity_label(gsa.paths[i], params) for i in order]
+                fig_gsa = go.Figure()
+                fig_gsa.add_trace(go.Bar(y=gsa_labels, x=gsa.first_order[metric][order], orientation="h",
+                                         name="一次指標 S1"))
+                fig_gsa.add_trace(go.Bar(y=gsa_labels, x=gsa.total[metric][order], orientation="h",
+                                         name="総合指標 ST"))
+                fig_gsa.update_layout(
+                    title=f"{metric_label}の Sobol 指標（上位15項目）",
+                    barmode="group",
+                    height=600,
+                    legend=dict(orientation="h", yanchor="bottom", y=-0.15, xanchor="center", x=0.5),
+                    colorway=FIG_COLORS,
+                )
+                st.plotly_chart(fig_gsa, use_container_width=True)
 
-    with col_g1:
-        st.subheader("売上構成")
-        # 円グラフ用データ
-        labels_rev = ["アプリ課金", "販売手数料"]
-        values_rev = [sum(app_revenue), sum(commission_revenue)]
 
-        fig_rev = go.Figure(data=[go.Pie(labels=labels_rev, values=values_rev, hole=.3)])
-        fig_rev.update_layout(height=300, margin=dict(t=0, b=0, l=0, r=0))
-        st.plotly_chart(fig_rev, use_container_width=True)
+# -----------------------------
+# ゴールシーク（1項目を動かして目標を満たす境界値を逆算）
+# -----------------------------
+@st.fragment
+def goal_seek_panel(params: dict, years: int, attendees_per_event, events_per_company_per_month,
+                    robot_uio_users_per_month) -> None:
+    with st.expander("ゴールシーク（目標から入力値を逆算）"):
+        gs_paths = numeric_paths(params)
+        col = st.columns(2)
+        with col[0]:
+            gs_metric = st.selectbox("目標", list(TARGETS), format_func=TARGETS.get, key="gs_metric")
+            gs_default = 60 if gs_metric == "break_even_month" else 0
+            st.session_state.setdefault(f"gs_target.{gs_metric}", gs_default)
+            gs_target = st.number_input("目標値", step=1, key=f"gs_target.{gs_metric}")
+        with col[1]:
+            if st.session_state.get("gs_path") not in gs_paths:
+                st.session_state["gs_path"] = "app.monthly_fee"
+            gs_path = st.selectbox("動かす項目", gs_paths, format_func=lambda p: sensitivity_label(p, params),
+                                   key="gs_path")
+            gs_base = get_path(params, gs_path)
+            gs_is_int = isinstance(gs_base, int)
+            gs_high_default = gs_base * 5 if gs_base else (100 if gs_is_int else 1.0)
+            gs_min = min_value(gs_path) or 0
+            st.session_state.setdefault(f"gs_low.{gs_path}", gs_min if gs_is_int else float(gs_min))
+            st.session_state.setdefault(f"gs_high.{gs_path}", gs_high_default)
+            gs_low = st.number_input("探索範囲（下限）", key=f"gs_low.{gs_path}")
+            gs_high = st.number_input("探索範囲（上限）", key=f"gs_high.{gs_path}")
+
+        if st.button("逆算", key="gs_run"):
+            st.session_state["gs_result"] = goal_seek(params, years, attendees_per_event,
+                                                      events_per_company_per_month, robot_uio_users_per_month,
+                                                      gs_path, gs_metric, gs_target, gs_low, gs_high)
+        gs = st.session_state.get("gs_result")
+        if gs is not None:
+            gs_label = sensitivity_label(gs.path, params)
+            if gs.value is None:
+                st.warning(f"{gs_label}：{gs.message}（{gs.evaluations} 回評価）")
+            else:
+                unit = {"break_even_month": "ヶ月目", "cumulative_profit": "万円", "final_paying_users": "人"}
+                st.write(f"🎯 {gs_label} = **{gs.value:,.6g}** で "
+                         f"{TARGETS[gs.target_metric]}：{gs.metric_value:,.0f} {unit[gs.target_metric]}"
+                         f"（{gs.evaluations} 回評価）")
+                if gs.message:
+                    st.caption(gs.message)
+                if st.button("この値を設定に反映", key="gs_apply", on_click=apply_goal_seek_value,
+                             args=(gs.path, gs.value)):
+                    st.rerun()  # 設定が変わるのでパネルだけでなく画面全体を再計算
 
-        st.caption(f"{years}年間の売上内訳")
-        st.write(f"💸 総アプリ課金：**{sum(app_revenue)/10000:,.0f}万円**")
-        st.write(f"💸 総販売手数料：**{sum(commission_revenue)/10000:,.0f}万円**")
 
-    with col_g2:
-        st.subheader("支出構成")
-        # 支出分類詳細
-        # total_apl_expense = ... (下で計算されているが、ここでも使うために計算 or 参照)
-        # 変数スコープ的に下のコードがまだ実行されていないので再計算が必要、または順序注意。
-        # ここではグラフ用の大分類で。
+# -----------------------------
+# 最適化（販売会社の展開ペースと料金設計を同時に探索）
+# -----------------------------
+@st.fragment
+def optimizer_panel(params: dict, years: int, attendees_per_event, events_per_company_per_month,
+                    robot_uio_users_per_month) -> None:
+    with st.expander("最適化（累損の上限つきで累積利益を最大化）"):
+        opt_space = {}
+        scheduled = [path for path in DEFAULT_SPACE if is_schedule(get_path(params, path))]
+        if scheduled:
+            st.caption("スケジュールを指定した項目は探索しません："
+                       + "、".join(sensitivity_label(path, params) for path in scheduled))
+        for path, (low, high) in DEFAULT_SPACE.items():
+            if path in scheduled:
+                continue
+            col = st.columns([2, 1, 1])
+            col[0].markdown(f"**{sensitivity_label(path, params)}**（現在：{get_path(params, path):,}）")
+            st.session_state.setdefault(f"opt_low.{path}", low)
+            st.session_state.setdefault(f"opt_high.{path}", high)
+            opt_low = col[1].number_input("下限", step=1, key=f"opt_low.{path}")
+            opt_high = col[2].number_input("上限", step=1, key=f"opt_high.{path}")
+            opt_space[path] = (opt_low, opt_high)
+        col = st.columns(3)
+        with col[0]:
+            opt_limit = st.number_input("最大累損の上限（万円、0 は制約なし）", min_value=0, step=500,
+                                        key="opt_limit")
+        with col[1]:
+            opt_population = st.number_input("1世代の候補数", min_value=8, max_value=4_096, step=8,
+                                             key="opt_population")
+        with col[2]:
+            opt_generations = st.number_input("最大世代数", min_value=1, max_value=2_000, step=10,
+                                              key="opt_generations")
+
+        if st.button("最適化を実行", key="opt_run"):
+            fingerprint = params_fingerprint(params, years, attendees_per_event, events_per_company_per_month,
+                                             robot_uio_users_per_month)
+            opt_options = dict(space=opt_space, loss_limit=opt_limit or None, population=int(opt_population),
+                               generations=int(opt_generations), seed=0)
+            st.session_state["opt_job"] = JOBS.submit(
+                job_key("optimize", fingerprint, opt_options), "optimize", optimize, params, years,
+                attendees_per_event, events_per_company_per_month, robot_uio_users_per_month,
+                workers=ANALYSIS_WORKERS, executor=analysis_executor(), **opt_options).key
+
+        # 実行中は進捗と途中の最良の組み合わせ、完了したら結果を opt_result に移して表示
+        job = JOBS.get(st.session_state.get("opt_job"))
+        if job is not None and not job.finished:
+            job_progress(job.key, "opt_cancel", "opt_job", None, lambda opt: st.caption(
+                f"途中経過（{opt.generations} 世代目）：累積利益 {opt.best_profit:,.0f} 万円　"
+                + "　".join(f"{sensitivity_label(p, params)}：{v:,}" for p, v in opt.best.items())))
+        elif job is not None:
+            st.session_state["opt_job"] = None
+            if (result := job_result(job)) is not None:
+                st.session_state["opt_result"] = result
+        opt = st.session_state.get("opt_result")
+        if opt is not None:
+            st.caption(f"{opt.generations} 世代・{opt.evaluations:,} 件を評価")
+            if not opt.feasible:
+                st.warning("累損の上限を満たす組み合わせが見つかりません（違反の最も小さい組み合わせを表示）")
+            col = st.columns(2)
+            col[0].metric("累積利益", f"{opt.best_profit:,.0f} 万円")
+            col[1].metric("最大累損", f"{opt.best_loss:,.0f} 万円")
+            st.write("　".join(f"{sensitivity_label(p, params)}：**{v:,}**" for p, v in opt.best.items()))
+            if st.button("この組み合わせを設定に反映", key="opt_apply", on_click=apply_optimized_values,
+                         args=(opt.best,)):
+                st.rerun()  # 設定が変わるのでパネルだけでなく画面全体を再計算
 
-        val_dev = sum(cost_app_ios_initial) + sum(cost_app_android_initial) + sum(cost_robot_if_dev) + sum(cost_app_ios_bugfix) + sum(cost_app_android_bugfix)
-        val_cloud = sum(cost_cloud_initial_arr) + sum(cost_cloud_aws) + sum(cost_cloud_bugfix_arr) + sum(cost_cloud_scale)
-        val_labor = sum(potstill_fte) + sum(cost_potstill_salary) # fte sum is not cost, cost_potstill_salary is cost
-        # Wait, potstill_fte sum is man-months, cost_potstill_salary is cost. Correct.
-        val_labor = sum(cost_potstill_salary)
-        val_sales = sum(cost_shop_acquisition)
-        val_cs = sum(cost_customer_support)
+            st.subheader("パレートフロント（累積利益 × 最大累損）")
+            pareto_table = {sensitivity_label(p, params): opt.pareto[:, j] for j, p in enumerate(opt.paths)}
+            pareto_table["累積利益（万円）"] = np.round(opt.pareto_profit)
+            pareto_table["最大累損（万円）"] = np.round(opt.pareto_loss)
+            st.dataframe(pareto_table, use_container_width=True)
 
-        labels_exp = ["開発費", "クラウド費", "人件費", "販売ツール費", "CS費"]
-        values_exp = [val_dev, val_cloud, val_labor, val_sales, val_cs]
 
-        fig_exp = go.Figure(data=[go.Pie(labels=labels_exp, values=values_exp, hole=.3)])
-        fig_exp.update_layout(height=300, margin=dict(t=0, b=0, l=0, r=0))
-        st.plotly_chart(fig_exp, use_container_width=True)
+with tab_graphs:
+    if tab_graphs.open:
+        graph_figs, graph_bytes = cached_figures(fingerprint, "graphs", res)
+        st.caption(f"グラフデータ量：{graph_bytes / 1024:,.1f} KB（推移グラフの集計単位：{PERIODS[chart_period(res)]}）")
+        st.plotly_chart(graph_figs["sales"], use_container_width=True)
+        st.plotly_chart(graph_figs["monthly"], use_container_width=True)
 
-        st.caption(f"{years}年間の支出内訳")
-        st.write(f"💸 総アプリ開発費：**{val_dev/10000:,.0f}万円**")
-        st.write(f"💸 総クラウド開発費：**{val_cloud/10000:,.0f}万円**")
-        st.write(f"💸 総事業体人件費：**{val_labor/10000:,.0f}万円**")
-        st.write(f"💸 総販売ツール費：**{val_sales/10000:,.0f}万円**")
-        st.write(f"💸 総カスタマーサポート費：**{val_cs/10000:,.0f}万円**")
+        # 支出項目別 月次推移グラフ
+        st.subheader("支出項目別 月次推移")
+        st.plotly_chart(graph_figs["dev"], use_container_width=True)
+        st.plotly_chart(graph_figs["cloud"], use_container_width=True)
+        st.plotly_chart(graph_figs["other"], use_container_width=True)
 
+        monte_carlo_panel(params, years, attendees_per_event, events_per_company_per_month,
+                          robot_uio_users_per_month)
 
 
+with tab_summary:
+    if tab_summary.open:
+        st.header("重要指標 (KPI)")
+
+        # 1. 重要数字 (Metrics)
+        total_rev_man = res.total_revenue.sum() / 10000
+        total_exp_man = res.total_expense.sum() / 10000
+        total_prof_man = res.profit.sum() / 10000
+        final_users = res.paying_users[-1]
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric(f"総売上（{years}年計）", f"{total_rev_man:,.0f} 万円")
+        col2.metric(f"総支出（{years}年計）", f"{total_exp_man:,.0f} 万円")
+        col3.metric("累積利益", f"{total_prof_man:,.0f} 万円", delta="黒字" if total_prof_man >= 0 else "-赤字")
+        col4.metric("最終有料会員数", f"{final_users:,.0f} 人")
+
+        st.markdown("---")
+
+        # 年間 売上・支出・利益・累損 グラフ
+        summary_period = st.radio("年次の区切り", ["year", "fiscal_year"], horizontal=True, key="summary_period",
+                                  format_func={"year": "開始月から12ヶ月ごと", "fiscal_year": "会計年度"}.get)
+        summary_figs, _ = cached_figures(fingerprint, "summary", res, period=summary_period)
+        st.plotly_chart(summary_figs["annual"], use_container_width=True)
+
+        st.markdown("---")
+
+        # 2. 内訳グラフ (Breakdown)
+        col_g1, col_g2 = st.columns(2)
+
+        with col_g1:
+            st.subheader("売上構成")
+            st.plotly_chart(summary_figs["revenue_pie"], use_container_width=True)
+
+            st.caption(f"{years}年間の売上内訳")
+            st.write(f"💸 総アプリ課金：**{res.app_revenue.sum()/10000:,.0f}万円**")
+            st.write(f"💸 総販売手数料：**{res.commission_revenue.sum()/10000:,.0f}万円**")
+
+        with col_g2:
+            st.subheader("支出構成")
+            st.plotly_chart(summary_figs["expense_pie"], use_container_width=True)
+
+            breakdown = expense_breakdown(res)
+            st.caption(f"{years}年間の支出内訳")
+            st.write(f"💸 総アプリ開発費：**{breakdown['開発費']/10000:,.0f}万円**")
+            st.write(f"💸 総クラウド開発費：**{breakdown['クラウド費']/10000:,.0f}万円**")
+            st.write(f"💸 総事業体人件費：**{breakdown['人件費']/10000:,.0f}万円**")
+            st.write(f"💸 総販売ツール費：**{breakdown['販売ツール費']/10000:,.0f}万円**")
+            st.write(f"💸 総カスタマーサポート費：**{breakdown['CS費']/10000:,.0f}万円**")
+
+        sensitivity_panel(params, years, attendees_per_event, events_per_company_per_month,
+                          robot_uio_users_per_month)
+        global_sensitivity_panel(params, years, attendees_per_event, events_per_company_per_month,
+                                 robot_uio_users_per_month)
+        goal_seek_panel(params, years, attendees_per_event, events_per_company_per_month,
+                        robot_uio_users_per_month)
+        optimizer_panel(params, years, attendees_per_event, events_per_company_per_month,
+                        robot_uio_users_per_month)
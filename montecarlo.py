@@ -0,0 +1,188 @@
+import copy
+from dataclasses import dataclass
+
+import numpy as np
+
+from simulation import (dealer_agents, dealer_curve, expand_schedule, is_schedule, scale_chunk, simulate,
+                        time_grid, time_settings)
+from streaming import DEFAULT_SKETCH_K, StreamingStats
+
+PERCENTILES = (10, 50, 90)
+
+# 集計対象の系列（月次4本＋年次2本）
+MONTHLY_SERIES = ("paying_users", "total_revenue", "total_expense", "profit")
+ANNUAL_SERIES = ("annual_profit", "cumulative_loss")
+
+
+# -----------------------------
+# モンテカルロ設定
+#   - 購入率・解約率：平均を現在の設定値とするベータ分布（concentration が大きいほどばらつきが小さい、
+#                     0 ならその項目は固定値のまま）
+#   - 販売台数：イベント集客数 × 購入率 の二項分布（False なら従来どおり期待値の切り捨て）
+#   - 販売会社の増加：毎月の増加数を平均とするポアソン分布（False なら毎月一定）
+#   - streaming：全パスを保持せず、チャンクごとに平均・分散・近似分位点を逐次集計
+#                （メモリは chunk_size と sketch_k で決まり、samples に依存しない）
+# -----------------------------
+@dataclass
+class MonteCarloSpec:
+    samples: int = 10_000
+    purchase_rate_concentration: float = 500.0
+    churn_rate_concentration: float = 500.0
+    binomial_sales: bool = True
+    poisson_dealer_growth: bool = True
+    seed: int = None
+    chunk_size: int = 2048
+    streaming: bool = False
+    sketch_k: int = DEFAULT_SKETCH_K
+
+
+# -----------------------------
+# モンテカルロ結果（P10/P50/P90 のバンド、先頭軸がパーセンタイル）
+# ※月次の金額は円、annual_profit / cumulative_loss は万円
+# ※mean / std は系列名 → 月（年）ごとの平均・標準偏差
+# -----------------------------
+@dataclass
+class MonteCarloResult:
+    samples: int
+    percentiles: tuple
+    paying_users: np.ndarray
+    total_revenue: np.ndarray
+    total_expense: np.ndarray
+    profit: np.ndarray
+    annual_profit: np.ndarray
+    cumulative_loss: np.ndarray
+    mean: dict
+    std: dict
+
+
+def _beta_around(rng, mean: np.ndarray, concentration: float, size: int) -> np.ndarray:
+    # 平均 mean のベータ分布から size 件抽出（0/1 の端点や concentration=0 は固定値）
+    mean = np.broadcast_to(np.asarray(mean, dtype=float), (size,) + np.shape(mean))
+    if not concentration:
+        return mean.copy()
+    valid = (mean > 0) & (mean < 1)
+    a = np.where(valid, mean * concentration, 1.0)
+    b = np.where(valid, (1 - mean) * concentration, 1.0)
+    return np.where(valid, rng.beta(a, b), mean)
+
+
+def _level(value):
+    # スケジュールは最初の区間（開始月が最も早い区間）の値を基準にする
+    if not is_schedule(value):
+        return value
+    return min(value["schedule"], key=lambda s: int(s["month"]))["value"]
+
+
+def _with_level(value, draws: np.ndarray):
+    # 抽出した値に置き換える。スケジュールは全区間を 抽出値 / 基準値 倍にする（率なので 1 が上限）
+    if not is_schedule(value):
+        return draws
+    level = _level(value)
+    ratio = draws / level if level else np.ones_like(draws)
+    return {"schedule": [{**s, "value": np.minimum(np.asarray(s["value"]) * ratio, 1.0)} for s in value["schedule"]]}
+
+
+# -----------------------------
+# 1チャンク分のパスを生成してシミュレーション
+# -----------------------------
+def _simulate_paths(rng, params: dict, spec: MonteCarloSpec, n: int, years: int,
+                    attendees_per_event: int, events_per_company_per_month: int,
+                    robot_uio_users_per_month: int):
+    months = years * 12
+    m = np.arange(months)
+    step_month, dt = time_grid(years, time_settings(params)["step"])  # 週次・日次：各ステップが属する月
+    paths = copy.deepcopy(params)
+    items = paths["robot"]["items"][:paths["robot"]["num_types"]]
+
+    # 率のスケジュールは、最初の区間の値の周りで抽出し、推移の形を保ったまま全区間を拡大・縮小する
+    purchase_rates = _beta_around(rng, [_level(r["purchase_rate"]) for r in items],
+                                  spec.purchase_rate_concentration, n)
+    for i, r in enumerate(items):
+        r["purchase_rate"] = _with_level(r["purchase_rate"], purchase_rates[:, i])
+    app = paths["app"]
+    app["churn_rate"] = _with_level(app["churn_rate"], _beta_around(rng, _level(app["churn_rate"]),
+                                                                    spec.churn_rate_concentration, n))
+
+    # 販売会社数：初期実証期間後、毎月ポアソン分布で増加 → 上限で頭打ち
+    contract_companies = None
+    if spec.poisson_dealer_growth:
+        dealer = paths["dealer"]
+        growth = dealer["company_growth_per_month"]
+        additions = rng.poisson(expand_schedule(growth, m) if is_schedule(growth) else growth, size=(n, months))
+        additions[:, m < dealer["fixed_months_before_growth"]] = 0
+        contract_companies = np.minimum(dealer["initial_companies"] + np.cumsum(additions, axis=1),
+                                        expand_schedule(dealer["max_companies"], m))
+        contract_companies[:, m < dealer["fixed_months_before_growth"]] = dealer["initial_companies"]
+        contract_companies = contract_companies[:, step_month]
+
+    # 販売台数：イベント集客数を試行回数とする二項分布
+    robot_sales_by_type = None
+    if spec.binomial_sales:
+        if contract_companies is None:
+            contract_companies = np.broadcast_to(dealer_curve(paths["dealer"], step_month), (n, len(step_month)))
+        # 週次・日次は1ステップ当たりの集客数（四捨五入）を試行回数とする
+        # 販売会社ごとのモデルは、販売会社ごとの集客数の倍率の合計（dealer_reach）を使う
+        if paths["dealer"].get("model") == "agents":
+            reach = dealer_agents(paths["dealer"].get("agents"), contract_companies, dt)["dealer_reach"]
+            attendees = np.rint(reach * events_per_company_per_month * dt * attendees_per_event).astype(np.int64)
+        else:
+            attendees = contract_companies * events_per_company_per_month * attendees_per_event
+            if dt != 1 or attendees.dtype.kind == "f":  # 上限が伸び率つきのスケジュールなら販売会社数も小数
+                attendees = np.rint(attendees * dt).astype(np.int64)
+        # 販売開始前は購入率 0 にして抽出（p = 0 は乱数を引かずに 0 になるので、種類が多いほど速い）
+        release_month = np.array([r["release_month"] for r in items])
+        released = step_month[None, :] > release_month[:, None]
+        rates = purchase_rates[:, :, None]
+        if any(is_schedule(r["purchase_rate"]) for r in items):
+            rates = np.stack(np.broadcast_arrays(*[expand_schedule(r["purchase_rate"], step_month) for r in items]),
+                             axis=-2)
+        robot_sales_by_type = rng.binomial(attendees[:, None, :], np.where(released, np.clip(rates, 0.0, 1.0), 0.0))
+
+    return simulate(paths, years, attendees_per_event, events_per_company_per_month,
+                    robot_uio_users_per_month, contract_companies=contract_companies,
+                    robot_sales_by_type=robot_sales_by_type)
+
+
+# -----------------------------
+# モンテカルロ本体：samples 本のパスを chunk_size ごとにまとめて計算
+# on_progress(計算済みのパス数, samples, 途中結果を返す関数) をチャンクごとに呼ぶ（例外を送出すれば中断）
+# -----------------------------
+def run_monte_carlo(params: dict, years: int, attendees_per_event: int, events_per_company_per_month: int,
+                    robot_uio_users_per_month: int, spec: MonteCarloSpec = None,
+                    on_progress=None) -> MonteCarloResult:
+    spec = MonteCarloSpec() if spec is None else spec
+    rng = np.random.default_rng(spec.seed)
+    names = MONTHLY_SERIES + ANNUAL_SERIES
+
+    if spec.streaming:
+        stats = StreamingStats(spec.sketch_k, seed=spec.seed)
+    else:
+        paths = {name: [] for name in names}
+
+    def result(samples: int) -> MonteCarloResult:
+        # ここまでに計算した samples 本のパスから P10/P50/P90・平均・標準偏差をまとめる
+        if spec.streaming:
+            bands = {name: stats.quantiles(name, PERCENTILES) for name in names}
+            mean = {name: stats.mean(name) for name in names}
+            std = {name: stats.std(name) for name in names}
+        else:
+            values = {name: np.concatenate(chunks) for name, chunks in paths.items()}
+            bands = {name: np.percentile(v, PERCENTILES, axis=0) for name, v in values.items()}
+            mean = {name: v.mean(axis=0) for name, v in values.items()}
+            std = {name: v.std(axis=0, ddof=1) for name, v in values.items()}
+        return MonteCarloResult(samples=samples, percentiles=PERCENTILES, mean=mean, std=std, **bands)
+
+    chunk_size = scale_chunk(spec.chunk_size, params)  # 週次・日次は1チャンクのパス数を減らす
+    for start in range(0, spec.samples, chunk_size):
+        stop = min(start + chunk_size, spec.samples)
+        chunk = _simulate_paths(rng, params, spec, stop - start, years, attendees_per_event,
+                                events_per_company_per_month, robot_uio_users_per_month)
+        for name in names:
+            if spec.streaming:
+                stats.update(name, getattr(chunk, name))
+            else:
+                paths[name].append(np.array(getattr(chunk, name)))
+        if on_progress is not None:
+            on_progress(stop, spec.samples, lambda: result(stop))
+
+    return result(spec.samples)
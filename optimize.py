@@ -0,0 +1,173 @@
+import contextlib
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from batch import DEFAULT_CHUNK_SIZE, get_path, set_path, simulate_batch
+from sensitivity import latin_hypercube
+
+# 既定の探索範囲（販売会社の展開ペースと料金設計）
+DEFAULT_SPACE = {
+    "dealer.company_growth_per_month": (0, 10),
+    "dealer.max_companies": (1, 300),
+    "app.monthly_fee": (100, 1500),
+    "app.free_months": (0, 12),
+    "tool.robots_per_shop": (0, 10),
+}
+
+
+# -----------------------------
+# 最適化の結果（金額は万円）
+#   - best：制約を満たす中で累積利益が最大の入力（満たすものがなければ違反の最も小さい入力）
+#   - history：世代ごとの最良の累積利益
+#   - pareto*：評価した全候補のうち「累積利益」と「最大累損」のパレート最適な組（累損の小さい順）
+# -----------------------------
+@dataclass
+class OptimizationResult:
+    paths: list
+    best: dict
+    best_profit: float
+    best_loss: float
+    feasible: bool
+    generations: int
+    evaluations: int
+    history: np.ndarray
+    pareto: np.ndarray
+    pareto_profit: np.ndarray
+    pareto_loss: np.ndarray
+
+
+def pareto_front(profit: np.ndarray, loss: np.ndarray) -> np.ndarray:
+    # 累積利益は大きいほど、最大累損は小さいほど良い。支配されない候補の番号を累損の小さい順に返す
+    order = np.lexsort((-profit, loss))
+    best_so_far = np.maximum.accumulate(profit[order])
+    keep = np.r_[True, profit[order][1:] > best_so_far[:-1]]
+    return order[keep]
+
+
+def merge_front(front: tuple, x: np.ndarray, profit: np.ndarray, loss: np.ndarray) -> tuple:
+    # パレート最適な組 (x, 累積利益, 最大累損) に新しい候補を加えて選び直す（同じ入力は1件にまとめる）
+    # 支配された候補は以後も支配されたままなので、全候補から選ぶのと同じ結果を世代数によらないメモリで得られる
+    all_x = np.concatenate([front[0], x])
+    all_profit = np.concatenate([front[1], profit])
+    all_loss = np.concatenate([front[2], loss])
+    all_x, unique = np.unique(all_x, axis=0, return_index=True)
+    all_profit, all_loss = all_profit[unique], all_loss[unique]
+    keep = pareto_front(all_profit, all_loss)
+    return all_x[keep], all_profit[keep], all_loss[keep]
+
+
+# -----------------------------
+# 差分進化（DE/rand/1/bin）による多変数最適化
+#   - 累積利益を最大化、最大累損が loss_limit（万円）以下という制約付き（None なら制約なし）
+#   - 制約は Deb のルール（違反量の小さい方が優先、どちらも満たすなら利益の大きい方）
+#   - 1世代の候補をまとめて simulate_batch で評価（workers > 1 ならプロセスプールを使い回す。
+#     executor を渡せばそのプールで評価し、workers はその大きさとして候補の分け方にだけ使う）
+#   - patience 世代続けて最良値が tol（相対）以上改善しなければ打ち切り
+# 整数項目（基準値が int の項目）は四捨五入して評価する。費用モデルは simulate をそのまま使う
+# on_progress(世代, 最大世代数, 途中結果を返す関数) を世代ごとに呼ぶ（例外を送出すれば中断）
+# -----------------------------
+def optimize(params: dict, years: int, attendees_per_event, events_per_company_per_month,
+             robot_uio_users_per_month, space: dict = None, loss_limit: float = None,
+             population: int = 64, generations: int = 200, patience: int = 15, tol: float = 1e-4,
+             mutation: float = 0.7, crossover: float = 0.9, seed: int = None,
+             workers: int = 1, executor=None, on_progress=None) -> OptimizationResult:
+    rng = np.random.default_rng(seed)
+    space = DEFAULT_SPACE if space is None else space
+    paths = list(space)
+    d = len(paths)
+    low = np.array([space[p][0] for p in paths], dtype=float)
+    high = np.array([space[p][1] for p in paths], dtype=float)
+    integer = np.array([isinstance(get_path(params, p), int) for p in paths])
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    scenarios = copy.deepcopy(params)
+
+    def decode(u: np.ndarray) -> np.ndarray:
+        x = low + u * (high - low)
+        return np.where(integer, np.round(x), x)
+
+    def evaluate(u: np.ndarray, pool) -> tuple:
+        x = decode(u)
+        for j, path in enumerate(paths):
+            set_path(scenarios, path, x[:, j])
+        chunk_size = -(-len(x) // workers) if pool is not None else DEFAULT_CHUNK_SIZE
+        summary = simulate_batch(scenarios, years, attendees_per_event, events_per_company_per_month,
+                                 robot_uio_users_per_month, chunk_size=chunk_size, executor=pool)
+        return x, summary.cumulative_profit, summary.max_cumulative_loss
+
+    def violation(loss: np.ndarray) -> np.ndarray:
+        return np.zeros_like(loss) if loss_limit is None else np.maximum(loss - loss_limit, 0)
+
+    def better(profit_a, viol_a, profit_b, viol_b) -> np.ndarray:
+        return (viol_a < viol_b) | ((viol_a == viol_b) & (profit_a >= profit_b))
+
+    def result(generation: int, best: int) -> OptimizationResult:
+        # generation 世代目までの結果をまとめる（途中経過の表示にも使う）
+        return OptimizationResult(
+            paths=paths,
+            best={p: (int(v) if is_int else float(v)) for p, v, is_int in zip(paths, x[best], integer)},
+            best_profit=float(profit[best]),
+            best_loss=float(loss[best]),
+            feasible=bool(viol[best] == 0),
+            generations=generation,
+            evaluations=evaluations,
+            history=np.array(history),
+            pareto=front[0],
+            pareto_profit=front[1],
+            pareto_loss=front[2],
+        )
+
+    if executor is not None:
+        pool_context = contextlib.nullcontext(executor)
+    else:
+        pool_context = ProcessPoolExecutor(max_workers=workers) if workers > 1 else contextlib.nullcontext()
+    with pool_context as pool:
+        u = latin_hypercube(population, d, rng)
+        x, profit, loss = evaluate(u, pool)
+        viol = violation(loss)
+        front = merge_front((np.empty((0, d)), np.empty(0), np.empty(0)), x, profit, loss)
+        evaluations = len(x)
+        history = []
+        stale = 0
+        best_viol = np.inf
+        for generation in range(1, generations + 1):
+            best = np.lexsort((-profit, viol))[0]
+            history.append(profit[best])
+            if on_progress is not None:
+                on_progress(generation, generations, lambda: result(generation, best))
+            # 制約違反が減った、または違反量が同じで利益が tol 以上増えたら改善とみなす
+            if generation > 1:
+                previous = history[-2]
+                improved = viol[best] < best_viol or (
+                    history[-1] - previous > tol * max(abs(previous), 1.0))
+                stale = 0 if improved else stale + 1
+                if stale >= patience:
+                    break
+            best_viol = viol[best]
+            if generation == generations:
+                break
+
+            # 自分以外の3個体を重複なしで選ぶ（対角を最後に回した乱数の argsort）
+            keys = rng.random((population, population))
+            np.fill_diagonal(keys, np.inf)
+            r1, r2, r3 = np.argsort(keys, axis=1)[:, :3].T
+            mutant = np.clip(u[r1] + mutation * (u[r2] - u[r3]), 0, 1)
+            mask = rng.random((population, d)) < crossover
+            mask[np.arange(population), rng.integers(d, size=population)] = True
+            trial = np.where(mask, mutant, u)
+
+            x_trial, profit_trial, loss_trial = evaluate(trial, pool)
+            viol_trial = violation(loss_trial)
+            front = merge_front(front, x_trial, profit_trial, loss_trial)
+            evaluations += len(x_trial)
+            replace = better(profit_trial, viol_trial, profit, viol)
+            u = np.where(replace[:, None], trial, u)
+            x = np.where(replace[:, None], x_trial, x)
+            profit = np.where(replace, profit_trial, profit)
+            loss = np.where(replace, loss_trial, loss)
+            viol = np.where(replace, viol_trial, viol)
+
+    return result(generation, best)
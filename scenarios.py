@@ -0,0 +1,195 @@
+import argparse
+import copy
+import json
+import os
+import sys
+from itertools import islice
+
+import numpy as np
+
+from batch import DEFAULT_CHUNK_SIZE, BatchSummary, ordered_map, summarize
+from sensitivity import is_structural
+from simulation import is_schedule, scale_chunk, simulate
+
+DEFAULT_CHUNK_LINES = 256
+LOADED_FORMAT_ERROR = "JSONの形式が想定と異なります（robot/appがありません）。"
+
+
+# -----------------------------
+# 読み込んだ params を内部表現に（apply_loaded_params_to_state と同じ補正）
+#   - ロボット種別は num_types 件目まで
+#   - 販売手数料率・購入率・解約率：内部表現（0-1）想定。1 を超える値は % とみなして 100 で割る
+# -----------------------------
+def as_fraction(value):
+    if is_schedule(value):
+        return {**value, "schedule": [{**s, "value": as_fraction(s["value"])} for s in value["schedule"]]}
+    value = float(value)
+    return value / 100.0 if value > 1.0 else value
+
+
+def normalize_loaded(loaded: dict) -> dict:
+    if not isinstance(loaded, dict) or "robot" not in loaded or "app" not in loaded:
+        raise ValueError(LOADED_FORMAT_ERROR)
+    params = copy.deepcopy(loaded)
+    robot = params["robot"]
+    robot["items"] = robot["items"][:int(robot["num_types"])]
+    for r in robot["items"]:
+        r["commission_rate"] = as_fraction(r["commission_rate"])
+        r["purchase_rate"] = as_fraction(r["purchase_rate"])
+    params["app"]["churn_rate"] = as_fraction(params["app"]["churn_rate"])
+    return params
+
+
+def merge_params(base: dict, override: dict) -> dict:
+    # base に override を重ねる（dict は項目ごと、list や数値は override で置き換え）
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict) and not is_schedule(value):
+            merged[key] = merge_params(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+# -----------------------------
+# 構造の同じシナリオをまとめて（構造体配列にして）一括で計算する
+#   structure_key：数値以外の構造（キー・リストの長さ・文字列）と、件数・暦などの構造用の項目・
+#                  スケジュールの開始月の値（sensitivity.is_structural）。ロボット名は表示用なので含めない
+#   stack_params：構造の同じ params の数値項目を、値が揃っていなければシナリオ軸の配列にする
+# -----------------------------
+def structure_key(node, path: str = ""):
+    if isinstance(node, dict):
+        return tuple(sorted((k, structure_key(v, f"{path}{k}.")) for k, v in node.items()))
+    if isinstance(node, list):
+        return ("list",) + tuple(structure_key(v, f"{path}{i}.") for i, v in enumerate(node))
+    name = path[:-1]
+    if isinstance(node, (int, float)) and not isinstance(node, bool) and not is_structural(name):
+        return "#"
+    if name.startswith("robot.items.") and name.endswith(".name"):
+        return "#"
+    return ("=", node)
+
+
+def stack_params(group: list):
+    first = group[0]
+    if isinstance(first, dict):
+        return {k: stack_params([g[k] for g in group]) for k in first}
+    if isinstance(first, list):
+        return [stack_params([g[i] for g in group]) for i in range(len(first))]
+    if isinstance(first, (int, float)) and not isinstance(first, bool) and any(g != first for g in group):
+        return np.array(group)
+    return first
+
+
+def _summary_rows(summary: BatchSummary, n: int) -> list:
+    columns = {name: np.broadcast_to(getattr(summary, name), (n,)).tolist()
+               for name in BatchSummary.__dataclass_fields__}
+    return [{name: values[i] for name, values in columns.items()} for i in range(n)]
+
+
+# -----------------------------
+# 1チャンク分（入力の連続した行）を計算
+#   構造ごとにまとめて一括で計算し、失敗したまとまりは1件ずつ計算し直してエラーの行を特定する
+#   返り値：入力の順の結果（{"line", "id"（入力にあれば）, 集計値 or "error"}）
+# -----------------------------
+def _evaluate_chunk(task: tuple) -> list:
+    entries, years, inputs = task
+    results = [None] * len(entries)
+    groups = {}
+    for pos, (line, scenario_id, params, error) in enumerate(entries):
+        head = {"line": line} if scenario_id is None else {"line": line, "id": scenario_id}
+        results[pos] = {**head, "error": error} if error else head
+        if not error:
+            groups.setdefault(structure_key(params), []).append(pos)
+
+    for positions in groups.values():
+        size = scale_chunk(DEFAULT_CHUNK_SIZE, entries[positions[0]][2])
+        for start in range(0, len(positions), size):
+            block = positions[start:start + size]
+            try:
+                stacked = stack_params([entries[pos][2] for pos in block])
+                rows = _summary_rows(summarize(simulate(stacked, years, *inputs)), len(block))
+            except Exception:
+                rows = []
+                for pos in block:
+                    try:
+                        rows.append(_summary_rows(summarize(simulate(entries[pos][2], years, *inputs)), 1)[0])
+                    except Exception as e:
+                        rows.append({"error": f"{type(e).__name__}: {e}"})
+            for pos, row in zip(block, rows):
+                results[pos].update(row)
+    return results
+
+
+# -----------------------------
+# JSONL の各行を読み、計算し、入力の順に結果を返すジェネレーター
+#   行 → (行番号, id, 補正した params, エラー) → chunk_lines 行ずつのチャンク → ordered_map → 結果の行
+#   どの段も先読みは ordered_map の window（workers × 2 チャンク）までなので、ファイルの大きさによらず
+#   メモリは一定。空行は飛ばし、行番号は1始まり。"id" キーがあれば結果にそのまま付ける
+#   base を渡すと各行を base に重ねてから補正する（変更のある項目だけを書いた行で済む）
+# -----------------------------
+def read_scenarios(lines, base: dict = None):
+    for line_no, text in enumerate(lines, start=1):
+        if not text.strip():
+            continue
+        scenario_id = None
+        try:
+            loaded = json.loads(text)
+            if not isinstance(loaded, dict):
+                raise ValueError(LOADED_FORMAT_ERROR)  # 配列・数値などの行（base に重ねる前に弾く）
+            scenario_id = loaded.pop("id", None)
+            if base is not None:
+                loaded = merge_params(base, loaded)
+            yield line_no, scenario_id, normalize_loaded(loaded), None
+        except Exception as e:
+            yield line_no, scenario_id, None, f"{type(e).__name__}: {e}"
+
+
+def run_scenarios(lines, years: int, inputs: list, base: dict = None, workers: int = 1,
+                  chunk_lines: int = DEFAULT_CHUNK_LINES):
+    scenarios = read_scenarios(lines, base)
+    chunks = iter(lambda: list(islice(scenarios, chunk_lines)), [])
+    tasks = ((chunk, years, inputs) for chunk in chunks)
+    for results in ordered_map(_evaluate_chunk, tasks, workers=workers):
+        yield from results
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="JSONL（1行に1つの params）のシナリオを一括で計算し、入力の順に結果を JSONL で書き出す")
+    parser.add_argument("input", help="シナリオの JSONL（- は標準入力）")
+    parser.add_argument("-o", "--output", default="-", help="結果の JSONL（- は標準出力）")
+    parser.add_argument("--base", help="各行を重ねる基準の設定JSON（行には変更のある項目だけを書ける）")
+    parser.add_argument("--years", type=int, default=7, help="シミュレーション年数")
+    parser.add_argument("--attendees", type=int, default=50, help="イベントあたり集客数（人）")
+    parser.add_argument("--events", type=int, default=2, help="1社あたり月間イベント数（回）")
+    parser.add_argument("--uio-users", type=int, default=0, help="ロボット保有顧客の月当たり新規課金登録者数（人）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="プロセス数")
+    parser.add_argument("--chunk-lines", type=int, default=DEFAULT_CHUNK_LINES, help="1チャンクの行数")
+    args = parser.parse_args(argv)
+
+    base = None
+    if args.base:
+        with open(args.base, encoding="utf-8-sig") as f:
+            base = json.load(f)
+    inputs = [args.attendees, args.events, args.uio_users]
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8-sig")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    count = errors = 0
+    try:
+        for result in run_scenarios(source, args.years, inputs, base=base, workers=args.workers,
+                                    chunk_lines=args.chunk_lines):
+            sink.write(json.dumps(result, ensure_ascii=False) + "\n")
+            count += 1
+            errors += "error" in result
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    print(f"{count:,} 件を計算しました（エラー {errors:,} 件）", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import copy
+import re
+from dataclasses import dataclass
+
+import numpy as np
+
+from batch import get_path, set_path, simulate_batch
+from simulation import is_schedule
+
+# 件数・個数・暦を表す構造用の項目（感度分析の対象外）
+STRUCTURAL_PATHS = ("robot.num_types", "cloud.num_thresholds", "cloud.num_aws_tiers", "app.num_churn_segments",
+                    "time.start_month", "time.fiscal_year_start_month", "dealer.agents.seed")
+
+
+def is_structural(path: str) -> bool:
+    # 構造用の項目とスケジュールの開始月（シナリオごとに変えて一括で計算できない）
+    return path in STRUCTURAL_PATHS or (".schedule." in path and path.endswith(".month"))
+
+
+# 下限のある項目（期間・周期・社数・増員基準。0 以下では計算が成り立たない）
+# 設定画面の number_input の min_value と、感度分析・Sobol・ゴールシークで動かした値の下限に使う
+# （表の行・区間は番号を * にしたパス）
+PATH_MIN_VALUES = {
+    "dealer.initial_companies": 1,
+    "dealer.max_companies": 1,
+    "dealer.fixed_months_before_growth": 1,
+    "develop.bugfix_cycle_months": 1,
+    "labor.fte_increment_users": 1,
+    "app.churn_segments.*.months": 1,
+}
+
+
+def min_value(path: str):
+    # path の下限（なければ None）。スケジュールの区間の値は元の項目の下限
+    path = re.sub(r"\.schedule\.\d+\.value$", "", path)
+    return PATH_MIN_VALUES.get(re.sub(r"\.\d+(?=\.)", ".*", path))
+
+
+def clip_min(path: str, value):
+    # 動かした値（スカラーまたはシナリオごとの配列）を path の下限で切る
+    bound = min_value(path)
+    if bound is None:
+        return value
+    return np.maximum(value, bound) if isinstance(value, np.ndarray) else max(value, bound)
+
+
+# -----------------------------
+# params 内の数値項目をドット区切りパスで列挙
+# -----------------------------
+def numeric_paths(params: dict, prefix: str = "") -> list:
+    paths = []
+    if isinstance(params, dict):
+        children = params.items()
+    elif isinstance(params, list):
+        children = enumerate(params)
+    else:
+        return paths
+    for key, value in children:
+        path = f"{prefix}{key}"
+        if is_schedule(value):
+            # スケジュールは各区間の値・伸び率（開始月は構造として対象外）
+            paths.extend(f"{path}.schedule.{i}.{name}" for i, segment in enumerate(value["schedule"])
+                         for name in ("value", "growth") if name in segment)
+        elif isinstance(value, (dict, list)):
+            paths.extend(numeric_paths(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and path not in STRUCTURAL_PATHS:
+            paths.append(path)
+    return paths
+
+
+# -----------------------------
+# 感度分析の1行（金額は万円）
+# -----------------------------
+@dataclass
+class SensitivityRow:
+    path: str
+    base_value: float
+    low_value: float
+    high_value: float
+    low_metric: float
+    high_metric: float
+
+    @property
+    def swing(self) -> float:
+        return abs(self.high_metric - self.low_metric)
+
+
+# -----------------------------
+# 1項目ずつ ±delta 変化させた感度分析（全シナリオを1回のバッチ評価で計算）
+# 整数項目は変化後の値を四捨五入（月数・社数などを整数のまま扱うため）、下限のある項目は下限で切る
+# metric は BatchSummary の項目名（cumulative_profit / total_revenue など）
+# -----------------------------
+def one_at_a_time(params: dict, years: int, attendees_per_event, events_per_company_per_month,
+                  robot_uio_users_per_month, delta: float = 0.1, metric: str = "cumulative_profit",
+                  paths: list = None) -> tuple:
+    paths = numeric_paths(params) if paths is None else paths
+    n = 2 * len(paths) + 1
+
+    scenarios = copy.deepcopy(params)
+    lows, highs = [], []
+    for j, path in enumerate(paths):
+        base = get_path(params, path)
+        low, high = base * (1 - delta), base * (1 + delta)
+        if isinstance(base, int):
+            low, high = round(low), round(high)
+        low, high = clip_min(path, low), clip_min(path, high)
+        column = np.full(n, base, dtype=float)
+        column[2 * j + 1] = low
+        column[2 * j + 2] = high
+        set_path(scenarios, path, column)
+        lows.append(low)
+        highs.append(high)
+
+    values = getattr(simulate_batch(scenarios, years, attendees_per_event, events_per_company_per_month,
+                                    robot_uio_users_per_month), metric)
+    rows = [
+        SensitivityRow(path=path, base_value=get_path(params, path), low_value=lows[j], high_value=highs[j],
+                       low_metric=float(values[2 * j + 1]), high_metric=float(values[2 * j + 2]))
+        for j, path in enumerate(paths)
+    ]
+    rows.sort(key=lambda r: r.swing, reverse=True)
+    return float(values[0]), rows
+
+
+# -----------------------------
+# ラテン超方格サンプル（n × d、各列を n 等分した区間から1点ずつ）
+# -----------------------------
+def latin_hypercube(n: int, d: int, rng) -> np.ndarray:
+    u = (np.arange(n)[:, None] + rng.random((n, d))) / n
+    return np.take_along_axis(u, rng.random((n, d)).argsort(axis=0), axis=0)
+
+
+# -----------------------------
+# グローバル感度分析の結果（指標名 → 各項目の一次／総合 Sobol 指標）
+# -----------------------------
+@dataclass
+class GlobalSensitivity:
+    paths: list
+    ranges: dict
+    first_order: dict
+    total: dict
+    evaluations: int
+
+
+# -----------------------------
+# 全数値項目を同時に変化させたグローバル感度分析（Saltelli 法）
+#   - A, B：ラテン超方格で ranges 内から抽出した N 件ずつの入力
+#   - AB_i：A の i 列目だけ B に差し替えた入力（項目ごとに N 件）
+#   - 一次指標 S_i = E[f(B) (f(AB_i) - f(A))] / V、総合指標 ST_i = E[(f(A) - f(AB_i))^2] / 2V
+# ranges 未指定の項目は基準値の ±delta（下限のある項目は下限で切る）。評価は N × (d + 2) 件を1回のバッチで行い、
+# 月次系列は保持しない（集計値のみ）
+# 黒字化月は期間内に未達なら「期間月数 + 1」として扱う
+# on_progress(評価済みの件数, 全件数) はバッチのチャンクごとに呼ばれる（simulate_batch）
+# executor を渡すと、プロセスプールを作らずにそれで評価する（simulate_batch）
+# -----------------------------
+def sobol_indices(params: dict, years: int, attendees_per_event, events_per_company_per_month,
+                  robot_uio_users_per_month, ranges: dict = None, samples: int = 1024, delta: float = 0.2,
+                  metrics: tuple = ("cumulative_profit", "break_even_month"), seed: int = None,
+                  workers: int = None, executor=None, on_progress=None) -> GlobalSensitivity:
+    rng = np.random.default_rng(seed)
+    ranges = dict(ranges or {})
+    paths = numeric_paths(params)
+    for path in paths:
+        base = get_path(params, path)
+        ranges.setdefault(path, (base * (1 - delta), base * (1 + delta)))
+    paths = list(ranges)
+    d = len(paths)
+    low = np.array([ranges[p][0] for p in paths], dtype=float)
+    high = np.array([ranges[p][1] for p in paths], dtype=float)
+
+    a = low + latin_hypercube(samples, d, rng) * (high - low)
+    b = low + latin_hypercube(samples, d, rng) * (high - low)
+    blocks = [a, b]
+    for i in range(d):
+        ab = a.copy()
+        ab[:, i] = b[:, i]
+        blocks.append(ab)
+    x = np.concatenate(blocks)
+
+    scenarios = copy.deepcopy(params)
+    for j, path in enumerate(paths):
+        column = x[:, j]
+        if isinstance(get_path(params, path), int):
+            column = np.round(column)
+        set_path(scenarios, path, clip_min(path, column))
+
+    summary = simulate_batch(scenarios, years, attendees_per_event, events_per_company_per_month,
+                             robot_uio_users_per_month, workers=workers, executor=executor, on_progress=on_progress)
+
+    first_order, total = {}, {}
+    for metric in metrics:
+        y = getattr(summary, metric).astype(float)
+        if metric == "break_even_month":
+            y = np.where(y < 0, years * 12 + 1, y)
+        y = y.reshape(d + 2, samples)
+        f_a, f_b, f_ab = y[0], y[1], y[2:]
+        variance = np.concatenate((f_a, f_b)).var()
+        if variance == 0:
+            first_order[metric] = np.zeros(d)
+            total[metric] = np.zeros(d)
+            continue
+        first_order[metric] = (f_b * (f_ab - f_a)).mean(axis=1) / variance
+        total[metric] = 0.5 * ((f_a - f_ab) ** 2).mean(axis=1) / variance
+
+    return GlobalSensitivity(paths=paths, ranges=ranges, first_order=first_order, total=total,
+                             evaluations=len(x))
@@ -0,0 +1,312 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cache import ResultCache, params_fingerprint
+from scenarios import stack_params, structure_key
+from simulation import SimulationResult, scale_chunk, simulate
+
+DEFAULT_PORT = 8502  # Streamlit（8501）の隣
+DEFAULT_MAX_BATCH = 256
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_CACHE_ENTRIES = 16384  # 応答は1件あたり数十KB（10年・月次）
+DEFAULT_INPUTS = {"years": 7, "attendees_per_event": 50, "events_per_company_per_month": 2,
+                  "robot_uio_users_per_month": 0}
+INPUT_KEYS = tuple(DEFAULT_INPUTS)
+
+# 応答に含める系列（ステップごと・年次）。それ以外は期間・暦・ロボット名などの付帯情報
+META_FIELDS = ("years", "months", "robot_names", "step", "month_index", "start_month", "fiscal_year_start_month")
+ANNUAL_FIELDS = tuple(f.name for f in fields(SimulationResult)
+                      if f.name.startswith("annual_") or f.name == "cumulative_loss")
+SERIES_FIELDS = tuple(f.name for f in fields(SimulationResult)
+                      if f.name not in META_FIELDS and f.name not in ANNUAL_FIELDS)
+
+
+# -----------------------------
+# 結果 → 応答（JSON の bytes）
+#   index：まとめて計算した結果（先頭がシナリオ軸）のうち何番目か（None は1シナリオだけの結果）
+#   ロボット名は表示用でまとめる際に区別しないので、各リクエストの params から付け直す
+# -----------------------------
+def encode_result(result: SimulationResult, key: str, params: dict, index: int = None) -> bytes:
+    def pick(name: str) -> list:
+        value = getattr(result, name)
+        return (value if index is None else value[index]).tolist()
+
+    robot = params["robot"]
+    payload = {
+        "fingerprint": key,
+        "years": result.years,
+        "months": result.months,
+        "step": result.step,
+        "start_month": result.start_month,
+        "fiscal_year_start_month": result.fiscal_year_start_month,
+        "robot_names": [r["name"] for r in robot["items"][:robot["num_types"]]],
+        "month_index": result.month_index.tolist(),
+        "series": {name: pick(name) for name in SERIES_FIELDS},
+        "annual": {name: pick(name) for name in ANNUAL_FIELDS},
+    }
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# -----------------------------
+# ワーカープロセスで1バッチ分を計算
+#   requests：[(key, params, years, inputs)]。期間・サイドバー入力・構造が同じリクエストは
+#   数値項目をシナリオ軸の配列にして一括で計算し（scenarios.stack_params）、失敗したまとまりは
+#   1件ずつ計算し直す
+#   返り値：リクエストの順に (True, 応答の bytes) または (False, エラーメッセージ)
+# -----------------------------
+def _evaluate_requests(requests: list) -> list:
+    results = [None] * len(requests)
+    groups = {}
+    for pos, (_, params, years, inputs) in enumerate(requests):
+        try:
+            group = (years, tuple(inputs), structure_key(params))
+        except Exception as e:
+            results[pos] = (False, f"{type(e).__name__}: {e}")
+            continue
+        groups.setdefault(group, []).append(pos)
+
+    def evaluate_one(pos: int) -> tuple:
+        key, params, years, inputs = requests[pos]
+        try:
+            return True, encode_result(simulate(params, years, *inputs), key, params)
+        except Exception as e:
+            return False, f"{type(e).__name__}: {e}"
+
+    for (years, inputs, _), positions in groups.items():
+        size = scale_chunk(DEFAULT_MAX_BATCH, requests[positions[0]][1])
+        for start in range(0, len(positions), size):
+            block = positions[start:start + size]
+            if len(block) == 1:
+                results[block[0]] = evaluate_one(block[0])
+                continue
+            try:
+                result = simulate(stack_params([requests[pos][1] for pos in block]), years, *inputs)
+                for i, pos in enumerate(block):
+                    key, params = requests[pos][:2]
+                    results[pos] = True, encode_result(result, key, params, index=i)
+            except Exception:
+                for pos in block:
+                    results[pos] = evaluate_one(pos)
+    return results
+
+
+def _warm_up(_) -> int:
+    # ワーカープロセスの起動と import（simulation など）を先に済ませておく（最初のリクエストを待たせない）
+    return os.getpid()
+
+
+# -----------------------------
+# シミュレーションサービス（HTTP に依存しない本体）
+#   - submit：応答の Future を返す。キャッシュ（params_fingerprint → 応答の bytes）にあれば即完了、
+#             同じ fingerprint を計算中ならその Future を共有する。計算できなければ ValueError で失敗する
+#   - リクエストはキューに積み、ディスパッチ用のスレッドがワーカーの空きができるたびに、その時点で
+#     キューにあるもの（max_batch 件まで）を1バッチにまとめてプロセスプールに投げる
+#     → 空いていれば待たずに1件で計算し、混んでいるときほど大きなバッチでまとめて計算する
+# -----------------------------
+class SimulationService:
+    def __init__(self, workers: int = None, cache: ResultCache = None, max_batch: int = DEFAULT_MAX_BATCH):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.cache = ResultCache(max_entries=DEFAULT_CACHE_ENTRIES) if cache is None else cache
+        self.max_batch = max_batch
+        self.batches = 0
+        self.requests = 0
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._queue = queue.Queue()
+        self._pending = {}  # key -> Future（計算中）
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.workers)
+        # 全ワーカーを起動しておく（同時に投げて、すべてのプロセスが立ち上がるまで待つ）
+        list(self._pool.map(_warm_up, range(self.workers)))
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, params: dict, years: int, attendees_per_event, events_per_company_per_month,
+               robot_uio_users_per_month) -> Future:
+        inputs = [attendees_per_event, events_per_company_per_month, robot_uio_users_per_month]
+        try:
+            key = params_fingerprint(params, years, *inputs)
+        except Exception as e:  # 項目の型が想定と異なる（"items": null など）。計算時のエラーと同じく失敗した Future
+            future = Future()
+            future.set_exception(ValueError(f"{type(e).__name__}: {e}"))
+            return future
+        with self._lock:
+            self.requests += 1
+            cached = self.cache.get(key)
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+                return future
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+                self._queue.put((key, params, years, inputs))
+            return future
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            self._slots.acquire()
+            batch = [first]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self.batches += 1
+            self._pool.submit(_evaluate_requests, batch).add_done_callback(
+                lambda done, batch=batch: self._finish(batch, done))
+
+    def _finish(self, batch: list, done: Future) -> None:
+        self._slots.release()
+        try:
+            results = done.result()
+        except Exception as e:  # ワーカーが落ちた場合など
+            results = [(False, f"{type(e).__name__}: {e}")] * len(batch)
+        for (key, *_), (ok, value) in zip(batch, results):
+            if ok:
+                self.cache.put(key, value)
+            with self._lock:
+                future = self._pending.pop(key)
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(ValueError(value))
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "requests": self.requests, "batches": self.batches,
+                "queued": self._queue.qsize(), "cache": self.cache.stats()}
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._dispatcher.join()
+        self._pool.shutdown()
+
+
+# -----------------------------
+# HTTP（JSON、ローカル用）
+#   POST /simulate：{"params": build_params_from_state() の params, "years", "attendees_per_event",
+#                    "events_per_company_per_month", "robot_uio_users_per_month"}（params 以外は省略可、
+#                    既定は DEFAULT_INPUTS。params の中身だけを送ってもよい）
+#                    → {"fingerprint", 期間・暦, "robot_names", "series": ステップごとの系列,
+#                       "annual": 年次の系列}（金額の単位は SimulationResult と同じ）
+#   POST /batch：{"scenarios": [/simulate と同じ形], "years" など（各シナリオの既定値）}
+#                → 入力の順の配列（計算できなかったシナリオは {"error": ...}）
+#   GET /health：ワーカー数・リクエスト数・バッチ数・キャッシュの状況
+# -----------------------------
+def _request_args(body: dict, defaults: dict) -> tuple:
+    if not isinstance(body, dict):
+        raise ValueError("シナリオは JSON オブジェクトで指定してください")
+    params = body["params"] if "params" in body else body
+    if not isinstance(params, dict) or "robot" not in params or "app" not in params:
+        raise ValueError("params の形式が想定と異なります（robot/appがありません）")
+    return (params, *(body.get(k, defaults[k]) for k in INPUT_KEYS))
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive（接続を使い回す）
+    server_version = "RobotSimService/1.0"
+
+    def log_message(self, format, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, message: str) -> None:
+        self._send(status, json.dumps({"error": message}, ensure_ascii=False).encode("utf-8"))
+
+    def do_GET(self) -> None:
+        if self.path != "/health":
+            return self._error(404, f"not found: {self.path}")
+        self._send(200, json.dumps(self.server.service.stats()).encode("utf-8"))
+
+    def do_POST(self) -> None:
+        if self.path not in ("/simulate", "/batch"):
+            return self._error(404, f"not found: {self.path}")
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+            if self.path == "/simulate":
+                futures = [self.server.service.submit(*_request_args(body, DEFAULT_INPUTS))]
+            else:
+                if not isinstance(body, dict) or not isinstance(body.get("scenarios"), list):
+                    raise ValueError('/batch は {"scenarios": [...]} で指定してください')
+                defaults = {k: body.get(k, v) for k, v in DEFAULT_INPUTS.items()}
+                futures = []
+                for scenario in body["scenarios"]:
+                    try:
+                        futures.append(self.server.service.submit(*_request_args(scenario, defaults)))
+                    except ValueError as e:
+                        futures.append(e)
+        except ValueError as e:  # JSON の形式・params の形式
+            return self._error(400, str(e))
+
+        parts = []
+        for future in futures:
+            try:
+                if isinstance(future, Exception):
+                    raise future
+                parts.append(future.result(timeout=self.server.timeout_seconds))
+            except Exception as e:
+                if self.path == "/simulate":
+                    return self._error(400, str(e))
+                parts.append(json.dumps({"error": str(e)}, ensure_ascii=False).encode("utf-8"))
+        self._send(200, parts[0] if self.path == "/simulate" else b"[" + b",".join(parts) + b"]")
+
+
+class SimulationServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address: tuple, service: SimulationService, timeout_seconds: float = DEFAULT_TIMEOUT,
+                 verbose: bool = False):
+        self.service = service
+        self.timeout_seconds = timeout_seconds
+        self.verbose = verbose
+        super().__init__(address, ServiceHandler)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="シミュレーションを HTTP（POST /simulate・/batch）で提供するローカルサービス")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="ポート番号")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="プロセス数")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="1バッチにまとめるリクエスト数の上限")
+    parser.add_argument("--cache-mb", type=int, default=256, help="応答キャッシュの上限（MB）")
+    parser.add_argument("--verbose", action="store_true", help="リクエストごとにログを出す")
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(max_entries=DEFAULT_CACHE_ENTRIES, max_bytes=args.cache_mb * 1024 * 1024)
+    service = SimulationService(workers=args.workers, cache=cache, max_batch=args.max_batch)
+    server = SimulationServer((args.host, args.port), service, verbose=args.verbose)
+    print(f"http://{args.host}:{args.port} で待ち受けています（ワーカー {service.workers}）", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,920 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# 計算内容が変わったら上げる（params_fingerprint・結果ストアの場所に含め、以前の計算の結果を使わない）
+ENGINE_VERSION = 2
+
+
+# -----------------------------
+# 時間刻み（params["time"]）
+#   - step：1ステップの長さ（"month" / "week" / "day"、1年 = 12 / 52 / 365 ステップ）
+#   - start_month：1ヶ月目の暦月、fiscal_year_start_month：会計年度の開始月（年度・四半期の集計用）
+# 月単位の入力（月額料金・月間解約率・月当たり費用・月間イベント数など）はステップの長さに換算し、
+# 月を指定する入力（販売開始月・iPhone開発月・不具合修正周期など）は各ステップが属する月で判定する
+# -----------------------------
+STEPS_PER_YEAR = {"month": 12, "week": 52, "day": 365}
+DEFAULT_TIME = {"step": "month", "start_month": 4, "fiscal_year_start_month": 4}
+CHUNK_TYPES = 10     # scale_chunk：チャンクのシナリオ数を減らし始めるロボット種類数
+CHUNK_DEALERS = 500  # 同じく販売会社数（販売会社ごとのモデルのみ）
+
+
+def time_settings(params: dict) -> dict:
+    # time の指定がない params（従来の保存データなど）は月次
+    return {**DEFAULT_TIME, **params.get("time", {})}
+
+
+def time_grid(years: int, step: str) -> tuple:
+    # 各ステップが属する月（0始まり）と、1ステップの長さ（月）
+    per_year = STEPS_PER_YEAR[step]
+    return np.arange(years * per_year) * 12 // per_year, 12 / per_year
+
+
+def scale_chunk(chunk_size: int, params: dict) -> int:
+    # 月次・CHUNK_TYPES 種類以下を前提に決めたチャンクのシナリオ数を、1ヶ月当たりのステップ数と
+    # ロボット種類数の倍率で割る（種類 × ステップ の配列を持つチャンクのメモリを同程度に保つ）
+    # 販売会社ごとのモデルは、販売会社数（上限）の CHUNK_DEALERS に対する倍率でも割る
+    types = max(1, -(-len(params["robot"]["items"]) // CHUNK_TYPES))
+    dealers = 1
+    if params.get("dealer", {}).get("model") == "agents":
+        max_companies = params["dealer"]["max_companies"]
+        if is_schedule(max_companies):  # スケジュールは区間の値の最大（伸び率は見ない目安）
+            max_companies = [s["value"] for s in max_companies["schedule"]]
+        dealers = max(1, -(-int(np.max(max_companies)) // CHUNK_DEALERS))
+    return max(1, chunk_size * 12 // STEPS_PER_YEAR[time_settings(params)["step"]] // types // dealers)
+
+
+# -----------------------------
+# シミュレーション結果（ステップごと・年次の全系列）
+# ※金額の単位：ステップごとの系列は円、年次（annual_* / cumulative_loss）は万円
+# ※各系列は numpy 配列（robot_sales_by_type は 種別 × ステップ の2次元）
+# ※ステップごとの系列は時間刻みが月なら月次（events_per_month などの名前も月次のまま）
+# ※バッチ評価時は各系列の先頭にシナリオ軸が付く（(N × ステップ)、(N × 種別 × ステップ)）
+# -----------------------------
+@dataclass
+class SimulationResult:
+    years: int
+    months: int
+    robot_names: list
+
+    # 収益
+    contract_companies: np.ndarray
+    events_per_month: np.ndarray
+    attendees_per_month: np.ndarray
+    new_users: np.ndarray
+    trial_starts: np.ndarray
+    paying_users: np.ndarray
+    app_revenue: np.ndarray
+    commission_revenue: np.ndarray
+    total_revenue: np.ndarray
+    robot_sales_by_type: np.ndarray
+
+    # 支出
+    cost_app_android_initial: np.ndarray
+    cost_app_ios_initial: np.ndarray
+    cost_robot_if_dev: np.ndarray
+    cost_app_android_bugfix: np.ndarray
+    cost_app_ios_bugfix: np.ndarray
+    cost_cloud_initial_arr: np.ndarray
+    cost_cloud_aws: np.ndarray
+    cost_cloud_bugfix_arr: np.ndarray
+    cost_cloud_scale: np.ndarray
+    new_companies: np.ndarray
+    cost_shop_acquisition: np.ndarray
+    cost_customer_support: np.ndarray
+    potstill_fte: np.ndarray
+    cost_potstill_salary: np.ndarray
+    total_expense: np.ndarray
+    profit: np.ndarray
+
+    # 年次集計
+    annual_total: np.ndarray = field(default=None)
+    annual_app: np.ndarray = field(default=None)
+    annual_commission: np.ndarray = field(default=None)
+    annual_robot_sales: np.ndarray = field(default=None)
+    annual_expense: np.ndarray = field(default=None)
+    annual_profit: np.ndarray = field(default=None)
+    annual_robot_sales_by_type: np.ndarray = field(default=None)
+    cumulative_loss: np.ndarray = field(default=None)
+
+    # 時間刻み（month_index は各ステップが属する月、0始まり）
+    step: str = field(default="month")
+    month_index: np.ndarray = field(default=None)
+    start_month: int = field(default=4)
+    fiscal_year_start_month: int = field(default=4)
+
+
+# -----------------------------
+# 有料会員数の漸化式  p[m] = p[m-1] * (1 - churn[m]) + x[m]
+# を線形フィルタとして解く（最終軸が月、先頭軸はシナリオ軸としてまとめて計算）
+#   - 短い系列・解約率が極端な場合：月ごとの逐次計算
+#   - 長い系列：FILTER_BLOCK ヶ月ごとのブロック内を累積和で解き、
+#               ブロック末尾の値を同じ漸化式（係数はブロック内の d の積、一定なら d^B）で再帰的に繋ぐ → O(n)
+# -----------------------------
+FILTER_BLOCK = 64
+
+
+def geometric_filter(x: np.ndarray, churn_rate) -> np.ndarray:
+    # churn_rate は最終軸がステップ（長さ 1 なら全ステップ同じ解約率、解約率のスケジュールはステップごと）
+    x = np.asarray(x, dtype=float)
+    n = x.shape[-1]
+    d = 1.0 - np.asarray(churn_rate, dtype=float)
+    if n <= FILTER_BLOCK or not np.all((0.5 <= d) & (d <= 1.0)):
+        # d^-j のオーバーフローを避けるため、解約率が極端な場合は逐次計算
+        out = np.empty(np.broadcast_shapes(x.shape, d.shape))
+        prev = np.zeros(out.shape[:-1])
+        last = d.shape[-1] - 1
+        for i in range(n):
+            prev = prev * d[..., min(i, last)] + x[..., i]
+            out[..., i] = prev
+        return out
+
+    B = FILTER_BLOCK
+    nb = -(-n // B)
+    lead = np.broadcast_shapes(x.shape[:-1], d.shape[:-1])
+    blocks = np.zeros(lead + (nb * B,))
+    blocks[..., :n] = x
+    blocks = blocks.reshape(lead + (nb, B))
+
+    # ブロック内：local[b, j] = Σ_{k<=j} x[b, k] * (d[b, k+1] × … × d[b, j])
+    #   一定なら w[j] = d^j、ステップごとなら w[b, j] = d[b, 1] × … × d[b, j]（ブロック内の累積積）
+    if d.shape[-1] == 1:
+        w = d[..., None] ** np.arange(B)
+        first = d[..., None]
+        decay = d ** B
+    else:
+        steps = np.ones(d.shape[:-1] + (nb * B,))
+        steps[..., :n] = d
+        steps = steps.reshape(d.shape[:-1] + (nb, B))
+        w = np.cumprod(np.concatenate((np.ones(steps.shape[:-1] + (1,)), steps[..., 1:]), axis=-1), axis=-1)
+        first = steps[..., :1]
+        decay = (w * first)[..., -1]
+    local = np.cumsum(blocks / w, axis=-1) * w
+
+    # ブロック末尾の値を繋ぐ：E[b] = local[b, -1] + (ブロック内の d の積) * E[b-1]
+    ends = geometric_filter(local[..., -1], 1.0 - decay)
+    carry = np.concatenate((np.zeros(lead + (1,)), ends[..., :-1]), axis=-1)
+    out = local + carry[..., None] * (w * first)
+    return out.reshape(lead + (nb * B,))[..., :n]
+
+
+# -----------------------------
+# 継続期間別の解約率（コホート）
+#   - survival_curve：継続 k ステップ後も残っている割合 S[k]（S[0] = 1）
+#       継続月ごとの月間解約率は churn_segments（{"months", "churn_rate"} の区間を先頭から順に適用）、
+#       区間の後は churn_rate。multiplier（ロボット種別ごとの倍率）を掛け、1ステップ当たりに換算する
+#   - survival_convolve：獲得ステップ別の課金開始数 x と S の畳み込み（有料会員数 = Σ_k x[t-k] * S[k]）
+#       短い系列で S にシナリオ軸がなければ下三角テプリッツ行列との積、それ以外は FFT（O(n log n)）
+# S が等比（区間なし）なら geometric_filter と同じ値になる（_stage_users はその場合 geometric_filter を使う）
+# -----------------------------
+CONV_DIRECT_MAX = 256
+
+
+def survival_curve(churn_rate, churn_segments: list, multiplier, steps: int, step: str) -> np.ndarray:
+    tenure_month = np.arange(steps) * 12 // STEPS_PER_YEAR[step]
+    dt = 12 / STEPS_PER_YEAR[step]
+    months = np.arange(tenure_month[-1] + 1)
+    churn = np.broadcast_to(np.asarray(churn_rate, dtype=float)[..., None], np.shape(churn_rate) + months.shape)
+    start = 0
+    for segment in churn_segments:
+        end = start + np.asarray(segment["months"])[..., None]
+        churn = np.where((start <= months) & (months < end), np.asarray(segment["churn_rate"], dtype=float)[..., None],
+                         churn)
+        start = end
+    churn = np.minimum(churn[..., None, :] * np.asarray(multiplier, dtype=float)[..., :, None], 1.0)
+    retain = (1.0 - churn)[..., tenure_month]
+    if dt != 1:
+        retain = retain ** dt
+    ones = np.ones(retain.shape[:-1] + (1,))
+    return np.concatenate((ones, np.cumprod(retain[..., :-1], axis=-1)), axis=-1)
+
+
+def survival_convolve(x: np.ndarray, survival: np.ndarray) -> np.ndarray:
+    n = x.shape[-1]
+    if n <= CONV_DIRECT_MAX and survival.ndim <= 2:
+        lag = np.arange(n)[:, None] - np.arange(n)[None, :]
+        toeplitz = np.where(lag >= 0, survival[..., np.maximum(lag, 0)], 0.0)
+        return np.einsum("...j,...tj->...t", x, toeplitz)
+    size = 1 << (2 * n - 1).bit_length()
+    out = np.fft.irfft(np.fft.rfft(x, size) * np.fft.rfft(survival, size), size)[..., :n]
+    return np.maximum(out, 0.0)  # FFT の丸め誤差で 0 付近が負にならないように
+
+
+# -----------------------------
+# 段階的な閾値（クラウド増強の閾値・AWS の段階料金）
+#   - sort_tiers：閾値を昇順に並べ、対応する値（費用・単価）を同じ順に並べ替える（評価ごとに1回だけ）
+#   - tier_counts：levels の各値について、その値以下の閾値の数（= 何段目の区間にいるか）
+#       閾値にシナリオ軸がなければ searchsorted（O(n log K)）、
+#       あれば閾値と levels をまとめて安定ソートし、各 level より前に並んだ閾値を数える（O((n+K) log(n+K))）
+# どちらも閾値の数 K × ステップ数 n の配列を作らないので、閾値が数百段でも軽い
+# -----------------------------
+def sort_tiers(thresholds: np.ndarray, values: np.ndarray) -> tuple:
+    order = np.argsort(thresholds, axis=-1, kind="stable")
+    return np.take_along_axis(thresholds, order, axis=-1), _take(values, order)
+
+
+def tier_counts(levels: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+    if thresholds.ndim <= 1:
+        return np.searchsorted(thresholds, levels, side="right")
+    lead = np.broadcast_shapes(levels.shape[:-1], thresholds.shape[:-1])
+    levels = np.broadcast_to(levels, lead + levels.shape[-1:])
+    merged = np.concatenate((np.broadcast_to(thresholds, lead + thresholds.shape[-1:]), levels), axis=-1)
+    # 同じ値なら閾値が先（閾値 <= level を数える）
+    return _ranks(merged)[..., thresholds.shape[-1]:] - _ranks(levels)
+
+
+def _ranks(x: np.ndarray) -> np.ndarray:
+    # 最終軸の安定ソートでの順位
+    order = np.argsort(x, axis=-1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.broadcast_to(np.arange(x.shape[-1]), x.shape), axis=-1)
+    return ranks
+
+
+def _take(values: np.ndarray, index: np.ndarray) -> np.ndarray:
+    # values[..., index]（最終軸以外はブロードキャスト）
+    lead = np.broadcast_shapes(values.shape[:-1], index.shape[:-1])
+    return np.take_along_axis(np.broadcast_to(values, lead + values.shape[-1:]),
+                              np.broadcast_to(index, lead + index.shape[-1:]), axis=-1)
+
+
+# -----------------------------
+# パラメータ値を月軸に展開できる形へ
+# ※各値はスカラー、またはシナリオごとの1次元配列（バッチ評価用）
+# -----------------------------
+def _col(value, m: np.ndarray = None) -> np.ndarray:
+    # m（各ステップが属する月）を渡すと、スケジュールの項目はステップごとの値に展開する
+    if m is not None and is_schedule(value):
+        return expand_schedule(value, m)
+    return np.asarray(value)[..., None]
+
+
+def _stack(values: list, dtype=float) -> np.ndarray:
+    # ロボット種別・クラウド閾値などのリストを最終軸にまとめる（シナリオ軸は先頭）
+    if not values:
+        return np.zeros(0, dtype=dtype)
+    return np.stack(np.broadcast_arrays(*[np.asarray(v, dtype=dtype) for v in values]), axis=-1)
+
+
+def _items(root: dict) -> list:
+    return root["robot"]["items"][:root["robot"]["num_types"]]
+
+
+def _delay(x: np.ndarray, source: np.ndarray) -> np.ndarray:
+    # 最終軸を source だけずらす（out[..., t] = x[..., source[t]]、source < 0 は 0）：無料期間後の課金開始数
+    index = np.broadcast_to(np.maximum(source, 0), x.shape)
+    return np.where(source >= 0, np.take_along_axis(x, index, axis=-1), 0)
+
+
+def _per_step(value, dt: float):
+    # 月当たりの量 → 1ステップ当たり（月次ならそのまま）
+    return value if dt == 1 else value * dt
+
+
+def _item_series(items: list, key: str, m: np.ndarray) -> np.ndarray:
+    # ロボット種別ごとの値を (…, 種別, ステップ) に（スケジュールの項目がなければステップ軸の長さは 1）
+    if not items:
+        return np.zeros((0, 1))
+    return np.stack(np.broadcast_arrays(*[_col(r[key], m).astype(float) for r in items]), axis=-2)
+
+
+# -----------------------------
+# 時間で変わるパラメータ（スケジュール）
+#   SCHEDULE_FIELDS の項目は、数値の代わりに区間の列
+#     {"schedule": [{"month": 開始月, "value": 値, "growth": 月間の伸び率}, ...]}
+#   を指定できる（JSON にもこの形のまま保存する）
+#   - 各区間は month（0始まり）から次の区間の開始月の前まで。最初の区間より前は最初の区間の値
+#   - growth（省略時 0）：区間の開始月から毎月 (1 + growth) 倍（人件費の上昇・料金の段階的な値上げなど）
+#   - value / growth はシナリオごとの配列でもよい（month はシナリオ共通）
+#   params には区間のまま持ち、ステージの中で各ステップが属する月の値に展開する（expand_schedule）
+#   展開は区間の開始月の searchsorted と累乗だけで、区間数 × ステップ数 の配列は作らない
+#   ※月・件数・閾値・継続期間を表す項目（販売開始月・無料期間・不具合修正周期・増強の閾値など）は対象外
+#   ※解約率のスケジュールは継続期間別の解約率（churn_segments）と併用できない
+# -----------------------------
+SCHEDULE_FIELDS = (
+    "app.monthly_fee", "app.churn_rate",
+    "robot.items.*.price", "robot.items.*.commission_rate", "robot.items.*.purchase_rate",
+    "dealer.max_companies", "dealer.company_growth_per_month",
+    "develop.android_dev_initial", "develop.ios_dev_initial", "develop.robot_if_dev",
+    "develop.android_bugfix_cost", "develop.ios_bugfix_cost",
+    "cloud.initial_cost", "cloud.bugfix_cost", "cloud.aws_cost_per_user_month",
+    "tool.robot_unit_cost", "tool.sales_tool_cost_per_shop", "tool.robots_per_shop",
+    "sport.cs_cost_per_user_month",
+    "labor.base_fte", "labor.fte_cost_per_month", "labor.base_users", "labor.fte_increment_users",
+    "labor.fte_increment",
+)
+
+
+def is_schedule(value) -> bool:
+    return isinstance(value, dict) and "schedule" in value
+
+
+def is_schedule_field(path: str) -> bool:
+    # 例: "robot.items.3.price" -> "robot.items.*.price" が SCHEDULE_FIELDS にあるか
+    parts = path.split(".")
+    if parts[:2] == ["robot", "items"] and len(parts) == 4 and parts[2].isdigit():
+        parts[2] = "*"
+    return ".".join(parts) in SCHEDULE_FIELDS
+
+
+def find_schedules(params: dict, prefix: str = "") -> dict:
+    # params 内のスケジュール（ドット区切りパス → 区間の列）
+    found = {}
+    children = params.items() if isinstance(params, dict) else enumerate(params)
+    for key, value in children:
+        path = f"{prefix}{key}"
+        if is_schedule(value):
+            found[path] = value["schedule"]
+        elif isinstance(value, (dict, list)):
+            found.update(find_schedules(value, path + "."))
+    return found
+
+
+def expand_schedule(value, m: np.ndarray) -> np.ndarray:
+    # 各ステップ（属する月 m）の値（最終軸がステップ）。スケジュールでなければ長さ 1 の軸を付けるだけ
+    if not is_schedule(value):
+        return np.asarray(value)[..., None]
+    if not value["schedule"]:
+        raise ValueError("スケジュールに区間がありません（開始月と値の区間を1つ以上指定してください）")
+    segments = sorted(value["schedule"], key=lambda s: int(s["month"]))
+    start = np.array([int(s["month"]) for s in segments], dtype=np.int64)
+    values = _stack([s["value"] for s in segments], dtype=np.result_type(*[s["value"] for s in segments]))
+    growth = _stack([s.get("growth", 0.0) for s in segments])
+    k = np.maximum(np.searchsorted(start, m, side="right") - 1, 0)
+    if not np.any(growth):
+        return values[..., k]  # 段階的な変化だけなら値を並べるだけ（整数の項目は整数のまま）
+    return values[..., k] * (1.0 + growth[..., k]) ** np.maximum(m - start[k], 0)
+
+
+# -----------------------------
+# モデルの計算段（ステージ）
+#   - reads：そのステージが参照する入力のドット区切りパス（"*" は dict / list の全要素）
+#            params の項目に加え、inputs.* で期間・サイドバー入力・差し替え系列を参照する
+#   - deps：そのステージが使う上流ステージ
+#   - compute(root, ctx)：root はパラメータ＋inputs、ctx は上流ステージの出力。出力を dict で返す
+# STAGES は依存順（上流が先）に並べる。reads / deps に書いていない値は参照しないこと
+# （incremental.IncrementalSimulator が変更のあったステージと下流だけを再計算するため）
+# -----------------------------
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    reads: tuple
+    deps: tuple
+    compute: object
+
+
+def _stage_horizon(root: dict, ctx: dict) -> dict:
+    # m：各ステップが属する月、step_index：ステップ番号、month_start：各月の最初のステップ
+    m, dt = time_grid(root["inputs"]["years"], root["time"]["step"])
+    month_start = np.diff(m, prepend=-1) > 0
+    return {"m": m, "dt": dt, "step_index": np.arange(len(m)), "month_start": month_start,
+            "step": root["time"]["step"]}
+
+
+def _stage_calendar(root: dict, ctx: dict) -> dict:
+    return {"start_month": root["time"]["start_month"],
+            "fiscal_year_start_month": root["time"]["fiscal_year_start_month"]}
+
+
+def _stage_labels(root: dict, ctx: dict) -> dict:
+    return {"robot_names": [r["name"] for r in _items(root)]}
+
+
+# -----------------------------
+# 販売会社ごとのモデル（dealer.model = "agents"）
+#   - 契約の推移は従来どおり（初期実証期間は固定 → 毎月の増加数で増加 → 上限で頭打ち）、
+#     累計契約数（推移の累積最大）が i を超えたステップに i 番目の販売会社が契約する
+#   - 販売会社ごとのイベント数・集客数の倍率：平均1の対数正規分布（変動係数 event_rate_cv / attendees_cv）
+#   - 立ち上がり：契約時は ramp_start、ramp_months ヶ月かけて直線的に 1 まで上がる
+#   - 解約：毎月 churn_rate の確率で契約終了（契約期間は幾何分布、解約後は戻らない）
+#   - 乱数は seed で固定（同じ params なら同じ結果、バッチの各シナリオは同じ販売会社の組を使う。
+#     i 番目の販売会社の乱数は販売会社の総数によらないので、どのバッチで計算しても同じ結果）
+# 販売会社ごとの状態（契約・解約ステップ、倍率）を (シナリオ × 販売会社) の配列に持ち、
+# ステップごとの合計は契約・解約・立ち上がり完了のステップでの増減を bincount で集めて累積和をとる
+# （販売会社数 × ステップ数 の配列は作らない。立ち上がり中の分だけ経過ステップごとに加える）
+# 返り値：契約中の販売会社数、新規契約数、イベント数の倍率の合計（activity）、集客数の倍率の合計（reach）
+# -----------------------------
+DEALER_AGENTS = {
+    "event_rate_cv": 0.5,
+    "attendees_cv": 0.3,
+    "ramp_months": 6,
+    "ramp_start": 0.3,
+    "churn_rate": 0.01,
+    "seed": 0,
+}
+
+
+def dealer_agents(agents: dict, signed: np.ndarray, dt: float) -> dict:
+    agents = {**DEALER_AGENTS, **(agents or {})}
+    signed = np.maximum.accumulate(np.floor(signed), axis=-1)
+    n = signed.shape[-1]
+    dealers = int(signed.max(initial=0))
+    # i 番目の販売会社の乱数が販売会社の総数（バッチ内で最大のシナリオ）によらないように、
+    # 倍率用（正規乱数を販売会社ごとに1行ずつ）と解約用（一様乱数）で別の系列から先頭 dealers 件を引く
+    rng_factor, rng_churn = (np.random.default_rng(s) for s in np.random.SeedSequence(agents["seed"]).spawn(2))
+
+    def lognormal(cv, z):
+        sigma = np.sqrt(np.log1p(np.asarray(cv, dtype=float) ** 2))[..., None]
+        return np.exp(sigma * z - sigma ** 2 / 2)
+
+    z_events, z_attendees = rng_factor.standard_normal((dealers, 2)).T
+    event_factor = lognormal(agents["event_rate_cv"], z_events)
+    reach_factor = event_factor * lognormal(agents["attendees_cv"], z_attendees)
+
+    # 契約ステップ（累計契約数 <= i のステップ数）と解約ステップ（契約中のステップ数は幾何分布）
+    signup = tier_counts(np.arange(dealers), signed)
+    churn = 1.0 - (1.0 - _col(agents["churn_rate"]).astype(float)) ** dt
+    with np.errstate(divide="ignore"):
+        stay = np.where(churn > 0, np.floor(np.log(rng_churn.random(dealers)) / np.log1p(-np.minimum(churn, 1.0))), n)
+    end = np.minimum(signup + 1 + np.minimum(stay, n).astype(np.int64), n)
+
+    lead = np.broadcast_shapes(signup.shape[:-1], end.shape[:-1], event_factor.shape[:-1], reach_factor.shape[:-1])
+    offset = np.arange(int(np.prod(lead))).reshape(lead + (1,)) * (n + 1)
+
+    def per_step(at, weight) -> np.ndarray:
+        # at（n はホライズン外）ごとの weight の合計 → (シナリオ × (n + 1))
+        at = np.broadcast_to(at, lead + (dealers,))
+        return np.bincount((offset + at).ravel(), weights=np.broadcast_to(weight, at.shape).ravel(),
+                           minlength=offset.size * (n + 1)).reshape(lead + (n + 1,))
+
+    # 立ち上がり：経過 k ステップの倍率（ramp_months = 0 なら 1）、ramp ステップ以降は 1
+    ramp_months = _col(agents["ramp_months"]).astype(float)
+    ramp_start = _col(agents["ramp_start"]).astype(float)
+    ramp = int(np.ceil(np.max(ramp_months) / dt)) if np.any(ramp_months > 0) else 0
+    mature = np.minimum(signup + ramp, end)
+    out = {"contract_companies": np.cumsum(per_step(signup, 1.0) - per_step(end, 1.0), axis=-1)[..., :n]}
+    for name, factor in (("dealer_activity", event_factor), ("dealer_reach", reach_factor)):
+        total = np.cumsum(per_step(mature, factor) - per_step(end, factor), axis=-1)
+        for k in range(ramp):
+            level = np.where(ramp_months > 0,
+                             np.minimum(ramp_start + (1.0 - ramp_start) * k * dt / np.maximum(ramp_months, 1e-9), 1.0),
+                             1.0)
+            total += per_step(np.where(signup + k < end, signup + k, n), factor * level)
+        out[name] = total[..., :n]
+    out["new_companies"] = np.diff(signed, axis=-1, prepend=0)
+    return out
+
+
+def dealer_curve(dealer: dict, m: np.ndarray) -> np.ndarray:
+    # 契約販売会社数の推移（初期実証期間は固定 → 毎月の増加数で増加 → 上限で頭打ち）
+    # m は各ステップが属する月。増加数がスケジュールなら月ごとの増加数の累積和
+    initial_companies = _col(dealer["initial_companies"])
+    max_companies = _col(dealer["max_companies"], m)
+    fixed_months_before_growth = _col(dealer["fixed_months_before_growth"])
+    company_growth_per_month = dealer["company_growth_per_month"]
+    if is_schedule(company_growth_per_month):
+        months = np.arange(m[-1] + 1)
+        added = np.where(months >= fixed_months_before_growth, _col(company_growth_per_month, months), 0)
+        grown = initial_companies + np.cumsum(added, axis=-1)[..., m]
+    else:
+        grown = initial_companies + _col(company_growth_per_month) * (m - fixed_months_before_growth + 1)
+    return np.where(m < fixed_months_before_growth, initial_companies, np.minimum(grown, max_companies))
+
+
+def _stage_dealer(root: dict, ctx: dict) -> dict:
+    # 契約販売会社数の推移（dealer_curve）
+    # ※dealer.model = "agents" なら、この推移（inputs で渡された推移も同じ）を累計契約数として
+    #   販売会社ごとに計算（dealer_agents）
+    contract_companies = root["inputs"]["contract_companies"]
+    dealer = root["dealer"]
+    if contract_companies is None:
+        contract_companies = dealer_curve(dealer, ctx["m"])
+    if dealer.get("model") == "agents":
+        return dealer_agents(dealer.get("agents"), contract_companies, ctx["dt"])
+    new_companies = np.maximum(np.diff(contract_companies, axis=-1, prepend=0), 0)
+    return {"contract_companies": contract_companies, "new_companies": new_companies,
+            "dealer_activity": None, "dealer_reach": None}
+
+
+def _stage_events(root: dict, ctx: dict) -> dict:
+    # イベント数・集客数（1ステップ当たり）
+    # ※販売会社ごとのモデルでは、販売会社ごとの倍率（立ち上がり込み）の合計 × 1社あたりの値
+    events_per_company_per_month = _per_step(_col(root["inputs"]["events_per_company_per_month"]), ctx["dt"])
+    attendees_per_event = _col(root["inputs"]["attendees_per_event"])
+    if ctx["dealer_activity"] is None:
+        events_per_month = ctx["contract_companies"] * events_per_company_per_month
+        attendees_per_month = events_per_month * attendees_per_event
+    else:
+        events_per_month = ctx["dealer_activity"] * events_per_company_per_month
+        attendees_per_month = ctx["dealer_reach"] * events_per_company_per_month * attendees_per_event
+    return {"events_per_month": events_per_month, "attendees_per_month": attendees_per_month}
+
+
+def _stage_robot_sales(root: dict, ctx: dict) -> dict:
+    # 種類ごとの販売台数（イベント数 × 集客数　×　種別ごとの購入率、販売開始月の翌月から）
+    # ※元の int() と同じく小数点以下切り捨て
+    # ※週次・日次は1ステップの台数が1台未満になりやすいため、累計台数を切り捨てて差分を取る
+    robot_sales_by_type = root["inputs"]["robot_sales_by_type"]
+    if robot_sales_by_type is None:
+        m = ctx["m"]
+        items = _items(root)
+        release_month = _stack([r["release_month"] for r in items], dtype=np.int64)
+        purchase_rates = _item_series(items, "purchase_rate", m)
+        expected = ctx["attendees_per_month"][..., None, :] * purchase_rates
+        if ctx["dt"] == 1:
+            robot_sales_by_type = np.where(m > release_month[..., :, None], expected.astype(np.int64), 0)
+        else:
+            expected = np.where(m > release_month[..., :, None], expected, 0)
+            robot_sales_by_type = np.diff(np.floor(np.cumsum(expected, axis=-1)), axis=-1, prepend=0).astype(np.int64)
+    return {"robot_sales_by_type": robot_sales_by_type}
+
+
+def _stage_users(root: dict, ctx: dict) -> dict:
+    # 無料期間はステップ数に、月間解約率は1ステップ当たりの解約率に換算
+    # （解約率は最終軸がステップ、スケジュールでなければ長さ 1）
+    dt = ctx["dt"]
+    free_steps = _col(root["app"]["free_months"]).astype(np.int64)
+    churn_rate = _col(root["app"]["churn_rate"], ctx["m"]).astype(float)
+    if dt != 1:
+        free_steps = np.round(free_steps / dt).astype(np.int64)
+        churn_rate = 1.0 - (1.0 - churn_rate) ** dt
+    robot_uio_users_per_month = _per_step(_col(root["inputs"]["robot_uio_users_per_month"]), dt)
+
+    # 新規ユーザー（全ロボット種別の合計販売台数）
+    new_users = ctx["robot_sales_by_type"].sum(axis=-2)
+    trial_starts = new_users + robot_uio_users_per_month
+
+    # 有料会員数（無料期間後に課金開始、以降は毎月 churn_rate で解約）
+    source = ctx["step_index"] - free_steps
+    trial_starts = np.broadcast_to(trial_starts, np.broadcast_shapes(trial_starts.shape, source.shape))
+    app = root["app"]
+    segments = (app.get("churn_segments") or [])[:app.get("num_churn_segments") or 0]
+    multiplier = _stack([r.get("churn_multiplier", 1.0) for r in _items(root)] + [1.0])
+    if not segments and np.all(multiplier == 1):
+        paying_users = geometric_filter(_delay(trial_starts, source), churn_rate)
+    else:
+        # コホート：ロボット種別ごと＋既存ロボット保有者（最後の行、倍率1）の課金開始数
+        sales = ctx["robot_sales_by_type"]
+        lead = np.broadcast_shapes(trial_starts.shape[:-1], multiplier.shape[:-1], churn_rate.shape[:-1])
+        n = trial_starts.shape[-1]
+        cohorts = np.concatenate((np.broadcast_to(sales, lead + sales.shape[-2:]),
+                                  np.broadcast_to(robot_uio_users_per_month, lead + (n,))[..., None, :]), axis=-2)
+        source = np.broadcast_to(source, lead + (n,))
+        if segments:
+            # 継続期間別の解約率：生存率との畳み込み（暦月で変わる解約率とは組み合わせられない）
+            if is_schedule(app["churn_rate"]):
+                raise ValueError("解約率のスケジュールは継続期間別の解約率と併用できません")
+            survival = survival_curve(app["churn_rate"], segments, multiplier, n, ctx["step"])
+            paying_users = survival_convolve(_delay(cohorts, source[..., None, :]), survival).sum(axis=-2)
+        else:
+            # 区間なし：生存率は種別ごとに等比。倍率1の種別は合計してから1本の漸化式、
+            # 倍率が1でない（シナリオ, 種別）だけ種別の解約率で個別に計算して足す（種類数が多くても軽い）
+            multiplier = np.broadcast_to(multiplier, cohorts.shape[:-1])
+            plain = multiplier == 1
+            paying_users = geometric_filter(_delay(np.where(plain[..., None], cohorts, 0).sum(axis=-2), source),
+                                            churn_rate)
+            paying_users = np.array(np.broadcast_to(paying_users, lead + (n,))).reshape(-1, n)
+            rows, types = np.nonzero(~plain.reshape(-1, plain.shape[-1]))
+            monthly_churn = _col(app["churn_rate"], ctx["m"]).astype(float)
+            steps = monthly_churn.shape[-1]
+            monthly_churn = np.broadcast_to(monthly_churn, lead + (steps,)).reshape(-1, steps)[rows]
+            type_churn = np.minimum(
+                monthly_churn * multiplier.reshape(-1, multiplier.shape[-1])[rows, types][:, None], 1.0)
+            started = _delay(cohorts.reshape((-1,) + cohorts.shape[-2:])[rows, types], source.reshape(-1, n)[rows])
+            np.add.at(paying_users, rows, geometric_filter(started, 1.0 - (1.0 - type_churn) ** dt))
+            paying_users = paying_users.reshape(lead + (n,))
+    return {"new_users": new_users, "trial_starts": trial_starts, "paying_users": paying_users}
+
+
+def _stage_commission(root: dict, ctx: dict) -> dict:
+    # 販売手数料収入（全ロボット種別の合計）
+    items = _items(root)
+    robot_prices = _item_series(items, "price", ctx["m"])
+    commission_rates = _item_series(items, "commission_rate", ctx["m"])
+    commission_revenue = (ctx["robot_sales_by_type"] * (robot_prices * commission_rates)).sum(axis=-2)
+    return {"commission_revenue": commission_revenue}
+
+
+def _stage_app_revenue(root: dict, ctx: dict) -> dict:
+    # アプリ収入（月額料金を1ステップ分に換算）
+    monthly_fee = _per_step(_col(root["app"]["monthly_fee"], ctx["m"]), ctx["dt"])
+    return {"app_revenue": ctx["paying_users"] * monthly_fee * 0.85}
+
+
+def _stage_revenue(root: dict, ctx: dict) -> dict:
+    # 総売上
+    return {"total_revenue": ctx["app_revenue"] + ctx["commission_revenue"]}
+
+
+def _stage_initial_costs(root: dict, ctx: dict) -> dict:
+    # 初期費用（アプリ・ロボットI/F・クラウド、万円 → 円）
+    # ※期間外の開発時期・販売開始月は計上しない。週次・日次はその月の最初のステップに計上
+    m = ctx["m"]
+    month_start = ctx["month_start"]
+    develop = root["develop"]
+    android_dev_initial = _col(develop["android_dev_initial"], m) * 10000
+    ios_dev_initial = _col(develop["ios_dev_initial"], m) * 10000
+    ios_dev_month = _col(develop["ios_dev_month"])
+    robot_if_dev = _col(develop["robot_if_dev"], m) * 10000
+    cloud_initial = _col(root["cloud"]["initial_cost"], m) * 10000
+    release_month = _stack([r["release_month"] for r in _items(root)], dtype=np.int64)
+    return {
+        "cost_app_android_initial": np.where((m == 0) & month_start, android_dev_initial, 0),
+        "cost_app_ios_initial": np.where((m == ios_dev_month) & month_start, ios_dev_initial, 0),
+        "cost_robot_if_dev": np.where((m == release_month[..., :, None]).any(axis=-2) & month_start,
+                                      robot_if_dev, 0),
+        "cost_cloud_initial_arr": np.where((m == 0) & month_start, cloud_initial, 0),
+    }
+
+
+def _stage_bugfix_costs(root: dict, ctx: dict) -> dict:
+    # 不具合修正：bugfix_cycle_months ごと（初月・iPhone開発月までは計上しない、万円 → 円）
+    m = ctx["m"]
+    develop = root["develop"]
+    ios_dev_month = _col(develop["ios_dev_month"])
+    android_bugfix_cost = _col(develop["android_bugfix_cost"], m) * 10000
+    ios_bugfix_cost = _col(develop["ios_bugfix_cost"], m) * 10000
+    bugfix_cycle_months = _col(develop["bugfix_cycle_months"]).astype(np.int64)
+    cloud_bugfix_cost = _col(root["cloud"]["bugfix_cost"], m) * 10000
+    bugfix_month = (m % bugfix_cycle_months == 0) & ctx["month_start"]
+    return {
+        "cost_app_android_bugfix": np.where(bugfix_month & (m >= 1), android_bugfix_cost, 0),
+        "cost_cloud_bugfix_arr": np.where(bugfix_month & (m >= 1), cloud_bugfix_cost, 0),
+        "cost_app_ios_bugfix": np.where(bugfix_month & (m >= ios_dev_month + 1), ios_bugfix_cost, 0),
+    }
+
+
+# 「ユーザー数に応じた費用」は有料会員数を使う
+def _stage_cloud_aws(root: dict, ctx: dict) -> dict:
+    # AWS費用（有料会員数に比例、円のまま）
+    # ※段階料金（num_aws_tiers > 0）：aws_tier_users[k] 人を超えた分は aws_tier_costs[k] 円/人・月
+    cloud = root["cloud"]
+    num_tiers = cloud.get("num_aws_tiers") or 0
+    if not num_tiers:
+        aws_cost_per_user = _per_step(_col(cloud["aws_cost_per_user_month"], ctx["m"]), ctx["dt"])
+        return {"cost_cloud_aws": ctx["paying_users"] * aws_cost_per_user}
+    users = ctx["paying_users"]
+    bounds, rates = sort_tiers(np.maximum(_stack(list(cloud["aws_tier_users"][:num_tiers])), 0),
+                               _stack(list(cloud["aws_tier_costs"][:num_tiers])))
+    base_rate = _col(cloud["aws_cost_per_user_month"], ctx["m"]).astype(float)
+    # 基本単価がスケジュールなら、基本単価 0 で計算してから 基本単価 × 最初の区間の人数 を足す
+    # （費用は基本単価について線形：最初の閾値までの人数だけに基本単価がかかる）
+    scheduled = base_rate.shape[-1] > 1
+    first_rate = base_rate
+    if scheduled:
+        first_rate = np.zeros(base_rate.shape[:-1] + (1,))
+    lead = np.broadcast_shapes(first_rate.shape[:-1], rates.shape[:-1])
+    rates = np.concatenate((np.broadcast_to(first_rate, lead + (1,)), np.broadcast_to(rates, lead + rates.shape[-1:])),
+                           axis=-1)
+    bounds = np.concatenate((np.zeros(bounds.shape[:-1] + (1,)), bounds), axis=-1)
+    # 各区間の下限人数での費用（区間の単価 × 区間の人数 の累積）
+    base = np.concatenate((np.zeros(rates.shape[:-1] + (1,)), np.cumsum(rates[..., :-1] * np.diff(bounds), axis=-1)),
+                          axis=-1)
+    tier = tier_counts(users, bounds[..., 1:])
+    cost = _take(base, tier) + _take(rates, tier) * (users - _take(bounds, tier))
+    if scheduled:
+        cost = cost + base_rate * np.minimum(users, bounds[..., 1:2])
+    return {"cost_cloud_aws": _per_step(cost, ctx["dt"])}
+
+
+def _stage_customer_support(root: dict, ctx: dict) -> dict:
+    # CS費用（有料会員数に比例、円/月）
+    cs_cost_per_user = _per_step(_col(root["sport"]["cs_cost_per_user_month"], ctx["m"]), ctx["dt"])
+    return {"cost_customer_support": ctx["paying_users"] * cs_cost_per_user}
+
+
+def _stage_cloud_scale(root: dict, ctx: dict) -> dict:
+    # クラウド増強費用（有料会員数が閾値を初めて超えた月に1回だけ、万円 → 円）
+    # 閾値を昇順に並べ、会員数の累積最大（先頭に 0）が届いた閾値の数を数えて、
+    # その数が増えたステップに増えた分の費用（費用の累積和の差）を計上する
+    thresholds, costs = sort_tiers(_stack(list(root["cloud"]["thresholds"])),
+                                   _stack(list(root["cloud"]["scale_costs"])) * 10000)
+    users = ctx["paying_users"]
+    peak = np.concatenate((np.zeros(users.shape[:-1] + (1,)), np.maximum.accumulate(users, axis=-1)), axis=-1)
+    paid = np.concatenate((np.zeros(costs.shape[:-1] + (1,)), np.cumsum(costs, axis=-1)), axis=-1)
+    return {"cost_cloud_scale": np.diff(_take(paid, tier_counts(peak, thresholds)), axis=-1)}
+
+
+def _stage_shop_acquisition(root: dict, ctx: dict) -> dict:
+    # 販売店ごとのロボット・ツール費用（新規販売会社数×一式費用）
+    # ※robot_unit_cost は円、sales_tool_cost_per_shop は万円 → 円
+    m = ctx["m"]
+    tool = root["tool"]
+    robot_unit_cost = _col(tool["robot_unit_cost"], m)
+    sales_tool_cost_per_shop = _col(tool["sales_tool_cost_per_shop"], m) * 10000
+    robots_per_shop = _col(tool["robots_per_shop"], m)
+    per_shop_acquisition_cost = robots_per_shop * robot_unit_cost + sales_tool_cost_per_shop
+    return {"cost_shop_acquisition": ctx["new_companies"] * per_shop_acquisition_cost}
+
+
+def _stage_labor(root: dict, ctx: dict) -> dict:
+    # 事業体人件費（有料会員数ベース、増員基準ごとに切り上げで増員、fte_cost_per_month は万円 → 円）
+    m = ctx["m"]
+    labor = root["labor"]
+    base_fte = _col(labor["base_fte"], m)
+    fte_cost_per_month = _per_step(_col(labor["fte_cost_per_month"], m) * 10000, ctx["dt"])
+    base_users = _col(labor["base_users"], m)
+    fte_increment_users = _col(labor["fte_increment_users"], m)
+    fte_increment = _col(labor["fte_increment"], m)
+    users_over_base = np.maximum(ctx["paying_users"] - base_users, 0)
+    increments = np.ceil(users_over_base / fte_increment_users)
+    potstill_fte = base_fte + increments * fte_increment
+    return {"potstill_fte": potstill_fte, "cost_potstill_salary": potstill_fte * fte_cost_per_month}
+
+
+EXPENSE_SERIES = (
+    "cost_app_android_initial",
+    "cost_app_ios_initial",
+    "cost_robot_if_dev",
+    "cost_app_android_bugfix",
+    "cost_app_ios_bugfix",
+    "cost_cloud_initial_arr",
+    "cost_cloud_aws",
+    "cost_cloud_bugfix_arr",
+    "cost_cloud_scale",
+    "cost_shop_acquisition",
+    "cost_customer_support",
+    "cost_potstill_salary",
+)
+
+
+def _stage_totals(root: dict, ctx: dict) -> dict:
+    # 月次総支出・月次利益（売上－支出）
+    total_expense = ctx[EXPENSE_SERIES[0]]
+    for name in EXPENSE_SERIES[1:]:
+        total_expense = total_expense + ctx[name]
+    return {"total_expense": total_expense, "profit": ctx["total_revenue"] - total_expense}
+
+
+STAGES = (
+    Stage("horizon", ("inputs.years", "time.step"), (), _stage_horizon),
+    Stage("calendar", ("time.start_month", "time.fiscal_year_start_month"), (), _stage_calendar),
+    Stage("labels", ("robot.num_types", "robot.items.*.name"), (), _stage_labels),
+    Stage("dealer", ("dealer.*", "inputs.contract_companies"), ("horizon",), _stage_dealer),
+    Stage("events", ("inputs.events_per_company_per_month", "inputs.attendees_per_event"), ("horizon", "dealer"),
+          _stage_events),
+    Stage("robot_sales", ("robot.num_types", "robot.items.*.purchase_rate", "robot.items.*.release_month",
+                          "inputs.robot_sales_by_type"),
+          ("horizon", "events"), _stage_robot_sales),
+    Stage("users", ("app.free_months", "app.churn_rate", "app.num_churn_segments", "app.churn_segments",
+                    "robot.num_types", "robot.items.*.churn_multiplier", "inputs.robot_uio_users_per_month"),
+          ("horizon", "robot_sales"), _stage_users),
+    Stage("commission", ("robot.num_types", "robot.items.*.price", "robot.items.*.commission_rate"),
+          ("horizon", "robot_sales"), _stage_commission),
+    Stage("app_revenue", ("app.monthly_fee",), ("horizon", "users"), _stage_app_revenue),
+    Stage("revenue", (), ("app_revenue", "commission"), _stage_revenue),
+    Stage("initial_costs", ("develop.android_dev_initial", "develop.ios_dev_initial", "develop.ios_dev_month",
+                            "develop.robot_if_dev", "cloud.initial_cost", "robot.num_types",
+                            "robot.items.*.release_month"),
+          ("horizon",), _stage_initial_costs),
+    Stage("bugfix_costs", ("develop.android_bugfix_cost", "develop.ios_bugfix_cost", "develop.bugfix_cycle_months",
+                           "develop.ios_dev_month", "cloud.bugfix_cost"),
+          ("horizon",), _stage_bugfix_costs),
+    Stage("cloud_aws", ("cloud.aws_cost_per_user_month", "cloud.num_aws_tiers", "cloud.aws_tier_users",
+                        "cloud.aws_tier_costs"), ("horizon", "users"), _stage_cloud_aws),
+    Stage("customer_support", ("sport.cs_cost_per_user_month",), ("horizon", "users"), _stage_customer_support),
+    Stage("cloud_scale", ("cloud.thresholds", "cloud.scale_costs"), ("users",), _stage_cloud_scale),
+    Stage("shop_acquisition", ("tool.*",), ("horizon", "dealer"), _stage_shop_acquisition),
+    Stage("labor", ("labor.*",), ("horizon", "users"), _stage_labor),
+    Stage("totals", (), ("revenue", "initial_costs", "bugfix_costs", "cloud_aws", "customer_support",
+                         "cloud_scale", "shop_acquisition", "labor"), _stage_totals),
+)
+
+
+def model_inputs(params: dict, years: int, attendees_per_event, events_per_company_per_month,
+                 robot_uio_users_per_month, contract_companies: np.ndarray = None,
+                 robot_sales_by_type: np.ndarray = None) -> dict:
+    # ステージが参照する入力一式（params に inputs を加え、time を既定値で補ったもの）
+    return {
+        **params,
+        "time": time_settings(params),
+        "inputs": {
+            "years": years,
+            "attendees_per_event": attendees_per_event,
+            "events_per_company_per_month": events_per_company_per_month,
+            "robot_uio_users_per_month": robot_uio_users_per_month,
+            "contract_companies": contract_companies,
+            "robot_sales_by_type": robot_sales_by_type,
+        },
+    }
+
+
+# -----------------------------
+# ステージの出力から結果をまとめる（年次集計もここで行う）
+# シナリオ軸を持たない系列（パラメータに依存しない月次費用など）も同じ形にそろえる
+# -----------------------------
+def assemble_result(ctx: dict, years: int) -> SimulationResult:
+    shape = np.broadcast_shapes(ctx["total_revenue"].shape, ctx["total_expense"].shape)
+
+    def full(series: np.ndarray) -> np.ndarray:
+        return np.broadcast_to(series, shape)
+
+    robot_sales_by_type = ctx["robot_sales_by_type"]
+    series = {name: full(ctx[name]) for name in (
+        "contract_companies", "events_per_month", "attendees_per_month", "new_users", "trial_starts", "paying_users", "app_revenue",
+        "commission_revenue", "total_revenue", "new_companies", "potstill_fte", "total_expense", "profit",
+    ) + EXPENSE_SERIES}
+    result = SimulationResult(
+        years=years,
+        months=years * 12,
+        robot_names=ctx["robot_names"],
+        robot_sales_by_type=np.broadcast_to(robot_sales_by_type, shape[:-1] + robot_sales_by_type.shape[-2:]),
+        step=ctx["step"],
+        month_index=ctx["m"],
+        start_month=ctx["start_month"],
+        fiscal_year_start_month=ctx["fiscal_year_start_month"],
+        **series,
+    )
+    aggregate_annual(result)
+    return result
+
+
+# -----------------------------
+# シミュレーション本体（streamlit / plotly に依存しない）
+# params は build_params_from_state() と同じ内部表現（万円項目は万円のまま）
+# 数値項目に長さ N の配列を渡すと N シナリオ分を一括計算し、
+# 各系列は (N × ステップ) の配列になる（スカラーのみならステップごとの1次元配列）
+# contract_companies / robot_sales_by_type を渡すと、その段の計算を置き換える
+# （モンテカルロ等で確率的に生成した販売会社数・販売台数を使う場合）
+# 全ステージを上流から順に計算する（差分だけ再計算する場合は incremental.IncrementalSimulator）
+# -----------------------------
+def simulate(params: dict, years: int, attendees_per_event,
+             events_per_company_per_month, robot_uio_users_per_month,
+             contract_companies: np.ndarray = None,
+             robot_sales_by_type: np.ndarray = None) -> SimulationResult:
+    root = model_inputs(params, years, attendees_per_event, events_per_company_per_month,
+                        robot_uio_users_per_month, contract_companies, robot_sales_by_type)
+    ctx = {}
+    for stage in STAGES:
+        ctx.update(stage.compute(root, ctx))
+    return assemble_result(ctx, years)
+
+
+# ----------------------------------------------------
+# 期間集計
+#   - rollup：期間番号 index（ステップごと、昇順）が変わる位置で区切って集計
+#             how="sum"：期間合計（売上・費用などのフロー）、"last"：期末の値（会員数などの残高）
+#             期間の長さがそろっていれば reshape、そろっていなければ reduceat で計算
+#   - period_index：各ステップの期間番号
+#             "month"：月、"year"：1ヶ月目から12ヶ月ごと（事業年）
+#             "fiscal_year" / "quarter"：会計年度（fiscal_year_start_month 始まり）とその四半期
+#             ※開始月と年度開始月が違う場合、最初の年度・四半期は途中から始まる
+# ----------------------------------------------------
+PERIOD_MONTHS = {"month": 1, "quarter": 3, "year": 12, "fiscal_year": 12}
+
+
+def rollup(series: np.ndarray, index: np.ndarray, how: str = "sum") -> np.ndarray:
+    n = series.shape[-1]
+    starts = np.flatnonzero(np.diff(index, prepend=index[0] - 1))
+    if len(starts) == n:
+        return series
+    if how == "last":
+        return series[..., np.append(starts[1:], n) - 1]
+    lengths = np.diff(np.append(starts, n))
+    if np.all(lengths == lengths[0]):
+        return series.reshape(*series.shape[:-1], len(starts), lengths[0]).sum(axis=-1)
+    return np.add.reduceat(series, starts, axis=-1)
+
+
+def period_index(result: SimulationResult, period: str) -> np.ndarray:
+    months = result.month_index
+    if period in ("quarter", "fiscal_year"):
+        months = months + (result.start_month - result.fiscal_year_start_month) % 12
+    return months // PERIOD_MONTHS[period]
+
+
+def period_labels(result: SimulationResult, period: str) -> list:
+    labels = {
+        "month": lambda k: f"{k+1}ヶ月目",
+        "quarter": lambda k: f"第{k // 4 + 1}期Q{k % 4 + 1}",
+        "year": lambda k: f"{k+1}年目",
+        "fiscal_year": lambda k: f"第{k+1}期",
+    }[period]
+    return [labels(int(k)) for k in np.unique(period_index(result, period))]
+
+
+# ----------------------------------------------------
+# 年次集計（★years に応じて可変、事業年ごとに rollup で合計）
+# ----------------------------------------------------
+def aggregate_annual(result: SimulationResult) -> None:
+    year_index = period_index(result, "year")
+
+    def by_year(series: np.ndarray) -> np.ndarray:
+        return rollup(series, year_index)
+
+    result.annual_total = by_year(result.total_revenue) / 10000
+    result.annual_app = by_year(result.app_revenue) / 10000
+    result.annual_commission = by_year(result.commission_revenue) / 10000
+    result.annual_robot_sales = by_year(result.new_users)
+    result.annual_expense = by_year(result.total_expense) / 10000
+    result.annual_profit = by_year(result.profit) / 10000
+
+    # 年間ロボット販売台数（種類別）
+    result.annual_robot_sales_by_type = by_year(result.robot_sales_by_type)
+
+    # 累損（＝年間利益の累計）
+    result.cumulative_loss = np.cumsum(result.annual_profit, axis=-1)
+
+
+# ----------------------------------------------------
+# 黒字化月（累積利益が最後にマイナスだった月の翌月、1始まり）
+# ※期間末でも累積赤字なら -1、最初から黒字なら 1
+# ※profit は月次の系列（週次・日次の結果は rollup(profit, month_index) で月次にしてから渡す）
+# ----------------------------------------------------
+def break_even_month(profit: np.ndarray) -> np.ndarray:
+    cumulative = np.cumsum(profit, axis=-1)
+    negative = cumulative < 0
+    months = cumulative.shape[-1]
+    last_negative = months - 1 - np.argmax(negative[..., ::-1], axis=-1)
+    month = np.where(negative.any(axis=-1), last_negative + 2, 1)
+    return np.where(negative[..., -1], -1, month)
@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import fields
+
+import numpy as np
+
+from simulation import ENGINE_VERSION, SimulationResult
+
+STORE_VERSION = 1  # 結果の形式が変わったら上げる（計算内容の変更は ENGINE_VERSION。古い結果は別ディレクトリに残る）
+DEFAULT_STORE_DIR = os.environ.get("RESULT_STORE_DIR",
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), ".result_store"))
+DEFAULT_STORE_BYTES = 1024 * 1024 * 1024
+META_FILE = "meta.json"
+
+
+# -----------------------------
+# ディスク上の結果ストア（params_fingerprint → SimulationResult、サーバーの再起動後・プロセス間で共有）
+#   <root>/v<STORE_VERSION>-e<ENGINE_VERSION>/<key の先頭2文字>/<key>/
+#       meta.json：配列以外の項目（期間・暦・ロボット名など）、配列の名前、合計バイト数
+#       <系列名>.npy：各系列（ステップごと・年次の全系列、robot_sales_by_type を含む）
+#   - get：np.load(mmap_mode="r") で読むので、ファイルを読み込まずに（コピーなしで）ページ単位で参照する
+#          読み取り専用の配列になる。見つからない・壊れていれば None
+#   - put：一時ディレクトリに書いてから改名するので、読み手は書きかけの結果を見ない
+#          （別のプロセスが先に同じ key を書いていれば、そちらを残す）
+#   - 最後に使った時刻は meta.json の更新時刻（get で更新）。put のあとで合計が max_bytes を超えていれば、
+#     古いものから削除する（LRU）
+#   - 合計のバイト数は最初の put で1度だけ数え、以後は put のたびに足していく（全体を見て回るのは、
+#     上限を超えて削除するときだけ。別のプロセスが書いた分はそのときに数え直す）
+# -----------------------------
+class ResultStore:
+    def __init__(self, root: str = DEFAULT_STORE_DIR, max_bytes: int = DEFAULT_STORE_BYTES):
+        self.root = os.path.join(root, f"v{STORE_VERSION}-e{ENGINE_VERSION}")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = None  # 合計のバイト数（最初の put で数える）
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self._path(key), META_FILE))
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in meta["arrays"]}
+            os.utime(os.path.join(path, META_FILE))
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return SimulationResult(**meta["fields"], **arrays)
+
+    def put(self, key: str, result: SimulationResult) -> None:
+        path = self._path(key)
+        if key in self:
+            return
+        values = {f.name: getattr(result, f.name) for f in fields(result)}
+        arrays = {name: v for name, v in values.items() if isinstance(v, np.ndarray)}
+        meta = {
+            "fields": {name: v for name, v in values.items() if name not in arrays},
+            "arrays": list(arrays),
+            "bytes": int(sum(v.nbytes for v in arrays.values())),
+        }
+        tmp = os.path.join(self.root, f"tmp-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.makedirs(tmp)
+            for name, value in arrays.items():
+                np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(value))
+            with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.rename(tmp, path)
+        except (OSError, TypeError, ValueError):
+            return  # 同じ key を別のプロセスが先に書いた、容量不足、JSON にできない項目など（保存せずに済ませる）
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)  # 改名できなかった一時ディレクトリ
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += meta["bytes"]
+            over = self._total_bytes is None or self._total_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def entries(self) -> list:
+        # [(最後に使った時刻, バイト数, パス)]（古い順）
+        out = []
+        for prefix in os.listdir(self.root) if os.path.isdir(self.root) else ():
+            directory = os.path.join(self.root, prefix)
+            if prefix.startswith("tmp-") or not os.path.isdir(directory):
+                continue
+            for key in os.listdir(directory):
+                meta_path = os.path.join(directory, key, META_FILE)
+                try:
+                    with open(meta_path, encoding="utf-8") as f:
+                        nbytes = json.load(f)["bytes"]
+                    out.append((os.stat(meta_path).st_mtime, nbytes, os.path.join(directory, key)))
+                except (OSError, ValueError, KeyError):
+                    continue
+        return sorted(out)
+
+    def evict(self) -> None:
+        # 全体を数え直し、上限を超えていれば古いものから削除する
+        entries = self.entries()
+        total = sum(nbytes for _, nbytes, _ in entries)
+        for _, nbytes, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)  # 参照中の memmap は削除後も読める
+            total -= nbytes
+        with self._lock:
+            self._total_bytes = total
+        # 中断などで残った古い一時ディレクトリ（1時間以上前）を片付ける
+        for name in os.listdir(self.root) if os.path.isdir(self.root) else ():
+            tmp = os.path.join(self.root, name)
+            try:
+                if name.startswith("tmp-") and time.time() - os.stat(tmp).st_mtime > 3600:
+                    shutil.rmtree(tmp, ignore_errors=True)
+            except OSError:
+                continue  # 別のプロセスが改名・削除した
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+        with self._lock:
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        entries = self.entries()
+        with self._lock:
+            return {
+                "entries": len(entries),
+                "bytes": sum(nbytes for _, nbytes, _ in entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+RESULT_STORE = ResultStore()
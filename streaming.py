@@ -0,0 +1,138 @@
+import numpy as np
+
+# 分位点スケッチの既定容量（最上位レベルの保持件数、誤差はおおよそ 1/k 程度）
+DEFAULT_SKETCH_K = 512
+
+
+# -----------------------------
+# 平均・分散の逐次集計（チャンク単位で Chan の並列公式により合成）
+# 先頭軸がサンプル、残りの軸（月など）ごとに独立に集計する
+# -----------------------------
+class RunningMoments:
+    def __init__(self):
+        self.count = 0
+        self.mean = None
+        self._m2 = None
+
+    def update(self, chunk: np.ndarray) -> None:
+        chunk = np.asarray(chunk, dtype=float)
+        n = chunk.shape[0]
+        if n == 0:
+            return
+        chunk_mean = chunk.mean(axis=0)
+        chunk_m2 = ((chunk - chunk_mean) ** 2).sum(axis=0)
+        if self.count == 0:
+            self.count, self.mean, self._m2 = n, chunk_mean, chunk_m2
+            return
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self._m2 = self._m2 + chunk_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+    @property
+    def variance(self) -> np.ndarray:
+        if self.count < 2:
+            return np.zeros_like(self.mean)
+        return self._m2 / (self.count - 1)
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+
+# -----------------------------
+# 分位点の近似スケッチ（KLL 方式のコンパクタ階層）
+#   - レベル h の要素は重み 2^h を持つ
+#   - 容量を超えたレベルはソートして1つおき（開始位置はランダム）に上位へ送る
+#   - 下位レベルほど容量を小さくするため、保持件数はサンプル数によらずほぼ一定（約 3k）
+# 先頭軸がサンプル、残りの軸（月など）はまとめてベクトル計算する
+# -----------------------------
+class QuantileSketch:
+    def __init__(self, k: int = DEFAULT_SKETCH_K, c: float = 2 / 3, seed: int = None):
+        self.k = k
+        self.c = c
+        self.count = 0
+        self._levels = []
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._levels) - 1 - level
+        return max(2, int(np.ceil(self.k * self.c ** depth)))
+
+    def update(self, chunk: np.ndarray) -> None:
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.shape[0] == 0:
+            return
+        self.count += chunk.shape[0]
+        if not self._levels:
+            self._levels.append(chunk.copy())
+        else:
+            self._levels[0] = np.concatenate((self._levels[0], chunk), axis=0)
+        self._compress()
+
+    def _compress(self) -> None:
+        while True:
+            # 容量を超えた最下位のレベルを1つ圧縮（レベルが増えると下位の容量が縮むので先頭から再確認）
+            for level, buf in enumerate(self._levels):
+                if len(buf) >= self._capacity(level):
+                    break
+            else:
+                return
+            buf = np.sort(buf, axis=0)
+            # 奇数件なら最小値を1件だけ残し、残りを1つおきに上位レベルへ
+            keep = buf[:len(buf) % 2]
+            promoted = buf[len(keep):][self._rng.integers(2)::2]
+            self._levels[level] = keep
+            if level + 1 == len(self._levels):
+                self._levels.append(promoted)
+            else:
+                self._levels[level + 1] = np.concatenate((self._levels[level + 1], promoted), axis=0)
+
+    def quantiles(self, percentiles) -> np.ndarray:
+        values = np.concatenate(self._levels, axis=0)
+        weights = np.concatenate([np.full(len(buf), 2.0 ** h) for h, buf in enumerate(self._levels)])
+        order = np.argsort(values, axis=0)
+        values = np.take_along_axis(values, order, axis=0)
+        cumulative = np.cumsum(weights[order], axis=0)
+        total = cumulative[-1]
+        out = []
+        for p in percentiles:
+            idx = np.minimum((cumulative < total * p / 100).sum(axis=0), len(values) - 1)
+            out.append(np.take_along_axis(values, idx[None, ...], axis=0)[0])
+        return np.stack(out)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buf.nbytes for buf in self._levels)
+
+
+# -----------------------------
+# 複数系列（paying_users / profit など）の平均・分散・分位点をまとめて逐次集計
+# -----------------------------
+class StreamingStats:
+    def __init__(self, k: int = DEFAULT_SKETCH_K, seed: int = None):
+        self.k = k
+        self._rng = np.random.default_rng(seed)
+        self._moments = {}
+        self._sketches = {}
+
+    def update(self, name: str, chunk: np.ndarray) -> None:
+        if name not in self._moments:
+            self._moments[name] = RunningMoments()
+            self._sketches[name] = QuantileSketch(self.k, seed=self._rng.integers(2 ** 32))
+        self._moments[name].update(chunk)
+        self._sketches[name].update(chunk)
+
+    def mean(self, name: str) -> np.ndarray:
+        return self._moments[name].mean
+
+    def std(self, name: str) -> np.ndarray:
+        return self._moments[name].std
+
+    def quantiles(self, name: str, percentiles) -> np.ndarray:
+        return self._sketches[name].quantiles(percentiles)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(s.nbytes for s in self._sketches.values())
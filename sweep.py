@@ -0,0 +1,246 @@
+import argparse
+import copy
+import csv
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+from batch import DEFAULT_CHUNK_SIZE, BatchSummary, get_path, ordered_map, set_path, summarize
+from cache import normalize_params
+from sensitivity import is_structural
+from simulation import ENGINE_VERSION, scale_chunk, simulate
+
+SUMMARY_COLUMNS = tuple(BatchSummary.__dataclass_fields__)
+
+
+# -----------------------------
+# 軸の指定（--axis PATH=VALUES）
+#   "0.01,0.02,0.03"：値のリスト、"0.01:0.05:5"：start から stop まで num 点（両端を含む等間隔）
+#   リストの値がすべて整数なら整数の軸（社数・月数などを整数のまま渡す）
+# -----------------------------
+def parse_axis(text: str) -> tuple:
+    path, sep, spec = text.partition("=")
+    if not sep or not path or not spec:
+        raise ValueError(f"軸の指定は PATH=VALUES の形式です: {text}")
+    if ":" in spec:
+        start, stop, num = spec.split(":")
+        return path, np.linspace(float(start), float(stop), int(num))
+    values = [json.loads(v) for v in spec.split(",")]
+    if all(isinstance(v, int) for v in values):
+        return path, np.array(values, dtype=np.int64)
+    return path, np.array(values, dtype=float)
+
+
+# -----------------------------
+# 直積のシナリオを遅延的に作る
+#   シナリオ番号 i を軸の長さで分解（np.unravel_index）して各軸の値を決めるので、
+#   全シナリオの表は作らず、チャンクごとに [start, stop) の分だけ params を作る
+# -----------------------------
+def sweep_size(axes: dict) -> int:
+    return int(np.prod([len(v) for v in axes.values()])) if axes else 1
+
+
+def chunk_params(base: dict, axes: dict, start: int, stop: int) -> tuple:
+    # チャンクの params（各軸の項目にシナリオごとの配列）と、各軸の値の列。軸がなければ base の1シナリオ
+    if not axes:
+        return copy.deepcopy(base), {}
+    index = np.unravel_index(np.arange(start, stop), tuple(len(v) for v in axes.values()))
+    params = copy.deepcopy(base)
+    columns = {}
+    for (path, values), i in zip(axes.items(), index):
+        columns[path] = values[i]
+        set_path(params, path, columns[path])
+    return params, columns
+
+
+def _run_chunk(task: tuple) -> dict:
+    # 1チャンク分を計算し、列名 → 値の列（シナリオ番号・軸の値・集計値）を返す
+    base, axes, start, stop, years, inputs = task
+    params, columns = chunk_params(base, axes, start, stop)
+    summary = summarize(simulate(params, years, *inputs))
+    return {"scenario": np.arange(start, stop), **columns,
+            **{name: np.broadcast_to(getattr(summary, name), (stop - start,)) for name in SUMMARY_COLUMNS}}
+
+
+def sweep_signature(base: dict, axes: dict, years: int, inputs: list, chunk_size: int) -> str:
+    # 途中から再開してよいか（同じ条件・同じ計算エンジンのスイープか）を判定するためのハッシュ
+    payload = {"engine": ENGINE_VERSION, "params": normalize_params(base),
+               "axes": {p: v.tolist() for p, v in axes.items()}, "years": years, "inputs": inputs,
+               "chunk_size": chunk_size}
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# -----------------------------
+# 出力先（チャンクの順に書き、書き終えたチャンクを記録して中断後に再開できるようにする）
+#   - CsvSink：1つの CSV。書き終えたチャンク数とファイルの長さを <出力>.progress.json に記録し、
+#              再開時は記録した長さに切り詰めてから続きを追記する（書きかけの行を残さない）
+#   - ParquetSink：ディレクトリにチャンクごとの part-NNNNNN.parquet（一時ファイルに書いてから改名）
+#                  再開時は part ファイルのあるチャンクを飛ばす。要 pyarrow
+# どちらも別の条件のスイープの途中結果があれば ValueError（restart=True なら消して最初から）
+# -----------------------------
+class CsvSink:
+    def __init__(self, path: str, signature: str, columns: list, restart: bool = False):
+        self.path = path
+        self.progress_path = f"{path}.progress.json"
+        self.signature = signature
+        self.columns = columns
+        progress = None
+        if not restart and os.path.exists(self.progress_path):
+            with open(self.progress_path, encoding="utf-8") as f:
+                progress = json.load(f)
+            if progress["signature"] != signature:
+                raise ValueError(f"{path} には別の条件のスイープの途中結果があります（最初からなら --restart）")
+        if progress and (not os.path.exists(path) or os.path.getsize(path) < progress["bytes"]):
+            progress = None  # 記録だけ残って CSV がない（消した・短い）なら最初から
+        self.chunks = progress["chunks"] if progress else 0
+        if progress:
+            self._file = open(path, "r+", newline="", encoding="utf-8")
+            self._file.truncate(progress["bytes"])
+            self._file.seek(progress["bytes"])
+        else:
+            self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        if not progress:
+            self._writer.writerow(columns)
+            self._commit()
+
+    def done(self, chunk: int) -> bool:
+        return chunk < self.chunks
+
+    def write(self, chunk: int, table: dict) -> None:
+        if chunk != self.chunks:
+            raise ValueError(f"CSV はチャンクの順に書きます（{self.chunks} 番目の次に {chunk} 番目）")
+        self._writer.writerows(zip(*[table[c].tolist() for c in self.columns]))
+        self.chunks += 1
+        self._commit()
+
+    def _commit(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        tmp = f"{self.progress_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"signature": self.signature, "chunks": self.chunks, "bytes": self._file.tell()}, f)
+        os.replace(tmp, self.progress_path)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetSink:
+    def __init__(self, path: str, signature: str, columns: list, restart: bool = False):
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+        except ImportError as e:
+            raise ValueError("Parquet 出力には pyarrow が必要です（pip install pyarrow）") from e
+        self.path = path
+        self.columns = columns
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "_sweep.json")
+        if os.path.exists(meta_path) and not restart:
+            with open(meta_path, encoding="utf-8") as f:
+                if json.load(f)["signature"] != signature:
+                    raise ValueError(f"{path} には別の条件のスイープの途中結果があります（最初からなら --restart）")
+        else:
+            for name in os.listdir(path):
+                if name.startswith("part-") and name.endswith(".parquet"):
+                    os.remove(os.path.join(path, name))
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"signature": signature, "columns": columns}, f)
+
+    def _part(self, chunk: int) -> str:
+        return os.path.join(self.path, f"part-{chunk:06d}.parquet")
+
+    def done(self, chunk: int) -> bool:
+        return os.path.exists(self._part(chunk))
+
+    def write(self, chunk: int, table: dict) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        tmp = f"{self._part(chunk)}.tmp"
+        pq.write_table(pa.table({c: np.asarray(table[c]) for c in self.columns}), tmp)
+        os.replace(tmp, self._part(chunk))
+
+    def close(self) -> None:
+        pass
+
+
+# -----------------------------
+# スイープ本体
+#   chunk_size ごとのチャンクをプロセスプールに投げ、チャンクの順に結果を出力先へ書く（ordered_map）
+#   同時に計算中のチャンクは workers × 2 個まで（メモリはグリッドの大きさによらず一定）
+#   on_chunk(書き終えたチャンク数, 全チャンク数) で進捗を通知
+#   返り値：このスイープで計算したシナリオ数（再開時は飛ばしたチャンクを含まない）
+# -----------------------------
+def run_sweep(base: dict, axes: dict, sink, years: int, inputs: list, chunk_size: int,
+              workers: int = 1, on_chunk=None) -> int:
+    n = sweep_size(axes)
+    chunks = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+    todo = [k for k in range(len(chunks)) if not sink.done(k)]
+    finished = len(chunks) - len(todo)
+    tasks = ((base, axes, *chunks[k], years, inputs) for k in todo)
+    for k, table in zip(todo, ordered_map(_run_chunk, tasks, workers=min(workers, len(todo)))):
+        sink.write(k, table)
+        finished += 1
+        if on_chunk is not None:
+            on_chunk(finished, len(chunks))
+    return sum(stop - start for start, stop in (chunks[k] for k in todo))
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="パラメータのスイープ（直積）を並列に計算し、シナリオごとの集計値を CSV / Parquet に書き出す")
+    parser.add_argument("params", help="基準の設定JSON（「設定を保存（JSON）」で保存したもの）")
+    parser.add_argument("--axis", action="append", default=[], metavar="PATH=VALUES",
+                        help="動かす項目と値（例: app.churn_rate=0.01:0.05:5、dealer.max_companies=50,100,200）")
+    parser.add_argument("-o", "--output", required=True,
+                        help="出力先（.csv は CSV、それ以外は Parquet の part ファイルを置くディレクトリ）")
+    parser.add_argument("--years", type=int, default=7, help="シミュレーション年数")
+    parser.add_argument("--attendees", type=int, default=50, help="イベントあたり集客数（人）")
+    parser.add_argument("--events", type=int, default=2, help="1社あたり月間イベント数（回）")
+    parser.add_argument("--uio-users", type=int, default=0, help="ロボット保有顧客の月当たり新規課金登録者数（人）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="プロセス数")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="1チャンクのシナリオ数（週次・日次・種類数に応じて自動で減らす）")
+    parser.add_argument("--restart", action="store_true", help="途中結果を捨てて最初から計算する")
+    args = parser.parse_args(argv)
+
+    with open(args.params, encoding="utf-8-sig") as f:
+        base = json.load(f)
+    try:
+        axes = dict(parse_axis(text) for text in args.axis)
+        for path in axes:
+            value = get_path(base, path)
+            if is_structural(path) or isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{path} は数値の項目でないか、構造用の項目です（件数・暦・スケジュールの開始月）")
+    except (ValueError, KeyError, IndexError) as e:
+        parser.error(f"軸の指定が正しくありません: {e}")
+
+    inputs = [args.attendees, args.events, args.uio_users]
+    chunk_size = scale_chunk(args.chunk_size, base)
+    signature = sweep_signature(base, axes, args.years, inputs, chunk_size)
+    columns = ["scenario", *axes, *SUMMARY_COLUMNS]
+    sink_class = CsvSink if args.output.endswith(".csv") else ParquetSink
+    try:
+        sink = sink_class(args.output, signature, columns, restart=args.restart)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def report(done: int, total: int) -> None:
+        print(f"\r{done:,} / {total:,} チャンク", end="", file=sys.stderr, flush=True)
+
+    try:
+        computed = run_sweep(base, axes, sink, args.years, inputs, chunk_size, workers=args.workers,
+                             on_chunk=report)
+    finally:
+        sink.close()
+    print(f"\n{sweep_size(axes):,} シナリオ中 {computed:,} シナリオを計算しました → {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
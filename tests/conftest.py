@@ -0,0 +1,57 @@
+import copy
+import itertools
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from batch import set_path, summarize  # noqa: E402
+from simulation import simulate  # noqa: E402
+
+with open(os.path.join(ROOT, "tests", "data", "params.json"), encoding="utf-8") as f:
+    _PARAMS = json.load(f)
+
+# 期間・サイドバー入力（years, attendees_per_event, events_per_company_per_month, robot_uio_users_per_month）
+INPUTS = (7, 50, 2, 0)
+YEARS, SIDEBAR_INPUTS = INPUTS[0], list(INPUTS[1:])
+
+# まとめて計算しても1件ずつ計算した結果と同じかを確かめるシナリオの軸（販売会社数の最大値 × 月額料金）
+VARIANT_AXES = {"dealer.max_companies": [20, 50, 60, 120], "app.monthly_fee": [300.0, 500.0]}
+
+
+@pytest.fixture
+def params() -> dict:
+    # 「設定を保存（JSON）」で保存した既定の設定
+    return copy.deepcopy(_PARAMS)
+
+
+@pytest.fixture
+def agent_params(params) -> dict:
+    # 販売会社ごとのモデル
+    params["dealer"]["model"] = "agents"
+    return params
+
+
+def variants(params: dict) -> list:
+    # VARIANT_AXES の直積の params（順は batch.scenario_grid と同じ）
+    out = []
+    for values in itertools.product(*VARIANT_AXES.values()):
+        p = copy.deepcopy(params)
+        for path, value in zip(VARIANT_AXES, values):
+            set_path(p, path, value)
+        out.append(p)
+    return out
+
+
+def assert_same_as_single(row, params: dict) -> None:
+    # 集計値の行（dict または BatchSummary の1件分）が params を1件だけ計算した結果と同じか
+    single = summarize(simulate(params, *INPUTS))
+    get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+    for name in ("cumulative_profit", "final_paying_users", "max_cumulative_loss"):
+        assert np.isclose(get(name), getattr(single, name), rtol=1e-12), name
+    assert get("break_even_month") == single.break_even_month
@@ -0,0 +1,12 @@
+from conftest import INPUTS
+
+import cache
+from cache import params_fingerprint
+
+
+def test_fingerprint_depends_on_engine_version(params, monkeypatch):
+    # 計算内容が変わったら（ENGINE_VERSION を上げたら）以前の結果と同じキーにならない
+    before = params_fingerprint(params, *INPUTS)
+    assert params_fingerprint(params, *INPUTS) == before
+    monkeypatch.setattr(cache, "ENGINE_VERSION", cache.ENGINE_VERSION + 1)
+    assert params_fingerprint(params, *INPUTS) != before
@@ -0,0 +1,34 @@
+import copy
+
+import numpy as np
+from conftest import INPUTS
+
+from batch import scenario_grid, simulate_batch, summarize, take_scenarios
+from simulation import simulate
+
+AXES = {"dealer.max_companies": np.array([20, 50, 60, 120]), "dealer.company_growth_per_month": np.array([1, 3])}
+
+
+def test_batch_matches_single_runs(agent_params):
+    # 各シナリオの結果は、同じバッチの他のシナリオ（販売会社数の最大値）によらない
+    grid, n = scenario_grid(agent_params, AXES)
+    batch = simulate_batch(grid, *INPUTS)
+    for i in range(n):
+        single = summarize(simulate(take_scenarios(grid, i), *INPUTS))
+        assert np.isclose(batch.cumulative_profit[i], single.cumulative_profit, rtol=1e-12)
+        assert batch.break_even_month[i] == single.break_even_month
+
+
+def test_chunk_size_does_not_change_results(agent_params):
+    grid, _ = scenario_grid(agent_params, AXES)
+    whole = simulate_batch(grid, *INPUTS)
+    chunked = simulate_batch(grid, *INPUTS, chunk_size=1)
+    np.testing.assert_allclose(whole.cumulative_profit, chunked.cumulative_profit, rtol=1e-12)
+
+
+def test_single_run_is_reproducible(agent_params):
+    p = copy.deepcopy(agent_params)
+    p["dealer"]["max_companies"] = 50
+    first = simulate(p, *INPUTS)
+    second = simulate(copy.deepcopy(p), *INPUTS)
+    np.testing.assert_array_equal(first.profit, second.profit)
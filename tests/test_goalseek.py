@@ -0,0 +1,13 @@
+import warnings
+
+from conftest import INPUTS
+
+from goalseek import goal_seek
+
+
+def test_search_range_starts_at_minimum(params):
+    # 下限 0 を指定しても周期は 1 から探索する（0 だと m % 周期 が計算できない）
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        gs = goal_seek(params, *INPUTS, "develop.bugfix_cycle_months", "cumulative_profit", -1e9, 0, 24)
+    assert gs.value is not None and gs.value >= 1
@@ -0,0 +1,81 @@
+import copy
+from dataclasses import fields
+
+import numpy as np
+from conftest import INPUTS
+
+from batch import get_path, set_path
+from incremental import IncrementalSimulator
+from sensitivity import clip_min, numeric_paths
+from simulation import SCHEDULE_FIELDS, simulate
+
+
+def _assert_same_result(a, b) -> None:
+    for f in fields(a):
+        x, y = getattr(a, f.name), getattr(b, f.name)
+        if isinstance(x, np.ndarray):
+            np.testing.assert_array_equal(x, y, err_msg=f.name)
+        else:
+            assert x == y, f.name
+
+
+def _edit_number(params: dict, base: dict, path: str, rng) -> None:
+    # 基準値（スケジュールの区間など基準にない項目は今の値）の ±50%（率が 1 を超えないように）
+    value = get_path(params, path)
+    try:
+        reference = get_path(base, path)
+    except (KeyError, IndexError, TypeError):
+        reference = value
+    changed = reference * rng.uniform(0.5, 1.5) if reference else rng.uniform(0, 1)
+    set_path(params, path, clip_min(path, int(round(changed)) if isinstance(value, int) else float(changed)))
+
+
+def _edit_structure(params: dict, years: int, rng) -> int:
+    # 時間刻み・期間・スケジュール・販売会社のモデル・ロボットの種類数のいずれかを変える。返り値は期間（年）
+    kind = rng.integers(5)
+    if kind == 0:
+        params["time"]["step"] = str(rng.choice(["month", "week"]))
+    elif kind == 1:
+        years = int(rng.integers(3, 11))
+    elif kind == 2:
+        path = str(rng.choice([p for p in SCHEDULE_FIELDS if "*" not in p]))
+        value = get_path(params, path)
+        if isinstance(value, dict):
+            set_path(params, path, value["schedule"][0]["value"])
+        else:
+            set_path(params, path, {"schedule": [{"month": 0, "value": value},
+                                                 {"month": int(rng.integers(1, 36)), "value": value,
+                                                  "growth": float(rng.uniform(-0.02, 0.02))}]})
+    elif kind == 3:
+        params["dealer"]["model"] = "agents" if params["dealer"]["model"] == "aggregate" else "aggregate"
+    else:
+        params["robot"]["num_types"] = int(rng.integers(1, len(params["robot"]["items"]) + 1))
+    return years
+
+
+def test_random_edits_equal_full_simulation(params):
+    # 各ステージが reads / deps に書いていない値を参照していれば、古い出力を使い回して結果がずれる
+    rng = np.random.default_rng(0)
+    base = copy.deepcopy(params)
+    simulator = IncrementalSimulator()
+    years, inputs = INPUTS[0], list(INPUTS[1:])
+    for step in range(300):
+        if step % 10 == 9:
+            years = _edit_structure(params, years, rng)
+        else:
+            paths = numeric_paths(params)
+            for path in rng.choice(paths, size=int(rng.integers(1, 3)), replace=False):
+                _edit_number(params, base, str(path), rng)
+        if step % 25 == 24:
+            inputs = [int(rng.integers(10, 100)), int(rng.integers(1, 5)), int(rng.integers(0, 30))]
+        snapshot = copy.deepcopy(params)
+        _assert_same_result(simulator.simulate(params, years, *inputs), simulate(snapshot, years, *inputs))
+
+
+def test_cost_edit_recomputes_only_labor_and_totals(params):
+    simulator = IncrementalSimulator()
+    simulator.simulate(params, *INPUTS)
+    params["labor"]["fte_cost_per_month"] = 150
+    result = simulator.simulate(params, *INPUTS)
+    assert simulator.recomputed == ["labor", "totals"]
+    _assert_same_result(result, simulate(params, *INPUTS))
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from jobs import JobCancelled, JobRegistry, job_key
+
+
+def _wait(job, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, f"job did not finish: {job.status}"
+        time.sleep(0.01)
+
+
+def _blocking(release: threading.Event, started: threading.Event = None):
+    # release が set されるまで on_progress を呼びながら待つ分析
+    def fn(on_progress=None):
+        if started is not None:
+            started.set()
+        step = 0
+        while not release.wait(0.01):
+            step += 1
+            on_progress(step, 1_000_000)
+        return "done"
+    return fn
+
+
+@pytest.fixture
+def registry():
+    return JobRegistry(workers=2, max_finished=2)
+
+
+def test_job_key_depends_on_kind_fingerprint_and_options():
+    key = job_key("sobol", "abc", {"n": 64, "delta": 0.1})
+    assert key == job_key("sobol", "abc", {"delta": 0.1, "n": 64.0})  # 並び・int/float の揺れは同じ
+    assert len({key, job_key("montecarlo", "abc", {"n": 64, "delta": 0.1}),
+                job_key("sobol", "abd", {"n": 64, "delta": 0.1}), job_key("sobol", "abc", {"n": 128})}) == 4
+
+
+def test_same_key_returns_the_same_job(registry):
+    calls = []
+
+    def fn(x, on_progress=None):
+        calls.append(x)
+        return x * 2
+
+    job = registry.submit("k", "test", fn, 21)
+    _wait(job)
+    assert registry.submit("k", "test", fn, 21) is job
+    assert job.status == "done" and job.result == 42 and calls == [21]
+
+
+def test_cancel_stops_the_job_through_report(registry):
+    release, started = threading.Event(), threading.Event()
+    job = registry.submit("k", "test", _blocking(release, started))
+    assert started.wait(10)
+    job.cancel()
+    _wait(job)
+    assert job.status == "cancelled" and job.result is None
+    with pytest.raises(JobCancelled):
+        job.report(1, 2)
+
+
+def test_cancelled_and_failed_jobs_are_run_again(registry):
+    release = threading.Event()
+    release.set()
+    job = registry.submit("k", "test", _blocking(threading.Event()))
+    job.cancel()
+    _wait(job)
+    again = registry.submit("k", "test", _blocking(release))
+    _wait(again)
+    assert again is not job and again.status == "done"
+
+    attempts = []
+
+    def flaky(on_progress=None):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise MemoryError("transient")
+        return "ok"
+
+    failed = registry.submit("f", "test", flaky)
+    _wait(failed)
+    assert failed.status == "error" and "MemoryError" in failed.error
+    retried = registry.submit("f", "test", flaky)
+    _wait(retried)
+    assert retried is not failed and retried.status == "done" and retried.result == "ok"
+    assert registry.get("f") is retried
+
+
+def test_prune_keeps_running_jobs(registry):
+    release = threading.Event()
+    running = registry.submit("running", "test", _blocking(release))
+    finished = []
+    for i in range(4):
+        job = registry.submit(f"done{i}", "test", lambda on_progress=None: None)
+        _wait(job)
+        finished.append(job)
+    # 完了したジョブは新しい順に max_finished 件まで、実行中のジョブは残る
+    assert registry.get("running") is running and not running.finished
+    assert [registry.get(f"done{i}") for i in range(4)] == [None, None, finished[2], finished[3]]
+    assert registry.stats()["running"] + registry.stats()["queued"] == 1
+    release.set()
+    _wait(running)
@@ -0,0 +1,39 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from conftest import INPUTS
+
+from optimize import merge_front, optimize, pareto_front
+
+
+def test_merged_front_equals_front_of_all_candidates():
+    # 世代ごとに選び直したパレート最適な組は、評価した全候補から選んだ組と同じ（同じ入力・同じ値を含む）
+    rng = np.random.default_rng(0)
+    profit_table, loss_table = rng.integers(0, 8, (2, 6, 6)).astype(float)  # 入力ごとに決まる値（同じ値の組もある）
+    batches = []
+    for _ in range(10):
+        x = rng.integers(0, 6, (20, 2))
+        batches.append((x.astype(float), profit_table[x[:, 0], x[:, 1]], loss_table[x[:, 0], x[:, 1]]))
+    front = (np.empty((0, 2)), np.empty(0), np.empty(0))
+    for batch in batches:
+        front = merge_front(front, *batch)
+    all_x, unique = np.unique(np.concatenate([b[0] for b in batches]), axis=0, return_index=True)
+    all_profit = np.concatenate([b[1] for b in batches])[unique]
+    all_loss = np.concatenate([b[2] for b in batches])[unique]
+    keep = pareto_front(all_profit, all_loss)
+    for merged, expected in zip(front, (all_x[keep], all_profit[keep], all_loss[keep])):
+        np.testing.assert_array_equal(merged, expected)
+
+
+def test_optimize_with_workers_or_shared_executor_equals_single_process(params):
+    kwargs = dict(population=8, generations=3, seed=0)
+    single = optimize(params, *INPUTS, **kwargs)
+    pooled = optimize(params, *INPUTS, workers=2, **kwargs)
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as executor:
+        shared = optimize(params, *INPUTS, workers=2, executor=executor, **kwargs)
+        assert executor.submit(abs, -1).result() == 1  # 渡したプールは閉じずに使い続けられる
+    for result in (pooled, shared):
+        assert result.best == single.best
+        assert result.evaluations == single.evaluations == 8 * 3
+        np.testing.assert_array_equal(result.pareto, single.pareto)
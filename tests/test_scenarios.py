@@ -0,0 +1,59 @@
+import copy
+import json
+
+import pytest
+from conftest import SIDEBAR_INPUTS, YEARS, assert_same_as_single, variants
+
+from scenarios import LOADED_FORMAT_ERROR, normalize_loaded, run_scenarios
+
+# % で書いた率（1 を超える値）は 100 で割る。スケジュールの区間の値も同じ
+PERCENT_APP = {"churn_rate": {"schedule": [{"month": 0, "value": 3}, {"month": 24, "value": 0.02}]}}
+FRACTION_APP = {"churn_rate": {"schedule": [{"month": 0, "value": 0.03}, {"month": 24, "value": 0.02}]}}
+
+
+def _percent_robot(params: dict, scale: float) -> list:
+    items = copy.deepcopy(params["robot"]["items"])
+    items[0]["purchase_rate"] = 1.5 * scale
+    items[0]["commission_rate"] = 12 * scale
+    return items
+
+
+def _run(lines: list, base: dict, **kwargs) -> list:
+    return list(run_scenarios([json.dumps(line) for line in lines], YEARS, SIDEBAR_INPUTS, base=base, **kwargs))
+
+
+def test_normalize_loaded_converts_percent_to_fraction(params):
+    loaded = copy.deepcopy(params)
+    loaded["app"].update(PERCENT_APP)
+    loaded["robot"]["items"] = _percent_robot(params, 1)
+    normalized = normalize_loaded(loaded)
+    assert [s["value"] for s in normalized["app"]["churn_rate"]["schedule"]] == pytest.approx([0.03, 0.02])
+    assert normalized["robot"]["items"][0]["purchase_rate"] == pytest.approx(0.015)
+    assert normalized["robot"]["items"][0]["commission_rate"] == pytest.approx(0.12)
+    assert len(normalized["robot"]["items"]) == params["robot"]["num_types"]
+
+
+def test_percent_lines_equal_fraction_lines(params):
+    percent = {"id": "pct", "app": PERCENT_APP, "robot": {"items": _percent_robot(params, 1)}}
+    fraction = {"id": "frac", "app": FRACTION_APP, "robot": {"items": _percent_robot(params, 0.01)}}
+    a, b = _run([percent, fraction], params)
+    assert {k: v for k, v in a.items() if k not in ("line", "id")} == pytest.approx(
+        {k: v for k, v in b.items() if k not in ("line", "id")}, rel=1e-12)
+
+
+@pytest.mark.parametrize("workers, chunk_lines", [(1, 3), (2, 2)])
+def test_results_keep_input_order_and_equal_single_runs(agent_params, workers, chunk_lines):
+    lines = [{"id": i, "dealer": p["dealer"], "app": p["app"]} for i, p in enumerate(variants(agent_params))]
+    lines.insert(3, {"id": "bad", "app": {"churn_rate": "x"}})
+    results = _run(lines, agent_params, workers=workers, chunk_lines=chunk_lines)
+    assert [r["line"] for r in results] == list(range(1, len(lines) + 1))
+    assert [r["id"] for r in results] == [line["id"] for line in lines]
+    assert "ValueError" in results[3]["error"]
+    for result, p in zip(results[:3] + results[4:], variants(agent_params)):
+        assert_same_as_single(result, p)
+
+
+@pytest.mark.parametrize("text", ["[1, 2]", "42", '"text"', "null"])
+def test_non_object_line_is_reported(params, text):
+    result, = run_scenarios([text], YEARS, SIDEBAR_INPUTS, base=params)
+    assert result == {"line": 1, "error": f"ValueError: {LOADED_FORMAT_ERROR}"}
@@ -0,0 +1,44 @@
+import multiprocessing
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from conftest import INPUTS
+
+from sensitivity import PATH_MIN_VALUES, min_value, one_at_a_time, sobol_indices
+
+
+def test_min_value_paths():
+    assert min_value("develop.bugfix_cycle_months") == 1
+    assert min_value("app.churn_segments.2.months") == PATH_MIN_VALUES["app.churn_segments.*.months"]
+    assert min_value("dealer.max_companies.schedule.1.value") == 1
+    assert min_value("dealer.max_companies.schedule.1.growth") is None
+    assert min_value("app.monthly_fee") is None
+
+
+def test_one_at_a_time_keeps_values_above_minimum(params):
+    # ±100% でも周期・期間などは下限（1）より小さくしない（0 だと m % 周期 が計算できない）
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        _, rows = one_at_a_time(params, *INPUTS, delta=1.0)
+    for row in rows:
+        bound = min_value(row.path)
+        if bound is not None:
+            assert row.low_value >= bound, row.path
+
+
+def test_sobol_keeps_values_above_minimum(params):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", RuntimeWarning)
+        gsa = sobol_indices(params, *INPUTS, samples=64, delta=1.0, seed=0, workers=1)
+    assert np.all(np.isfinite(gsa.total["cumulative_profit"]))
+
+
+def test_sobol_with_shared_executor_equals_single_process(params):
+    kwargs = dict(samples=64, seed=0)
+    single = sobol_indices(params, *INPUTS, workers=1, **kwargs)
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as executor:
+        shared = sobol_indices(params, *INPUTS, executor=executor, **kwargs)
+    for metric in single.total:
+        np.testing.assert_array_equal(shared.first_order[metric], single.first_order[metric])
+        np.testing.assert_array_equal(shared.total[metric], single.total[metric])
@@ -0,0 +1,119 @@
+import http.client
+import json
+import threading
+import time
+
+import numpy as np
+import pytest
+from conftest import INPUTS, assert_same_as_single, variants
+
+from batch import BatchSummary, summarize
+from cache import params_fingerprint
+from service import DEFAULT_INPUTS, SimulationServer, SimulationService
+from simulation import SimulationResult
+
+REQUEST_INPUTS = dict(zip(DEFAULT_INPUTS, INPUTS))
+
+
+@pytest.fixture
+def server():
+    service = SimulationService(workers=1)
+    server = SimulationServer(("127.0.0.1", 0), service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def _request(server, method: str, path: str, body=None) -> tuple:
+    connection = http.client.HTTPConnection(*server.server_address, timeout=60)
+    try:
+        data = body if isinstance(body, bytes) or body is None else json.dumps(body).encode("utf-8")
+        connection.request(method, path, body=data)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def _summary(response: dict) -> BatchSummary:
+    # 応答の系列から batch.summarize と同じ集計値を作る
+    series = response["series"]
+    result = SimulationResult(
+        **{k: response[k] for k in ("years", "months", "robot_names", "step", "start_month",
+                                    "fiscal_year_start_month")},
+        month_index=np.array(response["month_index"]),
+        **{k: np.array(v) for k, v in {**series, **response["annual"]}.items()})
+    return summarize(result)
+
+
+def test_simulate_returns_fingerprint_and_series(server, agent_params):
+    status, body = _request(server, "POST", "/simulate", {"params": agent_params, **REQUEST_INPUTS})
+    assert status == 200
+    assert body["fingerprint"] == params_fingerprint(agent_params, *INPUTS)
+    assert_same_as_single(_summary(body), agent_params)
+
+
+def test_batch_keeps_order_and_reports_bad_scenarios(server, agent_params):
+    scenarios = [{"params": p} for p in variants(agent_params)]
+    broken = json.loads(json.dumps(agent_params))
+    broken["robot"]["items"] = None  # params_fingerprint で TypeError になる
+    scenarios.insert(2, {"params": broken})
+    scenarios.insert(4, {"robot": {}})  # app がない
+    status, body = _request(server, "POST", "/batch", {"scenarios": scenarios, **REQUEST_INPUTS})
+    assert status == 200 and len(body) == len(scenarios)
+    assert "TypeError" in body[2]["error"] and "robot/app" in body[4]["error"]
+    ok = [b for i, b in enumerate(body) if i not in (2, 4)]
+    for response, p in zip(ok, variants(agent_params)):
+        assert response["fingerprint"] == params_fingerprint(p, *INPUTS)
+        assert_same_as_single(_summary(response), p)
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/simulate", b"{not json"),
+    ("/simulate", [1, 2]),
+    ("/simulate", {"params": {"robot": {"items": None, "num_types": 1}, "app": {}}}),
+    ("/batch", {"scenarios": {}}),
+])
+def test_malformed_body_is_bad_request(server, path, body):
+    status, response = _request(server, "POST", path, body)
+    assert status == 400 and response["error"]
+    # ハンドラーのスレッドが落ちずに、続くリクエストにも応答する
+    assert _request(server, "GET", "/health")[0] == 200
+
+
+def test_repeated_request_hits_cache(server, params):
+    request = {"params": params, **REQUEST_INPUTS}
+    _, first = _request(server, "POST", "/simulate", request)
+    before = _request(server, "GET", "/health")[1]
+    _, second = _request(server, "POST", "/simulate", request)
+    after = _request(server, "GET", "/health")[1]
+    assert second == first
+    assert after["cache"]["hits"] == before["cache"]["hits"] + 1
+    assert after["batches"] == before["batches"]
+
+
+def test_concurrent_identical_requests_are_computed_once(server, params):
+    service = server.service
+    service._slots.acquire()  # ワーカーを塞いで、同じリクエストが計算中に重なる状況を作る
+    try:
+        futures = [service.submit(params, *INPUTS) for _ in range(3)]
+        assert futures[0] is futures[1] is futures[2]
+        responses = []
+        threads = [threading.Thread(target=lambda: responses.append(
+            _request(server, "POST", "/simulate", {"params": params, **REQUEST_INPUTS}))) for _ in range(2)]
+        for t in threads:
+            t.start()
+        deadline = time.monotonic() + 30
+        while service.requests < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        service._slots.release()
+    for t in threads:
+        t.join()
+    assert json.loads(futures[0].result(timeout=60)) == responses[0][1]
+    assert responses[0] == responses[1]
+    stats = service.stats()
+    assert stats["requests"] == 5 and stats["batches"] == 1 and stats["cache"]["entries"] == 1
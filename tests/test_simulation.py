@@ -0,0 +1,93 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from conftest import INPUTS
+
+from simulation import (CONV_DIRECT_MAX, expand_schedule, geometric_filter, simulate, survival_convolve,
+                        survival_curve)
+
+with open(os.path.join(os.path.dirname(__file__), "data", "baseline_series.json"), encoding="utf-8") as f:
+    BASELINE = json.load(f)  # 月ごとのループで計算していた元の実装の結果（tests/data/params.json）
+
+
+@pytest.mark.parametrize("case", BASELINE["cases"], ids=lambda case: "-".join(map(str, case["inputs"])))
+def test_simulate_reproduces_baseline_series(params, case):
+    result = simulate(params, *case["inputs"])
+    for name, expected in case["series"].items():
+        np.testing.assert_allclose(np.asarray(getattr(result, name), dtype=float), np.asarray(expected, dtype=float),
+                                   rtol=1e-12, atol=0, err_msg=name)
+
+
+# -----------------------------
+# 継続期間別の解約率（コホート）
+# -----------------------------
+@pytest.mark.parametrize("n", [120, CONV_DIRECT_MAX + 100])  # テプリッツ行列との積 / FFT
+def test_constant_tenure_churn_equals_geometric(n):
+    x = np.random.default_rng(0).uniform(0, 50, (3, n))
+    survival = survival_curve(0.03, [{"months": 12, "churn_rate": 0.03}], np.ones(1), n, "month")[0]
+    np.testing.assert_allclose(survival_convolve(x, survival), geometric_filter(x, np.array([0.03])), rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("step, years", [("month", 7), ("week", 10)])  # 週次10年は 520 ステップ（FFT）
+def test_constant_churn_segments_equal_plain_churn(params, step, years):
+    params["time"]["step"] = step
+    plain = simulate(params, years, *INPUTS[1:])
+    params["app"]["num_churn_segments"] = 2
+    params["app"]["churn_segments"] = [{"months": 3, "churn_rate": 0.03}, {"months": 12, "churn_rate": 0.03}]
+    cohort = simulate(params, years, *INPUTS[1:])
+    np.testing.assert_allclose(cohort.paying_users, plain.paying_users, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(cohort.profit, plain.profit, rtol=1e-9, atol=1e-3)
+
+
+# -----------------------------
+# AWS の段階料金
+# -----------------------------
+def _brute_force_aws(users: np.ndarray, base_rate: np.ndarray, tier_users: list, tier_costs: list) -> np.ndarray:
+    # 人数を区間ごとに分けて、区間の単価 × 区間の人数 を足す（最初の閾値までは基本単価）
+    order = np.argsort(tier_users)
+    bounds = [0.0] + [float(tier_users[i]) for i in order] + [np.inf]
+    cost = np.zeros_like(users, dtype=float)
+    for k in range(len(bounds) - 1):
+        rate = base_rate if k == 0 else tier_costs[order[k - 1]]
+        cost += rate * np.clip(users - bounds[k], 0, bounds[k + 1] - bounds[k])
+    return cost
+
+
+@pytest.mark.parametrize("scheduled", [False, True])
+def test_tiered_aws_cost_equals_per_tier_sum(params, scheduled):
+    params["app"]["churn_rate"] = 0.01  # 会員数を増やして全区間を通る
+    params["cloud"].update(num_aws_tiers=3, aws_tier_users=[150, 30, 90], aws_tier_costs=[30, 45, 40])
+    if scheduled:
+        params["cloud"]["aws_cost_per_user_month"] = {"schedule": [{"month": 0, "value": 50}, {"month": 24, "value": 60}]}
+    result = simulate(params, 10, *INPUTS[1:])
+    assert result.paying_users.max() > 150
+    base_rate = np.where(result.month_index >= 24, 60, 50) if scheduled else 50
+    expected = _brute_force_aws(result.paying_users, base_rate, [150, 30, 90], [30, 45, 40])
+    np.testing.assert_allclose(result.cost_cloud_aws, expected, rtol=1e-12)
+
+
+# -----------------------------
+# スケジュール（時間で変わる入力）
+# -----------------------------
+def test_one_segment_schedule_equals_scalar(params):
+    scalar = simulate(params, *INPUTS)
+    params["app"]["monthly_fee"] = {"schedule": [{"month": 0, "value": params["app"]["monthly_fee"]}]}
+    params["dealer"]["max_companies"] = {"schedule": [{"month": 0, "value": params["dealer"]["max_companies"]}]}
+    scheduled = simulate(params, *INPUTS)
+    np.testing.assert_array_equal(scheduled.profit, scalar.profit)
+    np.testing.assert_array_equal(scheduled.contract_companies, scalar.contract_companies)
+
+
+def test_schedule_growth_compounds_from_segment_start():
+    m = np.arange(36)
+    value = {"schedule": [{"month": 12, "value": 200.0, "growth": 0.01}, {"month": 0, "value": 100.0}]}
+    expected = np.where(m < 12, 100.0, 200.0 * 1.01 ** np.maximum(m - 12, 0))
+    np.testing.assert_allclose(expand_schedule(value, m), expected, rtol=1e-12)
+
+
+def test_empty_schedule_is_rejected(params):
+    params["app"]["monthly_fee"] = {"schedule": []}
+    with pytest.raises(ValueError, match="区間がありません"):
+        simulate(params, *INPUTS)
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+from conftest import INPUTS
+
+import store
+from cache import params_fingerprint
+from simulation import simulate
+from store import ResultStore
+
+
+def test_store_is_separated_by_engine_version(params, tmp_path, monkeypatch):
+    key = params_fingerprint(params, *INPUTS)
+    result = simulate(params, *INPUTS)
+    ResultStore(str(tmp_path)).put(key, result)
+    np.testing.assert_array_equal(ResultStore(str(tmp_path)).get(key).new_users, result.new_users)
+    # 計算内容が変わったら（ENGINE_VERSION を上げたら）以前の計算の結果を読まない
+    monkeypatch.setattr(store, "ENGINE_VERSION", store.ENGINE_VERSION + 1)
+    newer = ResultStore(str(tmp_path))
+    assert newer.get(key) is None
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_put_does_not_scan_the_store_below_the_cap(params, tmp_path, monkeypatch):
+    result = simulate(params, *INPUTS)
+    store_ = ResultStore(str(tmp_path))
+    scans = []
+    entries = store_.entries
+    monkeypatch.setattr(store_, "entries", lambda: scans.append(1) or entries())
+    for i in range(5):
+        store_.put(f"{i:02d}key", result)
+    assert len(scans) == 1  # 最初の put で合計を数えるときだけ
+    assert store_.stats()["entries"] == 5
+
+
+def test_put_evicts_least_recently_used_over_the_cap(params, tmp_path):
+    result = simulate(params, *INPUTS)
+    store_ = ResultStore(str(tmp_path))
+    store_.put("00first", result)
+    size = store_.stats()["bytes"]
+    store_.max_bytes = 2 * size
+    store_.put("01second", result)
+    os.utime(os.path.join(store_._path("00first"), store.META_FILE), (0, 0))  # 最も古く使ったもの
+    store_.put("02third", result)
+    assert "00first" not in store_ and "01second" in store_ and "02third" in store_
+    assert store_._total_bytes == 2 * size
+
+
+def test_failed_put_leaves_no_temporary_directory(params, tmp_path):
+    result = simulate(params, *INPUTS)
+    result.robot_names = [object()]  # JSON にできない項目
+    store_ = ResultStore(str(tmp_path))
+    store_.put("00key", result)
+    assert "00key" not in store_
+    assert not [name for name in os.listdir(store_.root) if name.startswith("tmp-")]
+
+
+def test_evict_ignores_temporary_directories_removed_meanwhile(tmp_path, monkeypatch):
+    store_ = ResultStore(str(tmp_path))
+    os.makedirs(os.path.join(store_.root, "tmp-gone"))
+    real_stat = os.stat
+
+    def stat(path, *args, **kwargs):
+        if os.path.basename(path) == "tmp-gone":
+            raise FileNotFoundError(path)  # 一覧を取ったあとで別のプロセスが改名した
+        return real_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(store.os, "stat", stat)
+    store_.evict()
@@ -0,0 +1,123 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from conftest import SIDEBAR_INPUTS, VARIANT_AXES, YEARS, assert_same_as_single, variants
+
+from sweep import SUMMARY_COLUMNS, CsvSink, ParquetSink, main, run_sweep, sweep_signature
+
+AXES = {path: np.array(values) for path, values in VARIANT_AXES.items()}
+COLUMNS = ["scenario", *AXES, *SUMMARY_COLUMNS]
+CHUNK_SIZE = 3  # 8 シナリオ → 3 チャンク
+
+
+class Interrupted(Exception):
+    pass
+
+
+def _sink(sink_class, path: str, params: dict, axes: dict = AXES, restart: bool = False):
+    signature = sweep_signature(params, axes, YEARS, SIDEBAR_INPUTS, CHUNK_SIZE)
+    return sink_class(path, signature, ["scenario", *axes, *SUMMARY_COLUMNS], restart=restart)
+
+
+def _sweep(sink_class, path: str, params: dict, stop_after: int = None) -> int:
+    # stop_after チャンクを書いたところで中断する
+    def on_chunk(done: int, total: int) -> None:
+        if done == stop_after:
+            raise Interrupted()
+
+    sink = _sink(sink_class, path, params)
+    try:
+        return run_sweep(params, AXES, sink, YEARS, SIDEBAR_INPUTS, CHUNK_SIZE, on_chunk=on_chunk)
+    finally:
+        sink.close()
+
+
+def _read_csv(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_sweep_rows_equal_single_runs(agent_params, tmp_path):
+    path = str(tmp_path / "sweep.csv")
+    assert _sweep(CsvSink, path, agent_params) == len(variants(agent_params))
+    header, *rows = _read_csv(path)
+    assert header.split(",") == COLUMNS
+    for i, (row, p) in enumerate(zip(rows, variants(agent_params))):
+        values = dict(zip(COLUMNS, map(float, row.split(","))))
+        assert values["scenario"] == i
+        assert_same_as_single(values, p)
+
+
+def test_csv_resume_skips_finished_chunks_and_truncates_partial_rows(params, tmp_path):
+    expected = str(tmp_path / "expected.csv")
+    _sweep(CsvSink, expected, params)
+
+    path = str(tmp_path / "sweep.csv")
+    with pytest.raises(Interrupted):
+        _sweep(CsvSink, path, params, stop_after=1)
+    with open(f"{path}.progress.json", encoding="utf-8") as f:
+        progress = json.load(f)
+    assert progress["chunks"] == 1 and progress["bytes"] == os.path.getsize(path)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("3,50,300.0,12")  # 記録のあとに書きかけた行
+
+    computed = _sweep(CsvSink, path, params)
+    assert computed == len(variants(params)) - CHUNK_SIZE
+    assert _read_csv(path) == _read_csv(expected)
+    assert _sweep(CsvSink, path, params) == 0  # 書き終えていれば何も計算しない
+
+
+def test_csv_resume_with_missing_output_starts_over(params, tmp_path):
+    path = str(tmp_path / "sweep.csv")
+    with pytest.raises(Interrupted):
+        _sweep(CsvSink, path, params, stop_after=2)
+    os.remove(path)
+    assert _sweep(CsvSink, path, params) == len(variants(params))
+    assert len(_read_csv(path)) == 1 + len(variants(params))
+
+
+@pytest.mark.parametrize("sink_class, name", [(CsvSink, "sweep.csv"), (ParquetSink, "sweep")])
+def test_resume_with_other_conditions_is_rejected(params, tmp_path, sink_class, name):
+    if sink_class is ParquetSink:
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / name)
+    with pytest.raises(Interrupted):
+        _sweep(sink_class, path, params, stop_after=1)
+    other = {"dealer.max_companies": AXES["dealer.max_companies"]}
+    with pytest.raises(ValueError):
+        _sink(sink_class, path, params, axes=other)
+    _sink(sink_class, path, params, axes=other, restart=True).close()
+
+
+def test_parquet_resume_skips_written_parts(params, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "sweep")
+    with pytest.raises(Interrupted):
+        _sweep(ParquetSink, path, params, stop_after=2)
+    first = os.stat(os.path.join(path, "part-000000.parquet")).st_mtime_ns
+    assert _sweep(ParquetSink, path, params) == len(variants(params)) - 2 * CHUNK_SIZE
+    assert os.stat(os.path.join(path, "part-000000.parquet")).st_mtime_ns == first
+    table = pq.read_table(path).to_pydict()
+    assert table["scenario"] == list(range(len(variants(params))))
+
+
+def test_sweep_without_axes_computes_base(params, tmp_path):
+    path = str(tmp_path / "sweep.csv")
+    sink = _sink(CsvSink, path, params, axes={})
+    assert run_sweep(params, {}, sink, YEARS, SIDEBAR_INPUTS, CHUNK_SIZE) == 1
+    sink.close()
+    header, row = _read_csv(path)
+    assert_same_as_single(dict(zip(header.split(","), map(float, row.split(",")))), params)
+
+
+@pytest.mark.parametrize("axis", ["robot.num_types=1,2", "app.monthly_fee.schedule.0.month=0,6", "dealer.model=1,2",
+                                  "app.no_such_field=1,2"])
+def test_structural_or_unknown_axis_is_rejected(params, tmp_path, axis):
+    params["app"]["monthly_fee"] = {"schedule": [{"month": 0, "value": 500}]}
+    params_path = tmp_path / "params.json"
+    params_path.write_text(json.dumps(params), encoding="utf-8")
+    with pytest.raises(SystemExit):
+        main([str(params_path), "--axis", axis, "-o", str(tmp_path / "sweep.csv"), "--workers", "1"])
+    assert not os.path.exists(tmp_path / "sweep.csv")